@@ -0,0 +1,331 @@
+"""
+Callgraph module (internal)
+
+This module contains the call graph for every function within the
+database. For each function, the graph contains the address of each
+instruction that references another function along with the address
+that it references. These edges are kept as arrays that are sorted by
+the address of the function that they belong to, so that the graph can
+be traversed without needing to discover the references of a function
+every time that they are needed.
+
+The graph is stored as a blob within a netnode so that it does not need
+to be discovered again each time the database is opened. The hooks are
+responsible for marking the functions that have been changed so that
+their edges will be discovered again the next time they are needed.
+This is an internal module and is not expected to be used by the user.
+"""
+
+import array, bisect, struct, logging, itertools, operator, collections
+import idaapi
+
+import internal
+
+class graph(object):
+    """
+    This namespace contains the edges of the call graph for the database
+    as the arrays `(callers, offsets, sites, targets)`. The callers are
+    sorted, and the edges for each caller are the sites and targets from
+    its offset up to the offset of the next caller. This is the format
+    that the graph is stored in, and the reversed graph is derived from
+    it whenever the callers of an address are needed.
+
+    Any changes that are made to the graph are kept separately until the
+    graph needs to be traversed. At that point the changes are merged into
+    the arrays. Functions that are marked as dirty are considered to not
+    have any edges until their references have been discovered again.
+    """
+    __node__ = '$ minsc.callgraph'
+    __version__ = 1
+    __header__ = struct.Struct('<BBQQ')
+    __typecode__ = 'Q' if 'Q' in getattr(array, 'typecodes', '') else 'L'
+
+    __graph__ = __reverse__ = None
+    __changes__, __dirty__, __complete__, __modified__ = {}, set(), False, False
+
+    @classmethod
+    def node(cls):
+        '''Return the netnode containing the call graph creating it if necessary.'''
+        node = internal.netnode.get(cls.__node__)
+        return internal.netnode.new(cls.__node__) if node == idaapi.BADADDR else node
+
+    @classmethod
+    def reset(cls, *args):
+        '''Discard the call graph from memory so that it is loaded from the database the next time it is used.'''
+        cls.__graph__ = cls.__reverse__ = None
+        cls.__changes__, cls.__dirty__, cls.__complete__, cls.__modified__ = {}, set(), False, False
+
+    @classmethod
+    def modified(cls):
+        '''Return whether the call graph has been changed since it was loaded from the database.'''
+        return cls.__modified__
+
+    @classmethod
+    def clear(cls, *args):
+        '''Discard the call graph from both memory and the database so that it will be discovered again.'''
+        cls.reset()
+        node = internal.netnode.get(cls.__node__)
+        return node != idaapi.BADADDR and internal.netnode.remove(node)
+
+    @classmethod
+    def __arrays__(cls, count=0):
+        '''Return a tuple of empty arrays for the callers, offsets, sites, and targets of a call graph with `count` callers.'''
+        offsets = array.array(cls.__typecode__, [0] * (1 + count))
+        return array.array(cls.__typecode__), offsets, array.array(cls.__typecode__), array.array(cls.__typecode__)
+
+    @classmethod
+    def __load__(cls):
+        '''Load the call graph from the database if it hasn't been loaded yet.'''
+        if cls.__graph__ is not None:
+            return cls.__graph__
+
+        node = internal.netnode.get(cls.__node__)
+        encoded = None if node == idaapi.BADADDR else internal.netnode.blob.get(node, idaapi.atag)
+        if not encoded or len(encoded) < cls.__header__.size:
+            cls.__graph__, cls.__complete__ = cls.__arrays__(), False
+            return cls.__graph__
+
+        # If the version is different, then we need to discover it again.
+        version, complete, count, total = cls.__header__.unpack(encoded[:cls.__header__.size])
+        if version != cls.__version__ or len(encoded) != cls.__header__.size + 8 * (count + 1 + count + 2 * total):
+            logging.info(u"{:s}.load() : Ignoring the call graph stored in the database due to its version ({:d}) or size ({:d}) being different than expected.".format('.'.join([__name__, cls.__name__]), version, len(encoded)))
+            cls.__graph__, cls.__complete__ = cls.__arrays__(), False
+            return cls.__graph__
+
+        # Unpack each of the arrays that follow the header.
+        offset, items = cls.__header__.size, []
+        for length in [count, count + 1, total, total]:
+            format = "<{:d}Q".format(length)
+            items.append(array.array(cls.__typecode__, struct.unpack_from(format, encoded, offset)))
+            offset += struct.calcsize(format)
+
+        cls.__graph__, cls.__complete__ = tuple(items), bool(complete)
+        logging.debug(u"{:s}.load() : Loaded the call graph with {:d} function{:s} and {:d} edge{:s} from the database.".format('.'.join([__name__, cls.__name__]), count, '' if count == 1 else 's', total, '' if total == 1 else 's'))
+        return cls.__graph__
+
+    @classmethod
+    def flush(cls):
+        '''Write the call graph to the database excluding any of the functions that are dirty if it has been changed.'''
+        if not cls.__modified__:
+            return False
+
+        # If there's nothing in the graph and it has never been stored, then
+        # there's no reason to create a netnode just to store nothing in it.
+        callers, offsets, sites, targets = cls.__merge__()
+        if not callers and internal.netnode.get(cls.__node__) == idaapi.BADADDR:
+            cls.__modified__ = False
+            return False
+        dirty = {ea for ea in cls.__dirty__}
+
+        # Collect the edges for each caller that isn't dirty.
+        items, roffsets, rsites, rtargets = [], [0], [], []
+        for index, ea in enumerate(callers):
+            if ea in dirty:
+                continue
+            items.append(ea)
+            rsites.extend(sites[offsets[index] : offsets[index + 1]])
+            rtargets.extend(targets[offsets[index] : offsets[index + 1]])
+            roffsets.append(len(rsites))
+
+        header = cls.__header__.pack(cls.__version__, 1 if cls.__complete__ and not dirty else 0, len(items), len(rsites))
+        encoded = b''.join(struct.pack("<{:d}Q".format(len(seq)), *seq) for seq in [items, roffsets, rsites, rtargets])
+        res = internal.netnode.blob.set(cls.node(), idaapi.atag, header + encoded)
+        cls.__modified__ = False
+        return res
+
+    @classmethod
+    def __merge__(cls):
+        '''Merge any changes that were made to the call graph into its arrays and return them.'''
+        callers, offsets, sites, targets = cls.__load__()
+        if not cls.__changes__:
+            return cls.__graph__
+
+        # Walk through all of the callers and the changes in order so that
+        # we can replace the edges for each caller that was changed.
+        changes, cls.__changes__ = cls.__changes__, {}
+        result = cls.__arrays__()
+        for ea in sorted(set(callers) | set(changes)):
+            if ea in changes:
+                edges = changes[ea]
+                if edges is None:
+                    continue
+                iterable = edges
+
+            else:
+                index = bisect.bisect_left(callers, ea)
+                iterable = zip(sites[offsets[index] : offsets[index + 1]], targets[offsets[index] : offsets[index + 1]])
+
+            # Append the edges for the current caller to our new arrays.
+            rcallers, roffsets, rsites, rtargets = result
+            rcallers.append(ea)
+            for site, target in iterable:
+                rsites.append(site)
+                rtargets.append(target)
+            roffsets.append(len(rsites))
+
+        cls.__graph__, cls.__reverse__ = result, None
+        return result
+
+    @classmethod
+    def complete(cls, *complete):
+        '''Return whether every function within the database has had its edges discovered. If `complete` is specified, then set it.'''
+        cls.__load__()
+        if complete:
+            cls.__complete__, = map(bool, complete)
+            cls.__modified__ = True
+        return cls.__complete__
+
+    @classmethod
+    def dirtied(cls):
+        '''Return a sorted list of the functions that have been changed and need their edges to be discovered again.'''
+        return sorted(cls.__dirty__)
+
+    @classmethod
+    def dirty(cls, ea):
+        '''Mark the function at `ea` as having been changed so that its edges are discovered again.'''
+        cls.__dirty__.add(ea)
+        cls.__modified__ = True
+
+    @classmethod
+    def get(cls, ea):
+        '''Return a tuple of the `(site, target)` edges for the function at `ea` or ``None`` if they need to be discovered.'''
+        if ea in cls.__dirty__:
+            return None
+        elif ea in cls.__changes__:
+            return cls.__changes__[ea]
+
+        callers, offsets, sites, targets = cls.__load__()
+        index = bisect.bisect_left(callers, ea)
+        if index < len(callers) and callers[index] == ea:
+            return tuple(zip(sites[offsets[index] : offsets[index + 1]], targets[offsets[index] : offsets[index + 1]]))
+        return None
+
+    @classmethod
+    def set(cls, ea, edges):
+        '''Replace the edges for the function at `ea` with the `(site, target)` tuples in `edges` and return them.'''
+        cls.__load__()
+        res = cls.__changes__[ea] = tuple(sorted({(site, target) for site, target in edges}))
+        cls.__dirty__.discard(ea)
+        cls.__modified__ = True
+        return res
+
+    @classmethod
+    def remove(cls, ea):
+        '''Remove the function at `ea` and all of its edges from the call graph.'''
+        cls.__load__()
+        cls.__changes__[ea] = None
+        cls.__dirty__.discard(ea)
+        cls.__modified__ = True
+
+    @classmethod
+    def __backward__(cls):
+        '''Return the arrays for the reversed call graph as `(callees, offsets, sites, callers)`.'''
+        callers, offsets, sites, targets = cls.__merge__()
+        if cls.__reverse__ is not None:
+            return cls.__reverse__
+
+        # Sort each of the edges by their target, and then group them.
+        edges = sorted((targets[position], sites[position], ea) for index, ea in enumerate(callers) for position in range(offsets[index], offsets[index + 1]))
+        result = cls.__arrays__()
+        rcallees, roffsets, rsites, rcallers = result
+        for target, group in itertools.groupby(edges, operator.itemgetter(0)):
+            for _, site, ea in group:
+                rsites.append(site)
+                rcallers.append(ea)
+            rcallees.append(target)
+            roffsets.append(len(rsites))
+        cls.__reverse__ = result
+        return result
+
+    @staticmethod
+    def __adjacent__(arrays, ea):
+        '''Return a sorted list of the addresses adjacent to `ea` using the specified `arrays`.'''
+        keys, offsets, _, items = arrays
+        index = bisect.bisect_left(keys, ea)
+        if index < len(keys) and keys[index] == ea:
+            return sorted({item for item in items[offsets[index] : offsets[index + 1]]})
+        return []
+
+    @classmethod
+    def successors(cls, ea):
+        '''Return a sorted list of the addresses that are referenced by the function at `ea`.'''
+        return cls.__adjacent__(cls.__merge__(), ea)
+
+    @classmethod
+    def predecessors(cls, ea):
+        '''Return a sorted list of the functions that reference the address `ea`.'''
+        return cls.__adjacent__(cls.__backward__(), ea)
+
+    @classmethod
+    def traverse(cls, addresses, depth=None, reverse=False):
+        """Return a dictionary of each address that is reachable from `addresses` and the number of edges needed to reach it.
+
+        If `depth` is not ``None``, then only follow up to that number of edges.
+        If `reverse` is true, then follow the callers of each address instead of the callees.
+        """
+        Fadjacent = cls.predecessors if reverse else cls.successors
+        distances, queue = {}, collections.deque((ea, 0) for ea in addresses)
+        while queue:
+            ea, distance = queue.popleft()
+            if depth is not None and distance >= depth:
+                continue
+
+            for item in Fadjacent(ea):
+                if item not in distances:
+                    distances[item] = distance + 1
+                    queue.append((item, distance + 1))
+                continue
+            continue
+        return distances
+
+    @classmethod
+    def closure(cls, addresses, reverse=False):
+        '''Return a sorted list of every address that is reachable from `addresses` by following one or more edges.'''
+        return sorted(cls.traverse(addresses, None, reverse))
+
+    @classmethod
+    def components(cls):
+        '''Return a list of the strongly connected components of the call graph with each one as a sorted list of addresses.'''
+        callers, _, _, targets = cls.__merge__()
+        index, lowlink, stack, onstack, result = {}, {}, [], set(), []
+
+        # This is Tarjan's algorithm, but using our own stack of iterators
+        # so that we don't have to worry about the depth of the recursion.
+        for root in sorted(set(callers) | set(targets)):
+            if root in index:
+                continue
+
+            index[root] = lowlink[root] = len(index)
+            stack.append(root), onstack.add(root)
+            work = [(root, iter(cls.successors(root)))]
+            while work:
+                ea, iterable = work[-1]
+                for item in iterable:
+                    if item not in index:
+                        index[item] = lowlink[item] = len(index)
+                        stack.append(item), onstack.add(item)
+                        work.append((item, iter(cls.successors(item))))
+                        break
+                    elif item in onstack:
+                        lowlink[ea] = min(lowlink[ea], index[item])
+                    continue
+
+                # If we've exhausted the successors, then we can leave this address.
+                else:
+                    work.pop()
+                    if work:
+                        parent, _ = work[-1]
+                        lowlink[parent] = min(lowlink[parent], lowlink[ea])
+
+                    # If this address is the root of a component, then pop everything in it.
+                    if lowlink[ea] == index[ea]:
+                        component = []
+                        while not component or component[-1] != ea:
+                            item = stack.pop()
+                            onstack.discard(item)
+                            component.append(item)
+                        result.append(sorted(component))
+                    continue
+                continue
+            continue
+        return result
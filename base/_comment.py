@@ -58,7 +58,7 @@ that is prefixed with a backslash.
 """
 
 import functools, operator, itertools, types
-import collections, heapq, string
+import collections, heapq, string, re, copy
 import sys, six, logging
 
 import internal, idaapi
@@ -626,12 +626,139 @@ class tag(object):
         # plain and simple...
         return key.get(), value.get()
 
+### fast encoding/decoding of a tag
+class line(object):
+    """
+    Namespace for encoding and decoding a single line of a comment.
+
+    This is format-compatible with the ``tag`` namespace, but uses regular
+    expressions and slicing to process a whole line at a time instead of
+    processing each individual character. Anything that can not be handled
+    quickly (such as a tag name containing escapes) is handed off to the
+    ``tag`` namespace which is used as the reference implementation.
+    """
+
+    # Characters that are skipped by the reference decoder in front of the
+    # tag name and its value.
+    whitespace = str().join(sorted(internal.utils.character.const.whitespace))
+
+    # Expression used to match a tag name at the beginning of a line which
+    # does not contain any escaped characters.
+    name_expression = re.compile(r"[{:s}]*\[([^\\\]]*)\]".format(re.escape(whitespace)))
+
+    # Expression used to escape the characters that have a special meaning
+    # within a tag name, and the expression for strings that only contain
+    # printable ascii characters and thus don't need any of them escaped.
+    name_special = re.compile(r'([\[\]\\])')
+    printable_expression = re.compile(r'[\x20-\x7e]*\Z')
+
+    # Expression used for decoding a float that is a regular decimal literal.
+    float_expression = re.compile(r'float\(\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*\)\s*\Z')
+
+    # Expression for every escape sequence that we know how to unescape, and
+    # the table for mapping the escaped characters to their original value.
+    escape_expression = re.compile(r'\\(?:x([0-9a-f]{2})|u([0-9a-f]{4})|U(00[01][0-9a-f]{5})|([^xuU])|([xuU])|\Z)', re.DOTALL)
+    unescaped = {key[1:] : value for key, value in internal.utils.character.const.inverse.items()}
+    unescaped[internal.utils.character.const.backslash] = internal.utils.character.const.backslash
+
+    @classmethod
+    def escape(cls, string):
+        '''Escape all of the non-printable characters within the specified `string`.'''
+        if cls.printable_expression.match(string):
+            return string.replace('\\', '\\\\')
+
+        # If our string is entirely printable according to python, then the only
+        # thing that needs to be escaped is the backslash. Otherwise we fall back
+        # to the reference implementation to escape everything else.
+        elif sys.version_info.major >= 3 and string.isprintable():
+            return string.replace('\\', '\\\\')
+        return _str.encode(string)
+
+    @classmethod
+    def unescape(cls, string):
+        '''Unescape all of the escaped characters within the specified `string`.'''
+        if u'\\' not in string:
+            return string
+
+        # Walk through every single escape sequence that we found whilst collecting
+        # the characters in between them and the characters that they represent.
+        result, position = [], 0
+        for match in cls.escape_expression.finditer(string):
+            x, u, U, other, invalid = match.groups()
+
+            # If we found an escape sequence that isn't valid, then we need to use
+            # the reference implementation in order to deal with it correctly.
+            if invalid:
+                return _str.decode(string)
+
+            result.append(string[position : match.start()])
+            result.append(six.unichr(int(x or u or U, 16)) if x or u or U else cls.unescaped.get(other, other) if other else u'')
+            position = match.end()
+
+        result.append(string[position:])
+        return u''.join(result)
+
+    @classmethod
+    def encode(cls, key, value):
+        '''Encode the provided `key` and `value` into a line fit for a comment.'''
+        if not cls.printable_expression.match(key):
+            return tag.encode(key, value)
+        name = u"[{:s}]".format(cls.name_special.sub(r'\\\1', key))
+
+        # Strings and integers are the most common, so we encode those ourselves
+        # and hand off everything else to the encoder that was registered for it.
+        if isinstance(value, six.string_types):
+            return u' '.join([name, cls.escape(value)])
+        elif isinstance(value, six.integer_types):
+            return u' '.join([name, "{:-#x}".format(value)])
+        return u' '.join([name, cache.by(value).encode(value)])
+
+    @classmethod
+    def decode(cls, string):
+        '''Decode the specified `string` as a line and return the key and its value.'''
+        string = string.decode('utf8') if sys.version_info.major < 3 and not isinstance(string, unicode) else string
+
+        # If we couldn't match a tag name that doesn't have any escapes, then we
+        # hand it off to the reference implementation to decode it for us.
+        match = cls.name_expression.match(string)
+        if not match:
+            return tag.decode(iter(string))
+        key, value_s = match.group(1), string[match.end():].lstrip(cls.whitespace)
+
+        # If there's nothing left, then our value is an empty string. Otherwise we
+        # need to figure out what type it is and then try to decode it as one.
+        if not value_s:
+            return key, u''
+
+        try:
+            t = cache.match(value_s)
+        except KeyError:
+            t = _str
+
+        # Strings are the most common, so we unescape them ourselves. Floats are
+        # evaluated by their decoder, so if it's a simple literal then we convert it.
+        try:
+            if t is _str:
+                value = cls.unescape(value_s.lstrip())
+            elif t is _float and cls.float_expression.match(value_s):
+                value = float(cls.float_expression.match(value_s).group(1))
+            else:
+                value = t.decode(value_s)
+
+        # If we weren't able to, then fall back to a string
+        except Exception as E:
+            logging.debug(u"{:s}.decode({!s}) : Assuming value ({!s}) is of type {!s}.".format('.'.join([__name__, cls.__name__]), internal.utils.string.repr(string), internal.utils.string.repr(value_s), _str))
+            value = cls.unescape(value_s.lstrip())
+        return key, value
+
 ### Encoding and decoding of a comment
-def decode(data, default=u''):
+def decode(data, default=u'', reference=False):
     """Decode all the `(key, value)` pairs from the string `data` delimited by newlines.
 
     If unable to decode the key and value from a line in `data`, then use `default` as the key name.
+    If `reference` is true, then decode each line one character at a time using the ``tag`` namespace.
     """
+    Fdecode = (lambda string: tag.decode(iter(string))) if reference else line.decode
 
     # if data is empty, then return an empty dict
     if not data:
@@ -640,12 +767,11 @@ def decode(data, default=u''):
     # iterate through each line in the data so that we can collect it
     # into our result dictionary.
     result = {}
-    for line in data.split(u'\n'):
-        iterable = (ch for ch in line)
+    for string in data.split(u'\n'):
 
         # try and decode the key and the value from the line
         try:
-            key, value = tag.decode(iterable)
+            key, value = Fdecode(string)
 
         # if the key wasn't terminated properly or the line was not
         # formatted correctly, then fall back to using the default key.we
@@ -658,7 +784,7 @@ def decode(data, default=u''):
             # if our previous value is already a string, then we can use
             # it as-is and append it to the default key separated by a newline.
             if isinstance(value, six.string_types):
-                string = value
+                previous = value
 
             # if it's not, however, then we need to demote the value to
             # a string by temporarily encoding it. this is hackish, but
@@ -669,12 +795,12 @@ def decode(data, default=u''):
                 # now we can collect it into a string...
                 collected_value = internal.interface.collect_t(unicode if sys.version_info.major < 3 else str, operator.add)
                 tag.value.encode(iter([value]), collected_value)
-                string = collected_value.get()
+                previous = collected_value.get()
 
             # now we should have a proper string that we can append our
             # incorrectly formatted tag and value to.
-            items = filter(None, string.split(u'\n'))
-            value = u'\n'.join(itertools.chain(items, [line]))
+            items = filter(None, previous.split(u'\n'))
+            value = u'\n'.join(itertools.chain(items, [string]))
 
         # if there was no exception, but the key that we decoded can potentially
         # overwrite an already existing key in our result dictionary, then we will
@@ -693,29 +819,91 @@ def decode(data, default=u''):
     # return the dictionary we decoded
     return result
 
-def encode(dict):
-    '''Encode a dictionary into a multi-line string encoded as a list of tags.'''
-    result = []
+def encode(dict, reference=False):
+    '''Encode a dictionary into a multi-line string encoded as a list of tags. If `reference` is true, then encode each tag one character at a time using the ``tag`` namespace.'''
+    result, Fencode = [], tag.encode if reference else line.encode
 
     # walk each item in the dictionary, so that we can encode
     # each key and value into a single line and aggregate them
     # into our result list.
     for key, value in (dict or {}).items():
-        line = tag.encode(key, value)
-        result.append(line)
+        string = Fencode(key, value)
+        result.append(string)
 
     # now we can join them with newlines and return it to the caller
     return '\n'.join(result)
 
 def check(data):
     '''Check that the string `data` has the correct format by trying to decode it.'''
-    res = map(iter, (data or '').split('\n'))
+    res = (data or '').split('\n')
     try:
-        [tag.decode(item) for item in res]
+        [line.decode(item) for item in res]
     except Exception as E:
         return False
     return True
 
+### Cache of decoded comments
+class decoded(object):
+    """
+    This namespace is a bounded cache (least-recently-used) of the tags that
+    were decoded from the comment at an address or the comment belonging to
+    a function. Each entry is keyed by its location and whether the comment
+    is repeatable. The comment that was decoded is stored with each entry so
+    that a comment modified without notifying the hooks is never returned.
+    """
+    capacity, state = 0x1000, collections.OrderedDict()
+    hits = misses = 0
+
+    # Values of these types can not be modified, so they don't need to be copied
+    # when returning the decoded tags to the caller.
+    immutable = tuple(itertools.chain(six.string_types, six.integer_types, [bytes, float, tuple, frozenset, type(None)]))
+
+    @classmethod
+    def get(cls, key, data):
+        '''Return the tags decoded from the comment `data` that is cached with the specified `key`.'''
+        item = cls.state.pop(key, None)
+        if item is not None and item[0] == data:
+            cls.hits, (_, res) = cls.hits + 1, item
+
+        # If it wasn't cached or the comment is different, then decode it.
+        else:
+            cls.misses, res = cls.misses + 1, decode(data)
+
+        # Re-insert the entry so that it is the most recently used one, and then
+        # discard the least recently used ones that are beyond our capacity.
+        cls.state[key] = data, res
+        while len(cls.state) > cls.capacity:
+            cls.state.popitem(last=False)
+
+        # Return a copy so that the caller can't modify what we've cached.
+        return {name : value if isinstance(value, cls.immutable) else copy.deepcopy(value) for name, value in res.items()}
+
+    @classmethod
+    def address(cls, ea, repeatable, data):
+        '''Return the tags decoded from the comment `data` at the address `ea`.'''
+        return cls.get(('address', ea, True if repeatable else False), data)
+
+    @classmethod
+    def function(cls, ea, repeatable, data):
+        '''Return the tags decoded from the comment `data` for the function at `ea`.'''
+        return cls.get(('function', ea, True if repeatable else False), data)
+
+    @classmethod
+    def discard(cls, type, ea):
+        '''Discard both the repeatable and non-repeatable comments that are cached for the `type` (\'address\' or \'function\') at `ea`.'''
+        [cls.state.pop((type, ea, repeatable), None) for repeatable in [True, False]]
+
+    @classmethod
+    def clear(cls):
+        '''Discard all of the decoded comments and reset the statistics.'''
+        cls.state.clear()
+        cls.hits = cls.misses = 0
+
+    @classmethod
+    def statistics(cls):
+        '''Return a dictionary containing the number of hits, misses, and entries for the cache.'''
+        return {'hits': cls.hits, 'misses': cls.misses, 'size': len(cls.state), 'capacity': cls.capacity}
+
 ### Tag reference counting
 class tagging(object):
     """
@@ -726,7 +914,9 @@ class tagging(object):
 
     The keys for the dictionaries that store the reference count
     are named according to ``tagging.__tags__`` for the tag names
-    and ``tagging.__address__`` for the tag addresses. In order
+    and ``tagging.__address__`` for the tag addresses. The key for
+    the dictionary that maps each tag name to its addresses is
+    named according to ``tagging.__index__``. In order
     to access the tagging database, the netnode is returned by
     the ``tagging.node()`` function.
 
@@ -737,10 +927,50 @@ class tagging(object):
     """
     __node__ = '$ tagcache'
     __tags__, __address__ = 'name', 'address'
+    __index__ = 'index'
+
+    # The inverted index for the global tags is registered within the hashvals
+    # of our netnode using `itag`. The version of the index is stored in an
+    # altval using `vtag` so that we can tell when it has been built.
+    itag = b'I' if idaapi.__version__ < 7.0 else 0x49
+    vtag = b'V' if idaapi.__version__ < 7.0 else 0x56
+    __index_version__ = 1
+
+    # Each netnode containing the postings for a tag name is named using a
+    # number instead of the tag name. The next number to use is stored in an
+    # altval of our netnode using `ntag`.
+    ntag = b'N' if idaapi.__version__ < 7.0 else 0x4e
+
+    # The progress of seeding the tag-cache is checkpointed into the altvals
+    # of our netnode using `ctag` so that it can be resumed if interrupted.
+    ctag = b'C' if idaapi.__version__ < 7.0 else 0x43
 
     marshaller = __import__('marshal')
     codec = __import__('codecs').lookup('bz2_codec')
 
+    # The current format of the cache is prefixed with a single byte containing
+    # its version followed by the marshalled data compressed with zlib. The
+    # original format was compressed with bz2 and is identified by its magic
+    # which lets us read it so that it gets migrated the next time it's written.
+    compressor = __import__('zlib')
+    __cache_version__ = b'\x02'
+
+    @classmethod
+    def _pack(cls, data):
+        '''Compress the marshalled `data` using the current format and return a tuple of the encoded data and the number of bytes consumed.'''
+        encdata = cls.compressor.compress(data, 1)
+        return cls.__cache_version__ + encdata, len(data)
+
+    @classmethod
+    def _unpack(cls, encdata):
+        '''Decompress the `encdata` in any of the supported formats and return a tuple of the marshalled data and the number of bytes consumed.'''
+        if encdata[:1] == cls.__cache_version__:
+            data = cls.compressor.decompress(encdata[1:])
+            return data, len(encdata)
+
+        # Anything else should be using the original format (bz2).
+        return cls.codec.decode(encdata)
+
     @classmethod
     def __init_tagcache__(cls, idp_modname):
         '''Hook to create a new netnode that will contain our tag-cache.'''
@@ -767,10 +997,43 @@ class tagging(object):
         if node == idaapi.BADADDR:
             node = internal.netnode.new(cls.__node__)
 
+            # Since the tag-cache is brand new, the inverted index for the
+            # global tags is empty and thus is already complete.
+            internal.netnode.alt.set(node, 0, cls.__index_version__, tag=cls.vtag)
+
         # Cache the identifier for the netnode inside a class attribute
         cls.__cache_id__ = node
         return node
 
+    @classmethod
+    def checkpoint(cls, *state):
+        """Return the checkpoint `(address, count)` that was written while seeding the tag-cache or ``None`` if there isn't one.
+
+        If `state` is specified as `(address, count)`, then write it as the checkpoint.
+        The `address` is the last function that was processed or ``None`` if none have.
+        If `state` is specified as ``None``, then remove the checkpoint entirely.
+        """
+        node = cls.node()
+        if not state:
+            if not internal.netnode.alt.get(node, 0, tag=cls.ctag):
+                return None
+            last, count = (internal.netnode.alt.get(node, index, tag=cls.ctag) for index in [1, 2])
+            return last - 1 if last else None, count
+
+        # If we were given None, then we need to remove the checkpoint.
+        elif state == (None,):
+            [ internal.netnode.alt.remove(node, index, tag=cls.ctag) for index in [0, 1, 2] ]
+            return None
+
+        # Otherwise we write each part of the checkpoint into its altval. We
+        # store the address plus one so that we can distinguish the absence
+        # of an address from the first one.
+        address, count = state
+        internal.netnode.alt.set(node, 1, 0 if address is None else 1 + address, tag=cls.ctag)
+        internal.netnode.alt.set(node, 2, count, tag=cls.ctag)
+        internal.netnode.alt.set(node, 0, 1, tag=cls.ctag)
+        return address, count
+
 class contents(tagging):
     '''Tagging for an address within a function (contents)'''
     """
@@ -785,7 +1048,10 @@ class contents(tagging):
     used to retain a dictionary of reference counts for both the tag
     names and the addresses that they reside at. Anytime a tag is
     written or removed, the reference count for both the name and the
-    address is adjusted.
+    address is adjusted. The dictionary also contains an inverted index
+    mapping each tag name to the reference count of every address that
+    uses it. If a function's dictionary was written before this index
+    existed, then the index is left absent until the cache is rebuilt.
 
     Due to a size limit of a blob, the supval for the tagging node is
     used to store the tag names that are used within a function as a
@@ -796,7 +1062,7 @@ class contents(tagging):
     """
 
     ## for each function's content
-    # netnode.blob[fn.start_ea, btag] = marshal.dumps({'name', 'address'})
+    # netnode.blob[fn.start_ea, btag] = marshal.dumps({'name', 'address', 'index'})
     # netnode.sup[fn.start_ea] = marshal.dumps({tagnames})
 
     #btag = idaapi.stag         # XXX: apparently 'S' is used for comments
@@ -806,6 +1072,13 @@ class contents(tagging):
     def _key(cls, ea):
         '''Converts the address `ea` to a key that's used to store contents data for the specified function.'''
 
+        # If the chunk index can tell us the owners of the address, then we
+        # can use them instead of asking the disassembler for everything.
+        res = internal.index.chunks.chunk(ea)
+        if res is not None:
+            owners = res[-1] if res else ()
+            return sorted(owners) if len(owners) > 1 else owners[0] if owners else None
+
         # First we'll need to verify that we're within a function,
         # then we can try and grab the chunk for the given address.
         res = idaapi.get_func(ea)
@@ -874,7 +1147,7 @@ class contents(tagging):
         encdata = view.tobytes()
 
         try:
-            data, sz = cls.codec.decode(encdata)
+            data, sz = cls._unpack(encdata)
             if len(encdata) != sz:
                 raise internal.exceptions.SizeMismatchError(u"{:s}._read_header({!r}, {:#x}) : The number of bytes that was decoded did not match the expected size ({:#x}<>{:#x}).".format('.'.join([__name__, cls.__name__]), target, ea, sz, len(encdata)))
         except Exception as E:
@@ -917,7 +1190,7 @@ class contents(tagging):
             raise internal.exceptions.SerializationError(u"{:s}._write_header({!r}, {:#x}, {!s}) : Unable to marshal the cache header at address {:#x} for the sup cache associated with key {:#x}.".format('.'.join([__name__, cls.__name__]), target, ea, internal.utils.string.repr(value), ea, key))
 
         try:
-            encdata, sz = cls.codec.encode(data)
+            encdata, sz = cls._pack(data)
             if sz != len(data):
                 raise internal.exceptions.SizeMismatchError(u"{:s}._write_header({!r}, {:#x}, {!s}) : The number of bytes that was encoded did not match the expected size ({:#x}<>{:#x}).".format('.'.join([__name__, cls.__name__]), target, ea, internal.utils.string.repr(value), sz, len(data)))
 
@@ -929,6 +1202,11 @@ class contents(tagging):
         if len(encdata) > internal.netnode.sup.MAX_SIZE:
             logging.warning(u"{:s}._write_header({!r}, {:#x}, {!s}) : Reached tag limit size ({:#x}>{:#x}) in function with key {:#x}. Possible tag-cache corruption encountered.".format('.'.join([__name__, cls.__name__]), target, ea, internal.utils.string.repr(value), len(encdata), internal.netnode.sup.MAX_SIZE, key))
 
+        # The header rarely changes, so avoid rewriting it if it's the same.
+        view = internal.netnode.sup.get(node, key, type=memoryview)
+        if view is not None and view.tobytes() == encdata:
+            return True
+
         ok = internal.netnode.sup.set(node, key, encdata)
         return bool(ok)
 
@@ -952,7 +1230,7 @@ class contents(tagging):
             return None
 
         try:
-            data, sz = cls.codec.decode(encdata)
+            data, sz = cls._unpack(encdata)
             if len(encdata) != sz:
                 raise internal.exceptions.SizeMismatchError(u"{:s}._read({!r}, {:#x}) : The number of bytes that was decoded did not match the expected size ({:#x}<>{:#x}).".format('.'.join([__name__, cls.__name__]), target, ea, sz, len(encdata)))
 
@@ -1008,7 +1286,7 @@ class contents(tagging):
             raise internal.exceptions.SerializationError(u"{:s}._write({!r}, {:#x}, {!s}) : Unable to marshal the contents at address {:#x} for the blob cache ({!s}) associated with key {:#x}.".format('.'.join([__name__, cls.__name__]), target, ea, internal.utils.string.repr(value), ea, cls.btag, key))
 
         try:
-            encdata, sz = cls.codec.encode(data)
+            encdata, sz = cls._pack(data)
 
         except Exception as E:
             logging.info(u"{:s}._write({!r}, {:#x}, {!s}) : Error encoding the following data for the blob cache: {!r}.".format('.'.join([__name__, cls.__name__]), target, ea, internal.utils.string.repr(value), data))
@@ -1037,7 +1315,7 @@ class contents(tagging):
         for ea in internal.netnode.sup.fiter(node):
             view = internal.netnode.sup.get(node, ea, type=memoryview)
             encdata = view.tobytes()
-            data, sz = cls.codec.decode(encdata)
+            data, sz = cls._unpack(encdata)
             if len(encdata) != sz:
                 logging.warning(u"{:s}.iterate() : Error while decoding the tag names out of the sup cache for address {:#x} due to the length of encoded data not matching the expected size ({:#x}<>{:#x}).".format('.'.join([__name__, cls.__name__]), ea, len(encdata), sz))
             res = cls.marshaller.loads(data)
@@ -1065,10 +1343,20 @@ class contents(tagging):
             item = cls._read(key, address) or {}
             state, cache = item.get(cls.__tags__, {}), item.get(cls.__address__, {})
 
+            # We only maintain the inverted index if it's already there or the
+            # cache is empty. Otherwise the index would be missing addresses.
+            index = item.get(cls.__index__, {}) if cls.__index__ in item or not state else None
+
             # Update the reference count for the items we were given.
             state[name] = refs = state.get(name, 0) + 1
             cache[address] = cache.get(address, 0) + 1
 
+            # Add the address to the postings for the name if we're indexed.
+            if index is not None:
+                postings = index.setdefault(name, {})
+                postings[address] = postings.get(address, 0) + 1
+                item[cls.__index__] = index
+
             # Figure out whether we're removing the entry for the tags or adding it.
             if state: item[cls.__tags__] = state
             else: del item[cls.__tags__]
@@ -1113,6 +1401,16 @@ class contents(tagging):
             if refs > 0: state[name] = refs
             if count > 0: cache[address] = count
 
+            # If the inverted index is available, then do the same thing to the
+            # postings for the name. We keep the index as long as there's a tag.
+            if cls.__index__ in item:
+                index = item[cls.__index__]
+                postings = index.pop(name, {})
+                references = postings.pop(address, 0) - 1
+                if references > 0: postings[address] = references
+                if postings: index[name] = postings
+                if not state: item.pop(cls.__index__)
+
             # Figure out whether we're removing the names or keeping them.
             if state: item[cls.__tags__] = state
             else: item.pop(cls.__tags__, None)
@@ -1125,6 +1423,53 @@ class contents(tagging):
             _, result = cls._write(key, address, item), result + refs
         return result
 
+    @classmethod
+    def adjust(cls, iterable):
+        """Adjust the ref counts for each `(address, name, delta)` in `iterable` by reading and writing the cache of each function only once.
+
+        Returns the number of functions whose cache was updated.
+        """
+        updates = {}
+        for address, name, delta in iterable:
+            res = cls._key(address)
+            keys = res if isinstance(res, list) else [res]
+            [ updates.setdefault(key, []).append((address, name, delta)) for key in keys ]
+
+        # Now we can go through each function and apply all of its adjustments.
+        for key, items in updates.items():
+            (ea, _, _) = items[0]
+            item = cls._read(key, ea) or {}
+            state, cache = item.get(cls.__tags__, {}), item.get(cls.__address__, {})
+
+            # Only maintain the inverted index if it's there or the cache is empty.
+            index = item.get(cls.__index__, {}) if cls.__index__ in item or not state else None
+
+            # Adjust the reference counts for each name and address exactly like
+            # `contents.inc` or `contents.dec` would, discarding anything empty.
+            for address, name, delta in items:
+                refs, count = state.pop(name, 0) + delta, cache.pop(address, 0) + delta
+                if refs > 0: state[name] = refs
+                if count > 0: cache[address] = count
+
+                if index is not None:
+                    postings = index.pop(name, {})
+                    references = postings.pop(address, 0) + delta
+                    if references > 0: postings[address] = references
+                    if postings: index[name] = postings
+                continue
+
+            # Update the item with our changes and write it back to the cache.
+            if state: item[cls.__tags__] = state
+            else: item.pop(cls.__tags__, None)
+
+            if cache: item[cls.__address__] = cache
+            else: item.pop(cls.__address__, None)
+
+            if state and index is not None: item[cls.__index__] = index
+            else: item.pop(cls.__index__, None)
+            cls._write(key, ea, item)
+        return len(updates)
+
     @classmethod
     def name(cls, address, **target):
         """Return all the tag names (``set``) for the contents of the function `target`.
@@ -1159,6 +1504,43 @@ class contents(tagging):
         res = res.get(cls.__address__, {})
         return sorted(res.keys())
 
+    @classmethod
+    def index(cls, address, **target):
+        """Return a dictionary of each tag name and its addresses (``sorted``) for the contents of the function `target`.
+
+        If the function does not have an inverted index, then return ``None``.
+        If `target` is undefined or ``None`` then use `address` to locate the function.
+        """
+        key = target.get('target', None)
+        res = cls._read(key, address) or {}
+        if cls.__index__ not in res and res.get(cls.__tags__, {}):
+            return None
+        index = res.get(cls.__index__, {})
+        return {name : sorted(postings) for name, postings in index.items()}
+
+    @classmethod
+    def set_index(cls, address, index, **target):
+        """Set the inverted index for the function `target` to the dictionary of tag names and addresses in `index`.
+
+        If `target` is undefined or ``None`` then use `address` to locate the function.
+        """
+        key = target.get('target', None)
+        state = cls._read(key, address) or {}
+
+        res = {name : {ea : count for ea, count in postings.items() if count > 0} for name, postings in index.items()}
+        if state.get(cls.__tags__, {}):
+            state[cls.__index__] = {name : postings for name, postings in res.items() if postings}
+        else:
+            state.pop(cls.__index__, None)
+
+        try:
+            ok = cls._write(key, address, state)
+            if ok:
+                return state
+        except Exception as E:
+            logging.warning(u"{:s}.set_index({:#x}, {!s}{:s}) : An exception {!r} was raised while trying to update the index for address {:#x}.".format('.'.join([__name__, cls.__name__]), address, internal.utils.string.repr(index), ', {:s}'.format(internal.utils.string.kwargs(target)) if target else '', E, address), exc_info=True)
+        raise internal.exceptions.ReadOrWriteError(u"{:s}.set_index({:#x}, {!s}{:s}) : Unable to update the index for address {:#x}.".format('.'.join([__name__, cls.__name__]), address, internal.utils.string.repr(index), ', {:s}'.format(internal.utils.string.kwargs(target)) if target else '', address))
+
     @classmethod
     def set_name(cls, address, name, count, **target):
         """Set the contents tag count for the function `target` and `name` to `count`.
@@ -1173,11 +1555,13 @@ class contents(tagging):
             res[name] = count
         else:
             res.pop(name, None)
+            state.get(cls.__index__, {}).pop(name, None)
 
         if res:
             state[cls.__tags__] = res
         else:
             state.pop(cls.__tags__, None)
+            state.pop(cls.__index__, None)
 
         try:
             ok = cls._write(key, address, state)
@@ -1201,6 +1585,9 @@ class contents(tagging):
             res[address] = count
         else:
             res.pop(address, None)
+            index = state.get(cls.__index__, None)
+            if index is not None:
+                state[cls.__index__] = {name : {ea : refs for ea, refs in postings.items() if ea != address} for name, postings in index.items() if {ea for ea in postings} - {address}}
 
         if res:
             state[cls.__address__] = res
@@ -1226,11 +1613,58 @@ class globals(tagging):
     tag is stored in an altval keyed by the address. The refcount
     for each tag name is stored in a hashval keyed by the tags
     name.
+
+    Next to these refcounts is an inverted index that maps each tag
+    name to the addresses that use it. Each tag name is registered
+    in a hashval (`tagging.itag`) containing the identifier of a
+    separate netnode. The altvals of this netnode are keyed by each
+    address using the tag and are thus iterated in sorted order.
     """
 
     ## FIXME: for each global/function
     # netnode.alt[address] = refcount
     # netnode.hash[name] = refcount
+    # netnode.hash[name, itag] = postings
+    # postings.alt[address] = refcount
+
+    @classmethod
+    def _postings(cls, name, create=False):
+        '''Return the identifier of the netnode containing the addresses for the tag `name`.'''
+        node, eName = tagging.node(), internal.utils.string.to(name)
+        res = internal.netnode.hash.get(node, eName, type=int, tag=tagging.itag)
+        if res or not create:
+            return res or None
+
+        # If the postings for the tag name don't exist, then we need to create
+        # a new netnode for them and register it with our tag-cache. We name
+        # the netnode with the next available number so that its name is not
+        # limited by the length of the tag name.
+        identifier, nodeidx = internal.netnode.alt.get(node, 0, tag=tagging.ntag) or 0, idaapi.BADADDR
+        while nodeidx == idaapi.BADADDR:
+            identifier, nodeidx = identifier + 1, internal.netnode.new(u"{:s}.{:d}".format(cls.__node__, identifier))
+        internal.netnode.alt.set(node, 0, identifier, tag=tagging.ntag)
+        internal.netnode.hash.set(node, eName, nodeidx, tag=tagging.itag)
+        return nodeidx
+
+    @classmethod
+    def _post(cls, address, name, adjustment):
+        '''Adjust the reference count of `address` within the postings for the tag `name` by `adjustment`.'''
+        nodeidx = cls._postings(name, create=adjustment > 0)
+        if nodeidx is None:
+            return 0
+
+        count = (internal.netnode.alt.get(nodeidx, address) or 0) + adjustment
+        if count > 0:
+            internal.netnode.alt.set(nodeidx, address, count)
+            return count
+        internal.netnode.alt.remove(nodeidx, address)
+
+        # If there aren't any addresses left for the tag name, then we can
+        # discard its netnode and remove it from the registry entirely.
+        if not any(True for _ in internal.netnode.alt.fiter(nodeidx)):
+            internal.netnode.remove(nodeidx)
+            internal.netnode.hash.remove(tagging.node(), internal.utils.string.to(name), tag=tagging.itag)
+        return 0
 
     @classmethod
     def inc(cls, address, name):
@@ -1242,6 +1676,7 @@ class globals(tagging):
 
         internal.netnode.hash.set(node, eName, cName)
         internal.netnode.alt.set(node, address, cAddress)
+        cls._post(address, name, +1)
 
         return cName
 
@@ -1262,9 +1697,37 @@ class globals(tagging):
             internal.netnode.alt.remove(node, address)
         else:
             internal.netnode.alt.set(node, address, cAddress)
+        cls._post(address, name, -1)
 
         return cName
 
+    @classmethod
+    def adjust(cls, iterable):
+        """Adjust the global tag counts for each `(address, name, delta)` in `iterable` by updating each name and address only once.
+
+        Returns the number of tag names that were adjusted.
+        """
+        node, names, addresses, pairs = tagging.node(), {}, {}, {}
+        for address, name, delta in iterable:
+            names[name] = names.get(name, 0) + delta
+            addresses[address] = addresses.get(address, 0) + delta
+            pairs[address, name] = pairs.get((address, name), 0) + delta
+
+        # Aggregate the deltas for each tag name and update its hashval.
+        for name, delta in names.items():
+            eName = internal.utils.string.to(name)
+            count = (internal.netnode.hash.get(node, eName, type=int) or 0) + delta
+            internal.netnode.hash.set(node, eName, count) if count > 0 else internal.netnode.hash.remove(node, eName)
+
+        # Then do the exact same thing for each address and its altval.
+        for address, delta in addresses.items():
+            count = (internal.netnode.alt.get(node, address) or 0) + delta
+            internal.netnode.alt.set(node, address, count) if count > 0 else internal.netnode.alt.remove(node, address)
+
+        # Last thing to do is to update the postings in the inverted index.
+        [ cls._post(address, name, delta) for (address, name), delta in pairs.items() if delta ]
+        return len(names)
+
     @classmethod
     def name(cls):
         '''Return all the tag names (``set``) in the specified database (globals and func-tags)'''
@@ -1309,3 +1772,55 @@ class globals(tagging):
             string = internal.utils.string.of(item)
             yield string, count
         return
+
+    @classmethod
+    def indexed(cls):
+        '''Return whether the inverted index of tag names has been built for the globals in the database.'''
+        node = tagging.node()
+        return internal.netnode.alt.get(node, 0, tag=tagging.vtag) == cls.__index_version__
+
+    @classmethod
+    def indices(cls):
+        '''Yield the tag name and the identifier of the netnode containing its addresses for each tag name in the inverted index.'''
+        node = tagging.node()
+        for item, nodeidx in internal.netnode.hash.fitems(node, int, tag=tagging.itag):
+            yield internal.utils.string.of(item), nodeidx
+        return
+
+    @classmethod
+    def postings(cls, name):
+        '''Return the addresses (``sorted``) that are using the global tag `name` according to the inverted index.'''
+        nodeidx = cls._postings(name)
+        return [] if nodeidx is None else [ea for ea in internal.netnode.alt.fiter(nodeidx)]
+
+    @classmethod
+    def reindex(cls, iterable):
+        """Rebuild the inverted index using the address and the tag names for each item in `iterable`.
+
+        Returns the number of tag names that were written to the index.
+        """
+        node = tagging.node()
+
+        # First we need to remove the postings for every tag name that has
+        # already been registered. We also discard the version so that the
+        # index is treated as incomplete if we get interrupted.
+        internal.netnode.alt.remove(node, 0, tag=tagging.vtag)
+        for name, nodeidx in [item for item in cls.indices()]:
+            internal.netnode.remove(nodeidx)
+            internal.netnode.hash.remove(node, internal.utils.string.to(name), tag=tagging.itag)
+
+        # Now we can add each address to the postings for each of its names.
+        names = {item for item in []}
+        for ea, items in iterable:
+            for name in items:
+                cls._post(ea, name, +1)
+            names.update(items)
+
+        # Last thing to do is to write the version to mark the index as built.
+        internal.netnode.alt.set(node, 0, cls.__index_version__, tag=tagging.vtag)
+        return len(names)
+
+    @classmethod
+    def relocate(cls, old, new, size):
+        '''Relocate the addresses within the inverted index from `old` to `new` adjusting them by the specified `size`.'''
+        return sum(internal.netnode.alt.move(nodeidx, old, new, size) for _, nodeidx in cls.indices())
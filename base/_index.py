@@ -0,0 +1,501 @@
+"""
+Index module (internal)
+
+This module contains the indices that are kept in memory in order to
+avoid having to scan every item within the database when looking for
+something in particular. Each index is built on demand and is expected
+to be kept up to date by the hooks that are responsible for it.
+This is an internal module and is not expected to be used by the user.
+"""
+
+import bisect, logging, itertools, functools, collections, array
+import idaapi
+
+import internal
+
+class names(object):
+    """
+    This namespace is an index of the names for each address within the
+    database. Each address may be indexed by several names (such as its
+    mangled and demangled form) which are kept as a sorted list of the
+    case-folded name and its address. This allows one to find the
+    addresses with a name that begins with a prefix using a binary search.
+
+    As the glob or regular-expression used for matching a name is anchored
+    at its beginning, the literal prefix of each can be used to narrow the
+    addresses that need to be checked. The results are a superset of the
+    addresses that match and are expected to be filtered by the caller.
+    """
+    __keys__, __names__ = None, {}
+
+    # The characters that can follow a literal in a regular expression
+    # which makes it optional, and the characters which have meaning.
+    __optional__ = {'*', '?', '{'}
+    __special__ = {'.', '^', '$', '*', '+', '?', '{', '}', '[', ']', '\\', '|', '(', ')'}
+
+    @classmethod
+    def built(cls):
+        '''Return whether the index has been built.'''
+        return cls.__keys__ is not None
+
+    @classmethod
+    def reset(cls, *args):
+        '''Discard the index so that it gets built again the next time it is used.'''
+        cls.__keys__, cls.__names__ = None, {}
+
+    @classmethod
+    def build(cls, iterable):
+        '''Build the index from the specified `iterable` of `(address, names)` tuples.'''
+        keys, names = [], {}
+        for ea, items in iterable:
+            items = names[ea] = tuple({item for item in items if item})
+            keys.extend((item.lower(), ea) for item in items)
+        keys.sort()
+        cls.__keys__, cls.__names__ = keys, names
+        logging.debug(u"{:s}.build(...) : Built the name index with {:d} key{:s} for {:d} address{:s}.".format('.'.join([__name__, cls.__name__]), len(keys), '' if len(keys) == 1 else 's', len(names), '' if len(names) == 1 else 'es'))
+        return len(keys)
+
+    @classmethod
+    def set(cls, ea, items):
+        '''Replace the names that are indexed for the address `ea` with the ones in `items`.'''
+        if not cls.built():
+            return False
+        cls.remove(ea)
+
+        keys, items = cls.__keys__, tuple({item for item in items if item})
+        [ bisect.insort(keys, (item.lower(), ea)) for item in items ]
+        cls.__names__[ea] = items
+        return True
+
+    @classmethod
+    def remove(cls, ea):
+        '''Remove the names that are indexed for the address `ea`.'''
+        if not cls.built():
+            return False
+
+        keys = cls.__keys__
+        for item in cls.__names__.pop(ea, ()):
+            index = bisect.bisect_left(keys, (item.lower(), ea))
+            if index < len(keys) and keys[index] == (item.lower(), ea):
+                del keys[index]
+            continue
+        return True
+
+    @classmethod
+    def prefix(cls, prefix):
+        '''Return a sorted list of the addresses with a name that begins with `prefix` ignoring its case.'''
+        keys, folded = cls.__keys__ or [], prefix.lower()
+        index = bisect.bisect_left(keys, (folded,))
+        iterable = itertools.takewhile(lambda key_ea: key_ea[0].startswith(folded), itertools.islice(keys, index, None))
+        return sorted({ea for _, ea in iterable})
+
+    @classmethod
+    def like(cls, glob):
+        '''Return a sorted list of the addresses that might have a name matching `glob` or ``None`` if it can't be narrowed.'''
+        prefix = ''.join(itertools.takewhile(lambda ch: ch not in {'*', '?', '['}, glob))
+        return cls.prefix(prefix) if prefix else None
+
+    @classmethod
+    def regex(cls, pattern):
+        '''Return a sorted list of the addresses that might have a name matching the regular expression `pattern` or ``None`` if it can't be narrowed.'''
+        items = []
+        for ch, next in zip(pattern, itertools.chain(pattern[1:], [None])):
+            if ch in cls.__special__:
+                break
+
+            # If the next character makes this one optional, then we can't use it.
+            elif next in cls.__optional__:
+                break
+            items.append(ch)
+
+        # Alternations could make the entire prefix optional.
+        prefix = ''.join(items) if '|' not in pattern else ''
+        return cls.prefix(prefix) if prefix else None
+
+class chunks(object):
+    """
+    This namespace is an index of the boundaries of every function chunk
+    within the database and the functions that own them. The chunks are
+    kept as sorted lists of their starting and stopping addresses so that
+    the chunk containing an address can be found with a binary search.
+
+    The hooks that modify a function are responsible for invalidating the
+    range of addresses that are being changed. If the range is invalidated
+    before the change has been made, it is considered as pending and any
+    address within it is looked up with the disassembler instead. Once the
+    next change is made, the pending ranges are considered dirty and the
+    chunks within them will be read again the next time the index is used.
+    """
+    __starts__ = __stops__ = __owners__ = None
+    __pending__, __dirty__ = [], []
+
+    @classmethod
+    def built(cls):
+        '''Return whether the index has been built.'''
+        return cls.__starts__ is not None
+
+    @classmethod
+    def reset(cls, *args):
+        '''Discard the index so that it gets built again the next time it is used.'''
+        cls.__starts__ = cls.__stops__ = cls.__owners__ = None
+        cls.__pending__, cls.__dirty__ = [], []
+
+    @classmethod
+    def __parents__(cls, ch):
+        '''Return a tuple of the addresses for each function that owns the chunk `ch`.'''
+        if not ch.flags & idaapi.FUNC_TAIL:
+            return internal.interface.range.start(ch),
+
+        # If we can't seek to the first parent, then we fall back to the owner.
+        iterator = idaapi.func_parent_iterator_t(ch)
+        if not iterator.first():
+            return (ch.owner,) if ch.refqty else ()
+
+        items = [iterator.parent()]
+        while iterator.next():
+            items.append(iterator.parent())
+        return tuple(items)
+
+    @classmethod
+    def __fetch__(cls, left, right):
+        '''Return a list of the `(start, stop, owners)` for each chunk from the disassembler that overlaps the range from `left` to `right`.'''
+        items, ch = [], idaapi.get_fchunk(left) or idaapi.get_next_fchunk(left)
+        while ch and internal.interface.range.start(ch) < right:
+            start, stop = internal.interface.range.bounds(ch)
+            items.append((start, stop, cls.__parents__(ch)))
+            ch = idaapi.get_next_fchunk(start)
+        return items
+
+    @classmethod
+    def owners(cls, left, right):
+        '''Return a sorted list of the functions owning each chunk from the disassembler that overlaps the range from `left` to `right`.'''
+        return sorted({owner for _, _, owners in cls.__fetch__(left, right) for owner in owners})
+
+    @classmethod
+    def build(cls):
+        '''Build the index from every function chunk within the database.'''
+        items = cls.__fetch__(0, idaapi.BADADDR)
+        cls.__starts__, cls.__stops__, cls.__owners__ = ([item[index] for item in items] for index in range(3))
+        cls.__pending__, cls.__dirty__ = [], []
+        logging.debug(u"{:s}.build() : Built the chunk index with {:d} chunk{:s}.".format('.'.join([__name__, cls.__name__]), len(items), '' if len(items) == 1 else 's'))
+        return len(items)
+
+    @classmethod
+    def invalidate(cls, left, right, pending=False):
+        '''Invalidate the chunks from `left` to `right`. If `pending` is true, then the chunks have not been changed yet.'''
+        if cls.built():
+            ranges = cls.__pending__ if pending else cls.__dirty__
+            ranges.append((left, max(right, left + 1)))
+        return
+
+    @classmethod
+    def settle(cls):
+        '''Consider each of the pending ranges as dirty now that their changes have been made.'''
+        cls.__dirty__.extend(cls.__pending__)
+        cls.__pending__ = []
+
+    @classmethod
+    def __refresh__(cls, left, right):
+        '''Read the chunks from the disassembler that overlap the range from `left` to `right` and replace them in the index.'''
+        starts, stops = cls.__starts__, cls.__stops__
+        while True:
+            lower, upper = bisect.bisect_right(stops, left), bisect.bisect_left(starts, right)
+            start, stop = min([left] + starts[lower : upper]), max([right] + stops[lower : upper])
+            items = cls.__fetch__(start, stop)
+
+            # Keep expanding the range until it covers both the chunks
+            # in the index and the chunks that we read for it.
+            start, stop = min([start] + [item[0] for item in items]), max([stop] + [item[1] for item in items])
+            if (start, stop) == (left, right):
+                break
+            left, right = start, stop
+
+        # Now we can replace the chunks within the range with our new ones.
+        for index, target in enumerate([cls.__starts__, cls.__stops__, cls.__owners__]):
+            target[lower : upper] = [item[index] for item in items]
+        return len(items)
+
+    @classmethod
+    def chunk(cls, ea):
+        """Return the tuple `(start, stop, owners)` for the chunk containing the address `ea`.
+
+        If the address is not within a chunk, then return an empty tuple. If the
+        index is unable to determine the chunk, then ``None`` will be returned.
+        """
+        if idaapi.__version__ < 7.0 or any(left <= ea < right for left, right in cls.__pending__):
+            return None
+        elif not cls.built():
+            cls.build()
+
+        # If there's any dirty ranges, then refresh them before we search.
+        if cls.__dirty__:
+            [ cls.__refresh__(left, right) for left, right in cls.__dirty__ ]
+            cls.__dirty__ = []
+
+        index = bisect.bisect_right(cls.__starts__, ea) - 1
+        if 0 <= index and ea < cls.__stops__[index]:
+            return cls.__starts__[index], cls.__stops__[index], cls.__owners__[index]
+        return ()
+
+class flowchart(object):
+    """
+    This namespace is a cache of the flowcharts that have been built for
+    the functions within the database. Each flowchart is keyed by the
+    address of its function and the flags (``idaapi.FC_*``) it was built
+    with, and is stored as a ``flowchart.graph`` containing arrays for
+    the boundaries of each block and the indices of their successors and
+    predecessors. This way the flowchart of a function only needs to be
+    built once for every query until something within it has changed.
+
+    The hooks that modify a function or create code are responsible for
+    removing the flowcharts of the functions that have been changed. Only
+    the most recently used flowcharts are kept to limit the memory used.
+    """
+    __cache__, __limit__ = collections.OrderedDict(), 0x400
+
+    class graph(object):
+        """
+        This object represents a flowchart as a number of arrays. The
+        blocks are numbered by their order in the flowchart alongside the
+        identifier that was assigned to them by the disassembler. The edges
+        of each block are stored in a single array of indices with an array
+        of offsets for where the edges of each block begin. The starting
+        addresses are also kept sorted alongside the index of their block
+        so that the block containing an address can be found using bisect.
+        """
+        __typecode__ = 'Q' if 'Q' in getattr(array, 'typecodes', '') else 'L'
+        __slots__ = ('ids', 'starts', 'stops', 'succ_offsets', 'successors', 'pred_offsets', 'predecessors', 'keys', 'order', 'memo')
+
+        def __init__(self, items):
+            '''Create a flowchart from a list of `(id, start, stop, successors, predecessors)` tuples where the edges are the indices of other blocks.'''
+            typecode = self.__typecode__
+            self.ids = array.array('l', [id for id, _, _, _, _ in items])
+            self.starts, self.stops = (array.array(typecode, [item[index] for item in items]) for index in [1, 2])
+            self.succ_offsets, self.successors = self.__pack__([succs for _, _, _, succs, _ in items])
+            self.pred_offsets, self.predecessors = self.__pack__([preds for _, _, _, _, preds in items])
+
+            # Sort the blocks by their address so that we can search for them.
+            order = sorted(range(len(items)), key=lambda index: (items[index][1], items[index][2]))
+            self.keys, self.order = array.array(typecode, [items[index][1] for index in order]), array.array('l', order)
+
+            # Anything that is calculated from the flowchart is kept here.
+            self.memo = {}
+
+        @staticmethod
+        def __pack__(edges):
+            '''Return the offsets and the indices as arrays for the list of `edges` for each block.'''
+            offsets, indices = array.array('l', [0]), array.array('l')
+            for items in edges:
+                indices.extend(items)
+                offsets.append(len(indices))
+            return offsets, indices
+
+        def __len__(self):
+            return len(self.starts)
+
+        def bounds(self, index):
+            '''Return the boundaries of the block at the specified `index`.'''
+            return self.starts[index], self.stops[index]
+
+        def succs(self, index):
+            '''Return a list of the indices for the successors of the block at `index`.'''
+            return self.successors[self.succ_offsets[index] : self.succ_offsets[index + 1]].tolist()
+
+        def preds(self, index):
+            '''Return a list of the indices for the predecessors of the block at `index`.'''
+            return self.predecessors[self.pred_offsets[index] : self.pred_offsets[index + 1]].tolist()
+
+        def __traverse__(self, indices, offsets, edges):
+            '''Return a set of the indices for the blocks reachable from `indices` by following the `edges` at each of the `offsets`.'''
+            visited, stack = set(), [index for index in indices]
+            while stack:
+                index = stack.pop()
+                if index in visited:
+                    continue
+                visited.add(index)
+                stack.extend(item for item in edges[offsets[index] : offsets[index + 1]] if item not in visited)
+            return visited
+
+        def reachable(self, indices):
+            '''Return a set of the indices for the blocks that can be reached from any of the blocks in `indices`.'''
+            return self.__traverse__(indices, self.succ_offsets, self.successors)
+
+        def coreachable(self, indices):
+            '''Return a set of the indices for the blocks that can reach any of the blocks in `indices`.'''
+            return self.__traverse__(indices, self.pred_offsets, self.predecessors)
+
+        def __dominators__(self, roots, offsets, edges, reverse_offsets, reverse_edges):
+            """Return a dictionary of the immediate dominator for each block reachable from `roots` by following the `edges` at each of the `offsets`.
+
+            This is the iterative algorithm by Cooper, Harvey, and Kennedy. The
+            roots are treated as the successors of a virtual block, so the blocks
+            that are only dominated by the virtual block will have ``None`` as
+            their immediate dominator.
+            """
+            virtual, rootset = len(self), {index for index in roots}
+            roots = sorted(rootset)
+            succs = lambda index: roots if index == virtual else edges[offsets[index] : offsets[index + 1]]
+            preds = lambda index: itertools.chain(reverse_edges[reverse_offsets[index] : reverse_offsets[index + 1]], [virtual] if index in rootset else [])
+
+            # Number each block by its postorder using a depth-first search.
+            order, visited, stack = [], {virtual}, [(virtual, iter(succs(virtual)))]
+            while stack:
+                index, iterable = stack[-1]
+                item = next((item for item in iterable if item not in visited), None)
+                if item is None:
+                    order.append(stack.pop()[0])
+                    continue
+                visited.add(item)
+                stack.append((item, iter(succs(item))))
+            number = {index : position for position, index in enumerate(order)}
+
+            # Walk up the dominators of both blocks until we find the common one.
+            def intersect(a, b):
+                while a != b:
+                    while number[a] < number[b]:
+                        a = doms[a]
+                    while number[b] < number[a]:
+                        b = doms[b]
+                return a
+
+            # Process every block in reverse postorder until nothing changes.
+            doms, changed = {virtual : virtual}, True
+            while changed:
+                changed = False
+                for index in reversed(order[:-1]):
+                    processed = [item for item in preds(index) if item in doms]
+                    dominator = functools.reduce(intersect, processed[1:], processed[0])
+                    if doms.get(index, None) != dominator:
+                        doms[index], changed = dominator, True
+                    continue
+                continue
+            doms.pop(virtual)
+            return {index : None if dominator == virtual else dominator for index, dominator in doms.items()}
+
+        def dominators(self, entry):
+            '''Return a dictionary of the immediate dominator for each block that is reachable from the block at the index `entry`.'''
+            key = 'dominators', entry
+            if key not in self.memo:
+                self.memo[key] = self.__dominators__([entry], self.succ_offsets, self.successors, self.pred_offsets, self.predecessors)
+            return self.memo[key]
+
+        def postdominators(self):
+            '''Return a dictionary of the immediate post-dominator for each block that can reach a block without any successors.'''
+            key = 'postdominators',
+            if key not in self.memo:
+                exits = [index for index in range(len(self)) if self.succ_offsets[index] == self.succ_offsets[index + 1]]
+                self.memo[key] = self.__dominators__(exits, self.pred_offsets, self.predecessors, self.succ_offsets, self.successors)
+            return self.memo[key]
+
+        def loops(self, entry):
+            '''Return a dictionary of the indices for the blocks in each natural loop keyed by the index of its header.'''
+            key = 'loops', entry
+            if key in self.memo:
+                return self.memo[key]
+
+            # Each edge to a block that dominates its source is a back edge.
+            doms, loops = self.dominators(entry), {}
+            for index in sorted(doms):
+                for header in self.succs(index):
+                    dominator = index
+                    while dominator is not None and dominator != header:
+                        dominator = doms[dominator]
+                    if dominator is None:
+                        continue
+
+                    # The body of the loop is every block that can reach the source of the
+                    # back edge without going through the header of the loop.
+                    body = loops.setdefault(header, {header})
+                    stack = [index]
+                    while stack:
+                        item = stack.pop()
+                        if item in body:
+                            continue
+                        body.add(item)
+                        stack.extend(pred for pred in self.preds(item) if pred in doms and pred not in body)
+                    continue
+                continue
+            self.memo[key] = loops
+            return loops
+
+        def find(self, ea):
+            '''Return the index of the block containing the address `ea` or ``None`` if there isn't one.'''
+            position = bisect.bisect_right(self.keys, ea)
+            if position > 0:
+                index = self.order[position - 1]
+                start, stop = self.starts[index], self.stops[index]
+                if start <= ea < stop or start == ea == stop:
+                    return index
+            return None
+
+        def __repr__(self):
+            cls = self.__class__
+            return "<{:s} blocks={:d} edges={:d}>".format('.'.join([__name__, 'flowchart', cls.__name__]), len(self), len(self.successors))
+
+    @classmethod
+    def reset(cls, *args):
+        '''Discard every flowchart within the cache.'''
+        cls.__cache__.clear()
+
+    @classmethod
+    def get(cls, ea, flags):
+        '''Return the flowchart cached for the function at `ea` with the specified `flags` or ``None`` if it wasn't cached.'''
+        key = ea, flags
+        res = cls.__cache__.pop(key, None)
+        if res is not None:
+            cls.__cache__[key] = res
+        return res
+
+    @classmethod
+    def set(cls, ea, flags, graph):
+        '''Cache the flowchart `graph` for the function at `ea` with the specified `flags`.'''
+        cache = cls.__cache__
+        cache.pop((ea, flags), None)
+        cache[ea, flags] = graph
+
+        # Discard the flowcharts that were least recently used.
+        while len(cache) > cls.__limit__:
+            cache.popitem(last=False)
+        return graph
+
+    @classmethod
+    def remove(cls, ea):
+        '''Remove every flowchart that has been cached for the function at `ea`.'''
+        keys = [key for key in cls.__cache__ if key[0] == ea]
+        [ cls.__cache__.pop(key) for key in keys ]
+        return len(keys)
+
+class calls(object):
+    """
+    This namespace is a cache of the addresses of the call instructions
+    within each function. The addresses are kept as a sorted array for
+    each function so that the calls within a range of addresses, such as
+    a basic block, can be found using a binary search instead of having
+    to decode every instruction within the range.
+
+    The hooks that remove the flowcharts of a function are responsible
+    for removing the calls that were cached for the same function.
+    """
+    __cache__ = {}
+    __typecode__ = flowchart.graph.__typecode__
+
+    @classmethod
+    def reset(cls, *args):
+        '''Discard the calls that were cached for every function.'''
+        cls.__cache__.clear()
+
+    @classmethod
+    def get(cls, ea):
+        '''Return the sorted addresses of the calls cached for the function at `ea` or ``None`` if they weren't cached.'''
+        return cls.__cache__.get(ea, None)
+
+    @classmethod
+    def set(cls, ea, addresses):
+        '''Cache the `addresses` of the calls within the function at `ea`.'''
+        res = cls.__cache__[ea] = array.array(cls.__typecode__, sorted(addresses))
+        return res
+
+    @classmethod
+    def remove(cls, ea):
+        '''Remove the calls that were cached for the function at `ea`.'''
+        return cls.__cache__.pop(ea, None) is not None
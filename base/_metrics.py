@@ -0,0 +1,81 @@
+"""
+Metrics module (internal)
+
+This module contains the cache for the metrics that are calculated for
+each function within the database. These metrics are things such as the
+number of basic blocks, exits, references, arguments, or local variables
+that are expensive to recalculate every time a function is listed.
+
+Each record is stored within a netnode keyed by the function's address
+and is removed by the hooks whenever something that it counts changes.
+This is an internal module and is not expected to be used by the user.
+"""
+
+import six, struct, logging
+import idaapi
+
+import internal
+
+class function(object):
+    """
+    This namespace is used for reading and writing the metrics for each
+    function that are cached within the database. The metrics are stored
+    as a supval of the netnode named according to ``function.__node__``
+    using the address of the function as its index.
+
+    Each record is prefixed by a single byte containing its version
+    followed by each of the fields within ``function.__fields__``.
+    """
+    __node__ = '$ minsc.metrics'
+    __version__ = 1
+    __fields__ = ('chunks', 'blocks', 'exits', 'refs', 'args', 'lvars', 'flags', 'tries', 'cpp', 'handlers')
+    __format__ = struct.Struct("<B{:d}Q".format(len(__fields__)))
+
+    @classmethod
+    def node(cls):
+        '''Return the netnode containing the metrics for each function creating it if necessary.'''
+        node = internal.netnode.get(cls.__node__)
+        return internal.netnode.new(cls.__node__) if node == idaapi.BADADDR else node
+
+    @classmethod
+    def get(cls, ea):
+        '''Return a dictionary of the metrics cached for the function at `ea` or ``None`` if there aren't any.'''
+        node = internal.netnode.get(cls.__node__)
+        if node == idaapi.BADADDR:
+            return None
+
+        # The record is binary, so we need to read it as a memoryview to avoid
+        # it being truncated at the first null byte like a string would be.
+        view = internal.netnode.sup.get(node, ea, type=memoryview)
+        encoded = view.tobytes() if view else b''
+        if len(encoded) != cls.__format__.size:
+            return None
+
+        # If the version is different, then this record is useless to us.
+        res = cls.__format__.unpack(encoded)
+        version, items = res[0], res[1:]
+        if version != cls.__version__:
+            logging.info(u"{:s}.get({:#x}) : Ignoring the metrics cached for the function at {:#x} due to its version ({:d}) being different from {:d}.".format('.'.join([__name__, cls.__name__]), ea, ea, version, cls.__version__))
+            return None
+        return {name : value for name, value in zip(cls.__fields__, items)}
+
+    @classmethod
+    def set(cls, ea, metrics):
+        '''Write the dictionary of `metrics` for the function at `ea` into the cache.'''
+        items = [metrics.get(name, 0) for name in cls.__fields__]
+        encoded = cls.__format__.pack(cls.__version__, *items)
+        return internal.netnode.sup.set(cls.node(), ea, encoded)
+
+    @classmethod
+    def remove(cls, ea):
+        '''Remove the metrics that were cached for the function at `ea`.'''
+        node = internal.netnode.get(cls.__node__)
+        if node == idaapi.BADADDR:
+            return False
+        return internal.netnode.sup.remove(node, ea)
+
+    @classmethod
+    def clear(cls):
+        '''Remove the metrics that were cached for every function.'''
+        node = internal.netnode.get(cls.__node__)
+        return node != idaapi.BADADDR and internal.netnode.remove(node)
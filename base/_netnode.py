@@ -69,6 +69,10 @@ class netnode(object):
     altset = _ida_netnode.netnode_altset
     altval = _ida_netnode.netnode_altval
 
+    # Shifting a range of altvals might not be available in IDAPython, so if
+    # it isn't then we leave it as None so that it can be done manually.
+    altshift = _ida_netnode.netnode_altshift if hasattr(_ida_netnode, 'netnode_altshift') else None
+
     charlast = _ida_netnode.netnode_charlast
     charprev = _ida_netnode.netnode_charprev
     chardel = _ida_netnode.netnode_chardel
@@ -203,6 +207,15 @@ class utils(object):
             yield end, val(node, end, tag)
         return
 
+    @classmethod
+    def valfbounds(cls, node, left, right, first, next, val, tag):
+        '''Iterate through the values for a netnode in order from the index `left` up to `right`, and yield the (item, value) for each item that was found for the given tag.'''
+        start = next(node, left - 1, tag) if left > 0 else first(node, tag)
+        while start not in {None, idaapi.BADADDR} and start < right:
+            yield start, val(node, start, tag)
+            start = next(node, start, tag)
+        return
+
     @classmethod
     def hfiter(cls, node, first, last, next, val, tag):
         '''Iterate through all of the hash values for a netnode in order, and yield the (item, value) for each item that was found for the given tag.'''
@@ -250,6 +263,12 @@ class utils(object):
             yield item
         return
     @classmethod
+    def faltbounds(cls, node, left, right, tag=netnode.alttag):
+        '''Iterate through each "altval" for a given `node` from the index `left` up to `right` in order, and yield each (item, value) that was found.'''
+        for item in cls.valfbounds(node, left, right, netnode.altfirst, netnode.altnext, netnode.altval, tag=tag):
+            yield item
+        return
+    @classmethod
     def ralt(cls, node, tag=netnode.alttag):
         '''Iterate through each "altval" for a given `node` in reverse order, and yield each (item, value) that was found.'''
         for item in cls.valriter(node, netnode.altfirst, netnode.altlast, netnode.altprev, netnode.altval, tag=tag):
@@ -545,6 +564,28 @@ class alt(object):
             yield nalt, altval
         return
 
+    @classmethod
+    def fbounds(cls, nodeidx, start, stop, tag=None):
+        '''Iterate through the elements of the "altval" array belonging to the netnode identified by `nodeidx` from the index `start` up to `stop` in order.'''
+        node = utils.get(nodeidx)
+        for nalt, altval in utils.faltbounds(node, start, stop, tag=tag or netnode.alttag):
+            yield nalt, altval
+        return
+
+    @classmethod
+    def move(cls, nodeidx, start, target, size, tag=None):
+        '''Move the elements of the "altval" array belonging to the netnode identified by `nodeidx` from the index `start` to `target` for the specified `size` and return the number that were moved.'''
+        node = utils.get(nodeidx)
+        if netnode.altshift is not None:
+            return netnode.altshift(node, start, target, size, tag or netnode.alttag)
+
+        # Collect all the elements before moving any of them just in case
+        # the source and destination happen to overlap.
+        items = [item for item in utils.faltbounds(node, start, start + size, tag=tag or netnode.alttag)]
+        [ netnode.altdel(node, index, tag or netnode.alttag) for index, _ in items ]
+        [ netnode.altset(node, target + (index - start), value, tag or netnode.alttag) for index, value in items ]
+        return len(items)
+
     @classmethod
     def riter(cls, nodeidx, tag=None):
         '''Iterate through all of the indexes of the "altval" array belonging to the netnode identified by `nodeidx` in reverse order.'''
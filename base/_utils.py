@@ -11,7 +11,7 @@ import six, builtins
 
 import os, logging, types, weakref
 import functools, operator, itertools
-import sys, heapq, collections, array, math
+import sys, time, heapq, collections, array, math
 
 import internal
 import idaapi
@@ -332,6 +332,18 @@ class multicase(object):
     CO_FUTURE_GENERATOR_STOP    = 0x80000
 
     cache_name = '__multicase_cache__'
+    table_name = '__multicase_table__'
+    dispatch_name = '__multicase_dispatch__'
+
+    # Instances of these types can not be distinguished from one another by
+    # their type alone (old-style classes), so they're never used as a key
+    # when caching which case was resolved for a set of parameters.
+    dispatch_uncacheable = {item for item in [getattr(types, 'InstanceType', None)] if item}
+
+    # These are used when profiling the dispatch of multicased functions. The
+    # results are keyed by the full name of each function and then by the case.
+    profiling, profile_results = False, {}
+    profile_clock = getattr(time, 'perf_counter', time.time)
 
     def __new__(cls, *other, **t_args):
         '''Decorate a case of a function with the specified types.'''
@@ -391,6 +403,7 @@ class multicase(object):
                 # it does, then we can update the entry and its documentation.
                 if current == (tuple(t.get(_, None) for _ in a[1]), a[3]):
                     cache[i] = priority_tuple(priority, (func, t_args, argtuple))
+                    cls.recompile(res, cache)
                     res.__doc__ = cls.document(func.__name__, [item for _, item in cache])
                     return cons(res)
                 continue
@@ -400,6 +413,11 @@ class multicase(object):
             heapq.heappush(cache, priority_tuple(priority, (func, t_args, argtuple)))
             #heapq.heappush(cache, (priority, (func, t_args, argtuple)))
 
+            # Since we've added a new case, we need to rebuild the table that is used
+            # to match against. Any of the cases that were previously resolved for a
+            # set of parameters might now be different, so we discard them too.
+            cls.recompile(res, cache)
+
             # Completely regenerate the documentation using what we have in the cache.
             res.__doc__ = cls.document(func.__name__, [item for _, item in cache])
 
@@ -517,108 +535,101 @@ class multicase(object):
         return "{:s}({:s})".format(pycompat.function.name(function), ', '.join(itertools.chain(*items)))
 
     @classmethod
-    def match(cls, packed_parameters, heap):
-        '''Given the (`args`, `kwds`) stored in the `packed_parameters`, find the correct function according to the constraints of each member in the `heap`.'''
-        args, kwds = packed_parameters
+    def compile(cls, cache):
+        '''Return a table of the cases within `cache` that are sorted by their priority and precompiled for matching.'''
+        table = []
+
+        # Sort our cases by their priority once, so that we don't need to do this
+        # every single time that the function is called. Then we can precompute
+        # everything for each case that doesn't depend on the parameter values.
+        for _, item in sorted(cache, key=operator.attrgetter('priority')):
+            F, constraints, (parameter_ignore_count, parameter_names, parameter_defaults, (parameter_wildargs, parameter_wildkeywords)) = item
+            names = builtins.tuple(parameter_names[parameter_ignore_count:])
+
+            # Convert each of our constraints into a tuple containing the index of the
+            # parameter and the types to check it with. If the constraint is a callable,
+            # then we use None so that we know to check it with builtins.callable.
+            checks = builtins.tuple((index, None if constraints[name] == builtins.callable else constraints[name]) for index, name in enumerate(names) if name in constraints)
+
+            # Now we can pack everything into a tuple. We also include the original
+            # case so that we can describe it if none of the cases match.
+            defaults = {name : value for name, value in parameter_defaults.items()}
+            table.append((F, parameter_ignore_count, names, defaults, bool(parameter_wildargs), bool(parameter_wildkeywords), checks, item))
+        return table
 
-        # Iterate through all the available functions/cases within the heap that
-        # we were given. This is being done in O(n) time which can be significantly
-        # improved because we should be being sorted by complexity and count. This
-        # really should allow use to start searching closer to the item in the list
-        # that matches our parameters that we're searching with.
-        for F, constraints, (parameter_ignore_count, parameter_names, parameter_defaults, (parameter_wildargs, parameter_wildkeywords)) in heap:
-
-            # Grab our values that we're going to match with.
-            parameter_iterator, parameter_keywords = (item for item in args), {kwparam : kwvalue for kwparam, kwvalue in kwds.items()}
-
-            # Skip the ignored argument values within our parameters.
-            [next(item) for item in [parameter_iterator] * parameter_ignore_count]
-
-            # Build the argument tuple that contains the actual parameters that
-            # will be passed to the matched function. When we collect the arguments,
-            # we need to ensure that any keywords parameters and default parameters
-            # will be inserted into the correct place within the tuple.
-            parameter_values = []
-            for name in parameter_names[parameter_ignore_count:]:
-                try:
-                    value = next(parameter_iterator)
-
-                # If there were no parameters left within our iterator, then we
-                # need to apply any keywords that we were given.
-                except StopIteration:
-                    if name in parameter_keywords:
-                        value = parameter_keywords.pop(name)
-
-                    # If there weren't any keywords with our parameter name, then
-                    # we need to check to see if there's a default parameter to use.
-                    elif name in parameter_defaults:
-                        value = parameter_defaults.pop(name)
-
-                    # If there were no default parameters, then we need to leave
-                    # because we don't have a way to grab any more parameters.
-                    else:
-                        break
-
-                    # We were able to get a keyword or default parameter, so we can
-                    # add it to our arguments to match with.
-                    parameter_values.append(value)
-
-                # We consumed a parameter value, so we can now append it to our arguments
-                # that we will match against.
-                else:
-                    parameter_values.append(value)
-                continue
+    @classmethod
+    def recompile(cls, wrapper, cache):
+        '''Rebuild the table of cases for the specified `wrapper` from `cache` and discard any of the cases that it has already resolved.'''
+        getattr(wrapper, cls.table_name)[:] = cls.compile(cache)
+        getattr(wrapper, cls.dispatch_name).clear()
 
-            # Now that we have our parameter values, we need to convert it into a tuple
-            # so that we can process and use it. Any parameters left in parameter_iterator
-            # or parameter_keywords are considered part of the wildcard parameters.
-            argument_values = builtins.tuple(parameter_values)
-            argument_wildcard, argument_keywords = [item for item in parameter_iterator], {kwparam : kwvalue for kwparam, kwvalue in parameter_keywords.items()}
+    @classmethod
+    def match(cls, packed_parameters, table):
+        '''Given the (`args`, `kwds`) stored in the `packed_parameters`, find the correct function according to the constraints of each case in the precompiled `table`.'''
+        args, kwds = packed_parameters
+        count = len(args)
 
-            # First check if we have any extra parameters. If we do, but there's no wildcards
-            # available in our current match, then it doesn't fit and we move onto the next one.
-            if not parameter_wildargs and len(argument_wildcard):
-                continue
+        # Iterate through all the available functions/cases within the table that
+        # we were given. These are already sorted by their complexity and count,
+        # and so the first one that matches our parameters is the one we use.
+        for F, parameter_ignore_count, parameter_names, parameter_defaults, parameter_wildargs, parameter_wildkeywords, checks, _ in table:
+            available, required = count - parameter_ignore_count, len(parameter_names)
 
-            # If we have any extra keywords, then we need to ensure that there's a keyword
-            # parameter in our current match. Otherwise, it doesn't fit and we need to move on.
-            elif not parameter_wildkeywords and argument_keywords:
+            # First check if we were given too many (or too few) positional parameters. If
+            # our case doesn't take a wildcard parameter, then they shouldn't be extras.
+            if available < 0 or available > required and not parameter_wildargs:
                 continue
 
-            # Second, we need to check that our argument length actually matches. To accomplish
-            # this, we need to check if our function can take a wildcard parameter. If so, then
-            # we need to ensure that the number of parameters that we were given are larger than
-            # what was required.
-            if parameter_wildargs and parameter_ignore_count + len(argument_values) < len(parameter_names):
-                continue
+            # If we were given enough positional parameters without any keywords, then we
+            # can just slice them out of our arguments. This is our most common case.
+            elif available >= required and not kwds:
+                argument_values, argument_keywords = args[parameter_ignore_count : parameter_ignore_count + required], {}
 
-            # If our function doesn't take a wildcard parameter, then our number of arguments
-            # should match what we were given. If they don't, then skip onto the next one.
-            elif not parameter_wildargs and parameter_ignore_count + len(argument_values) != len(parameter_names):
-                continue
+            # Otherwise, we need to fill in the rest of our parameters using the keywords
+            # that we were given. If there are no keywords for a parameter, then we need
+            # to check to see if there's a default parameter to use.
+            else:
+                parameter_values, argument_keywords = [item for item in args[parameter_ignore_count : parameter_ignore_count + required]], {kwparam : kwvalue for kwparam, kwvalue in kwds.items()}
+                for name in parameter_names[len(parameter_values):]:
+                    if name in argument_keywords:
+                        parameter_values.append(argument_keywords.pop(name))
+                    elif name in parameter_defaults:
+                        parameter_values.append(parameter_defaults[name])
+                    else:
+                        break
+                    continue
 
-            # Third, we need to actually check our type constraints that our current match was
-            # decorated with. If our constraint is a builtins.callable, then we just need to
-            # ensure that the parameter can be called. Otherwise our constraint should be an
-            # iterable of types that we can simply pass long to the isinstance() function.
-            critiqueF = lambda constraint: builtins.callable if constraint == builtins.callable else frpartial(builtins.isinstance, constraint)
-
-            # Zip our parameter names along with our argument values so that we can extract
-            # the constraint, and check the value against it. If any of these checks fail,
-            # then it's not a match and we need to move on to the next iteration.
-            parameter_names_and_values = zip(parameter_names[parameter_ignore_count:], argument_values)
-            if not all(critiqueF(constraints[name])(value) for name, value in parameter_names_and_values if name in constraints):
+                # If we couldn't find a value for every parameter, then this case doesn't fit.
+                # If we have any extra keywords, then we need to ensure that there's a keyword
+                # parameter in our current case. Otherwise, it doesn't fit and we move on.
+                if len(parameter_values) < required:
+                    continue
+                elif argument_keywords and not parameter_wildkeywords:
+                    continue
+                argument_values = builtins.tuple(parameter_values)
+
+            # Now we need to check the type constraints that our current case was decorated
+            # with. If our constraint is None, then we just need to ensure that the parameter
+            # can be called. Otherwise our constraint is passed to the isinstance() function.
+            for index, constraint in checks:
+                value = argument_values[index]
+                if not (builtins.callable(value) if constraint is None else builtins.isinstance(value, constraint)):
+                    break
                 continue
 
             # We should now have a match. So now that we've figured out all of our individual
             # parameters and their positions, we need to put them all together so that we can
             # return them to the caller so that they can actually call it.
-            result_arguments = builtins.tuple(itertools.chain(args[:parameter_ignore_count], argument_values))
-            return F, (result_arguments, argument_wildcard, argument_keywords)
+            else:
+                result_arguments = args[:parameter_ignore_count] + builtins.tuple(argument_values)
+                argument_wildcard = [item for item in args[parameter_ignore_count + required:]]
+                return F, (result_arguments, argument_wildcard, argument_keywords)
+            continue
 
         # If we iterated through everything in our heap, then we couldn't find a match for the
         # types the user gave us. So we need to raise an exception to inform the user that the
         # types we were given did not match any of the constraints that we know about.
+        heap = [item for _, _, _, _, _, _, _, item in table]
         ignored = min(ignore_count for _, _, (ignore_count, _, _, _) in heap) if heap else 0
         error_arguments = [item.__class__.__name__ for item in args[ignored:]]
         error_keywords = ["{:s}={!s}".format(name, kwds[name].__class__.__name__) for name in kwds]
@@ -641,21 +652,129 @@ class multicase(object):
         description = ', '.join("{:s}({:s}{:s})".format(name, ', '.join(error_arguments) if args else '*()', ", {:s}".format(', '.join(error_keywords)) if error_keywords else '') for name in error_names)
         raise internal.exceptions.UnknownPrototypeError(u"{:s}: The given parameter{:s} not match any of the available prototypes for {:s}. The prototypes which are available via {:s} are: {:s}".format(description, ' does' if sum(map(len, [error_arguments, error_keywords])) == 1 else 's do', available_names, available_help, available_prototypes))
 
+    @classmethod
+    def dispatch_key(cls, arguments, keywords):
+        '''Return the key used to cache the case that was resolved for the given `arguments` and `keywords`.'''
+        positional = builtins.tuple(builtins.type(item) for item in arguments)
+        return positional, builtins.frozenset((name, builtins.type(value)) for name, value in keywords.items()) if keywords else ()
+
+    @classmethod
+    def profile(cls, *enabled):
+        '''Return whether the dispatch of multicased functions is being profiled. If `enabled` is specified, then enable or disable it and return the previous state.'''
+        if not enabled:
+            return cls.profiling
+        res, cls.profiling = cls.profiling, builtins.bool(*enabled)
+        return res
+
+    @classmethod
+    def profiled(cls, name, packed_parameters, table, dispatch):
+        '''Dispatch the (`args`, `kwds`) within `packed_parameters` to the case in `table` whilst recording the results for the function `name`.'''
+        args, kwds = packed_parameters
+        clock = cls.profile_clock
+
+        # Resolve the case exactly like the wrapper does, but keep track of the time
+        # it took and the number of cases that had to be tried in order to find it.
+        start, key = clock(), cls.dispatch_key(args, kwds)
+        if key in dispatch:
+            result_callable, candidates = dispatch[key], 0
+            parameters, wild_parameters, keyword_parameters = args, (), kwds
+        else:
+            result_callable, (parameters, wild_parameters, keyword_parameters) = cls.resolve(key, packed_parameters, table, dispatch)
+            candidates = next(index for index, entry in enumerate(table) if entry[0] is result_callable) + 1
+        matched = clock()
+
+        # Find the record that we're going to update. If we don't have one yet, then
+        # we need to generate the prototype for the case so that it can be reported.
+        results = cls.profile_results.setdefault(name, {})
+        if result_callable not in results:
+            _, _, _, _, _, _, _, (_, constraints, _) = next(entry for entry in table if entry[0] is result_callable)
+            results[result_callable] = [cls.prototype(result_callable, constraints), 0, 0.0, 0.0, 0]
+        record = results[result_callable]
+
+        # Now we can call the case and update our record once it has returned. The time
+        # that we record for the body includes any other multicased functions it calls.
+        try:
+            return result_callable(*itertools.chain(parameters, wild_parameters), **keyword_parameters)
+        finally:
+            record[1:] = record[1] + 1, record[2] + matched - start, record[3] + clock() - matched, record[4] + candidates
+
+    @classmethod
+    def statistics(cls, *names):
+        '''Return a dictionary of the profiling results for each multicased function and its cases. If any `names` are specified, then only return the results for those functions.'''
+        result = {}
+        for name, cases in cls.profile_results.items():
+            if names and name not in names:
+                continue
+
+            # Aggregate the results for each case into the result for the function.
+            items = {prototype : {'calls': calls, 'match': match, 'body': body, 'candidates': candidates} for prototype, calls, match, body, candidates in cases.values()}
+            summary = {field : sum(item[field] for item in items.values()) for field in ['calls', 'match', 'body', 'candidates']}
+            summary['cases'] = items
+            result[name] = summary
+        return result
+
+    @classmethod
+    def report(cls, sort='body', count=None):
+        '''Return the profiling results as a list of lines sorted by the specified field (\'calls\', \'match\', \'body\', or \'candidates\') in descending order. If `count` is specified, then only include that many functions.'''
+        if sort not in {'calls', 'match', 'body', 'candidates'}:
+            raise internal.exceptions.InvalidParameterError(u"{:s}.report(sort={!r}, count={!r}) : The specified field ({!r}) is not one of the fields that are available for sorting.".format('.'.join([__name__, cls.__name__]), sort, count, sort))
+        statistics = cls.statistics()
+        functions = sorted(statistics.items(), key=lambda item: item[1][sort], reverse=True)
+
+        # Format each function with its totals followed by each of its cases.
+        Fformat = "{:>12d} {:>12.6f} {:>12.6f} {:>12.2f}  {:s}".format
+        result = ["{:>12s} {:>12s} {:>12s} {:>12s}  {:s}".format('calls', 'match', 'body', 'candidates', 'function')]
+        for name, summary in functions[:count]:
+            result.append(Fformat(summary['calls'], summary['match'], summary['body'], 1.0 * summary['candidates'] / summary['calls'] if summary['calls'] else 0.0, name))
+            cases = sorted(summary['cases'].items(), key=lambda item: item[1][sort], reverse=True)
+            result.extend(Fformat(item['calls'], item['match'], item['body'], 1.0 * item['candidates'] / item['calls'] if item['calls'] else 0.0, "  {:s}".format(prototype)) for prototype, item in cases)
+        return result
+
+    @classmethod
+    def reset(cls):
+        '''Discard all of the results that have been collected by profiling.'''
+        cls.profile_results.clear()
+
+    @classmethod
+    def resolve(cls, key, packed_parameters, table, dispatch):
+        '''Find the case in `table` for the (`args`, `kwds`) within `packed_parameters` and save it into `dispatch` using `key`.'''
+        result_callable, result_parameters = cls.match(packed_parameters, table)
+
+        # Now that we've resolved the case, we can save it so that we don't have to
+        # search for it again. We skip this if any of the types can't be trusted.
+        positional, named = key
+        if not any(item in cls.dispatch_uncacheable for item in itertools.chain(positional, (item for _, item in named))):
+            dispatch[key] = result_callable
+        return result_callable, result_parameters
+
     @classmethod
     def new_wrapper(cls, func, cache):
         '''Create a new wrapper that will determine the correct function to call.'''
+        table, dispatch, name = cls.compile(cache), {}, '.'.join([func.__module__, pycompat.function.name(func)])
 
         # Define the wrapper for the function that we're decorating. This way whenever the
         # decorated function gets called, we can search for one that matches the correct
         # constraints and dispatch into it with the original parameters in the correct order.
         def F(*arguments, **keywords):
-            heap = [item for _, item in heapq.nsmallest(len(cache), cache, key=operator.attrgetter('priority'))]
 
-            # Pack our parameters, and then hand them off to our matching function. This
-            # should then return the correct callable that matches the argument types we
-            # were given so that we can dispatch to it.
+            # If profiling has been enabled, then hand everything off to the profiler so
+            # that it can measure how long it took to find the case and then call it.
+            if cls.profiling:
+                return cls.profiled(name, (arguments, keywords), table, dispatch)
+
+            # First check if we've already resolved a case for the types of the parameters
+            # that we were given. The case that gets chosen only depends on the number of
+            # parameters, their types, and the keyword names. Since the cases are laid out
+            # the same way that python binds its parameters, we can call it directly.
+            key = cls.dispatch_key(arguments, keywords)
+            if key in dispatch:
+                return dispatch[key](*arguments, **keywords)
+
+            # Pack our parameters, and then hand them off to our resolver. This should
+            # then return the correct callable that matches the argument types we were
+            # given so that we can dispatch to it.
             packed_parameters = arguments, keywords
-            result_callable, result_parameters = cls.match(packed_parameters, heap)
+            result_callable, result_parameters = cls.resolve(key, packed_parameters, table, dispatch)
 
             # Now we have a matching callable for the user's parameters, and we just need
             # to unpack our individual parameters and dispatch to the callable with them.
@@ -668,7 +787,7 @@ class multicase(object):
         f, c = F, pycompat.function.code(F)
         cargs = c.co_argcount, c.co_nlocals, c.co_stacksize, c.co_flags, \
                 c.co_code, c.co_consts, c.co_names, c.co_varnames, \
-                c.co_filename, '.'.join([func.__module__, pycompat.function.name(func)]), \
+                c.co_filename, name, \
                 c.co_firstlineno, c.co_lnotab, c.co_freevars, c.co_cellvars
         newcode = pycompat.code.new(cargs, pycompat.code.unpack_extra(c))
 
@@ -681,6 +800,8 @@ class multicase(object):
         # The last two things to do is to copy our cache that we were given into the function
         # that we're going to return. This way people can debug it if they feel they need to.
         setattr(result, cls.cache_name, cache)
+        setattr(result, cls.table_name, table)
+        setattr(result, cls.dispatch_name, dispatch)
         setattr(result, '__doc__', '')
         return result
 
@@ -760,31 +881,47 @@ class matcher(object):
     """
     An object that allows one to match or filter a list of things in an
     sort of elegant way.
+
+    Each type can be registered with a `cost` which estimates how expensive
+    its predicate is to evaluate. When a number of types are being matched,
+    the ``matcher.plan`` method can be used to order them so that the cheapest
+    predicates are applied first and discard the most candidates.
     """
+    __default_cost__ = 1
 
     def __init__(self):
         self.__predicate__ = {}
+        self.__cost__ = {}
     def __attrib__(self, *attributes):
         if not attributes:
             return lambda item: item
         res = [(operator.attrgetter(callable_or_attribute) if isinstance(callable_or_attribute, six.string_types) else callable_or_attribute) for callable_or_attribute in attributes]
         return fcompose(*res) if len(res) > 1 else res[0]
-    def attribute(self, type, *attribute):
+    def __register__(self, type, predicate, cost):
+        self.__predicate__[type] = predicate
+        self.__cost__[type] = self.__default_cost__ if cost is None else cost
+    def attribute(self, type, *attribute, **options):
         attr = self.__attrib__(*attribute)
-        self.__predicate__[type] = lambda target: fcompose(attr, functools.partial(functools.partial(operator.eq, target)))
-    def mapping(self, type, function, *attribute):
+        self.__register__(type, lambda target: fcompose(attr, functools.partial(functools.partial(operator.eq, target))), options.get('cost', None))
+    def mapping(self, type, function, *attribute, **options):
         attr = self.__attrib__(*attribute)
         mapper = fcompose(attr, function)
-        self.__predicate__[type] = lambda target: fcompose(mapper, functools.partial(operator.eq, target))
-    def boolean(self, type, function, *attribute):
+        self.__register__(type, lambda target: fcompose(mapper, functools.partial(operator.eq, target)), options.get('cost', None))
+    def boolean(self, type, function, *attribute, **options):
         attr = self.__attrib__(*attribute)
-        self.__predicate__[type] = lambda target: fcompose(attr, functools.partial(function, target))
-    def combinator(self, type, function, *attribute):
+        self.__register__(type, lambda target: fcompose(attr, functools.partial(function, target)), options.get('cost', None))
+    def combinator(self, type, function, *attribute, **options):
         attr = self.__attrib__(*attribute)
-        self.__predicate__[type] = fcompose(function, functools.partial(fcompose, attr))
-    def predicate(self, type, *attribute):
+        self.__register__(type, fcompose(function, functools.partial(fcompose, attr)), options.get('cost', None))
+    def predicate(self, type, *attribute, **options):
         attr = self.__attrib__(*attribute)
-        self.__predicate__[type] = functools.partial(fcompose, attr)
+        self.__register__(type, functools.partial(fcompose, attr), options.get('cost', None))
+    def cost(self, type):
+        '''Return the estimated cost for evaluating the predicate of the specified `type`.'''
+        return self.__cost__.get(type, self.__default_cost__)
+    def plan(self, types):
+        '''Return the `(type, value)` items from the dictionary `types` sorted so that the cheapest ones are first.'''
+        return sorted(types.items(), key=fcompose(operator.itemgetter(0), self.cost))
     def match(self, type, value, iterable):
         matcher = self.__predicate__[type](value)
         return (item for item in iterable if matcher(item))
@@ -20,8 +20,8 @@ that can be used for querying are ``functions``, ``segments``,
 
 import six, builtins
 
-import functools, operator, itertools, types
-import sys, os, logging, string, bisect
+import functools, operator, itertools, types, contextlib
+import sys, os, logging, string, bisect, heapq
 import math, codecs, array as _array, fnmatch, re, ctypes
 
 import function, segment
@@ -521,33 +521,36 @@ class functions(object):
         > result = database.functions.search(like='*alloc*')
 
     """
+    # Each of the matchers are given a cost so that when multiple keywords are
+    # used, the cheapest ones (comparing addresses or flags) are applied before
+    # the ones that need to decode a comment or call into the user's predicate.
     __matcher__ = utils.matcher()
-    __matcher__.boolean('name', lambda name, item: name.lower() == item.lower(), function.by, function.name)
-    __matcher__.combinator('like', utils.fcompose(fnmatch.translate, utils.fpartial(re.compile, flags=re.IGNORECASE), operator.attrgetter('match')), function.by, function.name)
-    __matcher__.combinator('regex', utils.fcompose(utils.fpartial(re.compile, flags=re.IGNORECASE), operator.attrgetter('match')), function.by, function.name)
-    __matcher__.boolean('address', function.contains), __matcher__.boolean('ea', function.contains)
-    __matcher__.mapping('typed', operator.truth, function.top, lambda ea: idaapi.get_tinfo2(ea, idaapi.tinfo_t()) if idaapi.__version__ < 7.0 else idaapi.get_tinfo(idaapi.tinfo_t(), ea))
-    __matcher__.mapping('decompiled', operator.truth, function.type.is_decompiled)
-    __matcher__.mapping('frame', operator.truth, function.type.has_frame)
-    __matcher__.mapping('library', operator.truth, function.by, operator.attrgetter('flags'), utils.fpartial(operator.and_, idaapi.FUNC_LIB))
-    __matcher__.mapping('wrapper', operator.truth, function.by, operator.attrgetter('flags'), utils.fpartial(operator.and_, idaapi.FUNC_THUNK))
-    __matcher__.boolean('tagged', lambda parameter, keys: operator.truth(keys) == parameter if isinstance(parameter, bool) else operator.contains(keys, parameter) if isinstance(parameter, six.string_types) else keys&parameter, function.top, function.tag, operator.methodcaller('keys'), builtins.set)
-    __matcher__.predicate('predicate', function.by)
-    __matcher__.predicate('pred', function.by)
+    __matcher__.boolean('name', lambda name, item: name.lower() == item.lower(), function.by, function.name, cost=2)
+    __matcher__.combinator('like', utils.fcompose(fnmatch.translate, utils.fpartial(re.compile, flags=re.IGNORECASE), operator.attrgetter('match')), function.by, function.name, cost=2)
+    __matcher__.combinator('regex', utils.fcompose(utils.fpartial(re.compile, flags=re.IGNORECASE), operator.attrgetter('match')), function.by, function.name, cost=2)
+    __matcher__.boolean('address', function.contains, cost=1), __matcher__.boolean('ea', function.contains, cost=1)
+    __matcher__.mapping('typed', operator.truth, function.top, lambda ea: idaapi.get_tinfo2(ea, idaapi.tinfo_t()) if idaapi.__version__ < 7.0 else idaapi.get_tinfo(idaapi.tinfo_t(), ea), cost=3)
+    __matcher__.mapping('decompiled', operator.truth, function.type.is_decompiled, cost=3)
+    __matcher__.mapping('frame', operator.truth, function.type.has_frame, cost=1)
+    __matcher__.mapping('library', operator.truth, function.by, operator.attrgetter('flags'), utils.fpartial(operator.and_, idaapi.FUNC_LIB), cost=1)
+    __matcher__.mapping('wrapper', operator.truth, function.by, operator.attrgetter('flags'), utils.fpartial(operator.and_, idaapi.FUNC_THUNK), cost=1)
+    __matcher__.boolean('tagged', lambda parameter, keys: operator.truth(keys) == parameter if isinstance(parameter, bool) else operator.contains(keys, parameter) if isinstance(parameter, six.string_types) else keys&parameter, function.top, function.tag, operator.methodcaller('keys'), builtins.set, cost=4)
+    __matcher__.predicate('predicate', function.by, cost=5)
+    __matcher__.predicate('pred', function.by, cost=5)
 
     if any(hasattr(idaapi, item) for item in ['is_problem_present', 'QueueIsPresent']):
-        __matcher__.mapping('problems', operator.truth, function.top, utils.frpartial(function.type.has_problem, getattr(idaapi, 'PR_BADSTACK', 0xb)))
+        __matcher__.mapping('problems', operator.truth, function.top, utils.frpartial(function.type.has_problem, getattr(idaapi, 'PR_BADSTACK', 0xb)), cost=2)
 
     if all(hasattr(idaapi, Fname) for Fname in ['tryblks_t', 'get_tryblks']):
-        __matcher__.mapping('exceptions', operator.truth, function.by, lambda fn: idaapi.get_tryblks(idaapi.tryblks_t(), fn), utils.fpartial(operator.ne, 0))
+        __matcher__.mapping('exceptions', operator.truth, function.by, lambda fn: idaapi.get_tryblks(idaapi.tryblks_t(), fn), utils.fpartial(operator.ne, 0), cost=3)
 
     # chunk matching
     #__matcher__.boolean('greater', operator.le, utils.fcompose(function.chunks, functools.partial(map, builtins.list, operator.itemgetter(-1)), max)), __matcher__.boolean('gt', operator.lt, utils.fcompose(function.chunks, functools.partial(map, builtins.list, operator.itemgetter(-1)), max))
     #__matcher__.boolean('less', operator.ge, utils.fcompose(function.chunks, functools.partial(map, builtins.list, operator.itemgetter(0)), min)), __matcher__.boolean('lt', operator.gt, utils.fcompose(function.chunks, functools.partial(map, builtins.list, operator.itemgetter(0)), min))
 
     # entry point matching
-    __matcher__.boolean('greater', operator.le, function.top), __matcher__.boolean('gt', operator.lt, function.top)
-    __matcher__.boolean('less', operator.ge, function.top), __matcher__.boolean('lt', operator.gt, function.top)
+    __matcher__.boolean('greater', operator.le, function.top, cost=0), __matcher__.boolean('gt', operator.lt, function.top, cost=0)
+    __matcher__.boolean('less', operator.ge, function.top, cost=0), __matcher__.boolean('lt', operator.gt, function.top, cost=0)
 
     def __new__(cls):
         '''Return a list of all of the functions in the current database.'''
@@ -557,7 +560,11 @@ class functions(object):
     @classmethod
     def __iterate__(cls):
         '''Iterates through all of the functions in the current database (ripped from idautils).'''
-        left, right = config.bounds()
+        return cls.__iterate__(*config.bounds())
+    @utils.multicase(left=six.integer_types, right=six.integer_types)
+    @classmethod
+    def __iterate__(cls, left, right):
+        '''Iterates through all of the functions in the current database starting at `left` until `right`.'''
 
         # find first function chunk
         ch = idaapi.get_fchunk(left) or idaapi.get_next_fchunk(left)
@@ -584,11 +591,33 @@ class functions(object):
     @utils.string.decorate_arguments('name', 'like', 'regex')
     def iterate(cls, **type):
         '''Iterate through all of the functions in the database that match the keyword specified by `type`.'''
-        iterable = cls.__iterate__()
-        for key, value in (type or {'predicate': utils.fconstant(True)}).items():
+        iterable = cls.__candidates__(type)
+        for key, value in cls.__matcher__.plan(type or {'predicate': utils.fconstant(True)}):
             iterable = cls.__matcher__.match(key, value, iterable)
         for item in iterable: yield item
 
+    @classmethod
+    def __candidates__(cls, type):
+        '''Iterate through the functions that could match the keywords in `type` by narrowing the boundaries using the ones that compare addresses.'''
+        left, right = config.bounds()
+
+        # If an address was specified, then the only functions that can match
+        # are the ones that own the chunk containing it (including a tail).
+        ea = next((type[key] for key in ['address', 'ea'] if isinstance(type.get(key, None), six.integer_types)), None)
+        if ea is not None:
+            return (owner for owner in sorted(function.chunk.owners(ea)) if left <= owner < right)
+
+        # If any of the names can be narrowed with the name index, then
+        # the candidates are the functions from its results.
+        addresses = names.__lookup__({key : value for key, value in type.items() if key in {'name', 'like', 'regex'}})
+        if addresses is not None:
+            return (ea for ea in addresses if left <= ea < right and function.within(ea) and function.address(ea) == ea)
+
+        # Otherwise we narrow the boundaries using the entrypoint comparisons.
+        left = max([left] + [type[key] + adjust for key, adjust in [('greater', 0), ('gt', 1)] if isinstance(type.get(key, None), six.integer_types)])
+        right = min([right] + [type[key] + adjust for key, adjust in [('less', 1), ('lt', 0)] if isinstance(type.get(key, None), six.integer_types)])
+        return cls.__iterate__(left, right) if left < right else iter([])
+
     @utils.multicase(string=six.string_types)
     @classmethod
     @utils.string.decorate_arguments('string')
@@ -602,17 +631,14 @@ class functions(object):
         '''List all of the functions in the database that match the keyword specified by `type`.'''
         listable = []
 
-        # Some utility functions for grabbing counts of function attributes
-        Fcount_lvars = utils.fcompose(function.frame.lvars, utils.count)
-        Fcount_avars = utils.fcompose(function.frame.args.iterate, utils.count)
-
         # Set some reasonable defaults here
         maxentry = config.bounds()[0]
         maxaddr = minaddr = maxchunks = 0
         maxname = maxunmangled = chunks = marks = blocks = exits = 0
         lvars = avars = refs = 0
 
-        # First pass through the list to grab the maximum lengths of the different fields
+        # Make a single pass through the list to grab the metrics for each function
+        # and the maximum lengths of the different fields that we will output.
         for ea in cls.iterate(**type):
             func, _ = function.by(ea), ui.navigation.procedure(ea)
             maxentry = max(ea, maxentry)
@@ -621,18 +647,15 @@ class functions(object):
             maxname = max(len(unmangled), maxname)
             maxunmangled = max(len(unmangled), maxunmangled) if not internal.declaration.mangledQ(realname) else maxunmangled
 
-            bounds, items = function.bounds(func), [item for item in function.chunks(func)]
+            bounds, metrics = function.bounds(func), cls.__metrics__(ea)
             maxaddr, minaddr = max(max(bounds), maxaddr), max(min(bounds), minaddr)
-            maxchunks = max(len(items), maxchunks)
+            maxchunks = max(metrics['chunks'], maxchunks)
 
             # Figure out the maximum values for each of these attributes
-            blocks = max(len(builtins.list(function.blocks(func, silent=True))), blocks)
-            exits = max(len(builtins.list(function.bottom(func))), exits)
-            refs = max(len(xref.up(ea)), refs)
-            lvars = max(Fcount_lvars(func) if idaapi.get_frame(ea) else 0, lvars)
-            avars = max(Fcount_avars(func), avars)
+            blocks, exits, refs = (max(metrics[item], maximum) for item, maximum in zip(['blocks', 'exits', 'refs'], [blocks, exits, refs]))
+            lvars, avars = (max(metrics[item], maximum) for item, maximum in zip(['lvars', 'args'], [lvars, avars]))
 
-            listable.append(ea)
+            listable.append((ea, func, unmangled, realname, bounds, metrics))
 
         # Collect the number of digits for everything from the first pass
         cindex = utils.string.digits(len(listable), 10) if listable else 1
@@ -642,52 +665,74 @@ class functions(object):
         cchunks, cblocks, cexits, cavars, clvars, crefs = (utils.string.digits(item, 10) for item in [maxchunks, blocks, exits, avars, lvars, refs])
 
         # List all the fields of every single function that was matched
-        for index, ea in enumerate(listable):
-            func, decompiledQ = function.by(ui.navigation.procedure(ea)), interface.node.aflags(ui.navigation.procedure(ea), getattr(idaapi, 'AFL_HR_DETERMINED', 0xc0000000))
-            tags = function.tag(ea)
+        for index, (ea, func, unmangled, realname, bounds, metrics) in enumerate(listable):
+            tags, _ = function.tag(ea), ui.navigation.procedure(ea)
 
             # any flags that might be useful
             ftagged = '-' if not tags else '*' if any(not item.startswith('__') for item in tags) else '+'
             ftyped = 'D' if function.type.is_decompiled(ea) else '-' if not function.type.has_typeinfo(func) else 'T' if interface.node.aflags(ea, idaapi.AFL_USERTI) else 't'
             fframe = '?' if function.type.has_problem(ea, getattr(idaapi, 'PR_BADSTACK', 0xb)) else '-' if idaapi.get_frame(ea) else '^'
-            fgeneral = 'J' if func.flags & idaapi.FUNC_THUNK else 'L' if func.flags & idaapi.FUNC_LIB else 'S' if func.flags & idaapi.FUNC_STATICDEF else 'F'
+            fgeneral = 'J' if metrics['flags'] & idaapi.FUNC_THUNK else 'L' if metrics['flags'] & idaapi.FUNC_LIB else 'S' if metrics['flags'] & idaapi.FUNC_STATICDEF else 'F'
             flags = itertools.chain(fgeneral, fframe, ftyped, ftagged)
 
-            # naming information
-            unmangled, realname = function.name(func), name(ea)
-
-            # chunks and boundaries
-            chunks = [item for item in function.chunks(func)]
-            bounds = function.bounds(func)
-
             # try/except handlers
-            if all(hasattr(idaapi, Fname) for Fname in ['tryblks_t', 'get_tryblks']):
-                tb = idaapi.tryblks_t()
-                blkcount = idaapi.get_tryblks(tb, func)
-                trycount = sum(tb[i].is_cpp() for i in builtins.range(blkcount))
-                iterable = (tb[i].cpp() if tb[i].is_cpp() else tb[i].seh() for i in builtins.range(tb.size()))
-                ehcount = sum(item.size() for item in iterable)
-
-            else:
-                tb = None
-                blkcount = trycount = ehcount = 0
+            tb = all(hasattr(idaapi, Fname) for Fname in ['tryblks_t', 'get_tryblks'])
+            blkcount, trycount, ehcount = (metrics[item] for item in ['tries', 'cpp', 'handlers'])
 
             # now we can output everything that was found
             six.print_(u"{:<{:d}s} {:+#0{:d}x} : {:#0{:d}x}..{:#0{:d}x} : {:<{:d}s} {:s} : {:<{:d}s} : refs:{:<{:d}d} args:{:<{:d}d} lvars:{:<{:d}d} blocks:{:<{:d}d} exits:{:<{:d}d}{:s}".format(
                 "[{:d}]".format(index), 2 + math.trunc(cindex),
                 offset(ea), 3 + math.trunc(cmaxoffset),
                 bounds[0], 2 + math.trunc(cminaddr), bounds[1], 2 + math.trunc(cmaxaddr),
-                "({:d})".format(len(chunks)), 2 + cchunks, ''.join(flags),
+                "({:d})".format(metrics['chunks']), 2 + cchunks, ''.join(flags),
                 unmangled, math.trunc(maxname if internal.declaration.mangledQ(realname) else maxunmangled),
-                len(xref.up(ea)), crefs,
-                Fcount_avars(func), cavars,
-                Fcount_lvars(func) if idaapi.get_frame(ea) else 0, clvars,
-                len(builtins.list(function.blocks(func, silent=True))), cblocks,
-                len(builtins.list(function.bottom(func))), cexits,
+                metrics['refs'], crefs,
+                metrics['args'], cavars,
+                metrics['lvars'], clvars,
+                metrics['blocks'], cblocks,
+                metrics['exits'], cexits,
                 " exceptions:{:d}+{:d}/{:d}".format(blkcount - trycount, trycount, ehcount) if tb else ''
             ))
         return
 
+    @classmethod
+    def __metrics__(cls, ea):
+        '''Return a dictionary containing the metrics for the function at `ea` from the cache or calculate them if they are missing.'''
+        res = internal.metrics.function.get(ea) if idaapi.__version__ >= 7.0 else None
+        if res is not None:
+            return res
+
+        # Some utility functions for grabbing counts of function attributes
+        Fcount_lvars = utils.fcompose(function.frame.lvars, utils.count)
+        Fcount_avars = utils.fcompose(function.frame.args.iterate, utils.count)
+
+        func = function.by(ea)
+        res = {
+            'chunks': len(builtins.list(function.chunks(func))),
+            'blocks': len(builtins.list(function.blocks(func, silent=True))),
+            'exits': len(builtins.list(function.bottom(func))),
+            'refs': len(xref.up(ea)),
+            'args': Fcount_avars(func),
+            'lvars': Fcount_lvars(func) if idaapi.get_frame(ea) else 0,
+            'flags': func.flags,
+        }
+
+        # try/except handlers
+        if all(hasattr(idaapi, Fname) for Fname in ['tryblks_t', 'get_tryblks']):
+            tb = idaapi.tryblks_t()
+            blkcount = idaapi.get_tryblks(tb, func)
+            iterable = (tb[i].cpp() if tb[i].is_cpp() else tb[i].seh() for i in builtins.range(tb.size()))
+            res['tries'], res['cpp'] = blkcount, sum(tb[i].is_cpp() for i in builtins.range(blkcount))
+            res['handlers'] = sum(item.size() for item in iterable)
+
+        else:
+            res['tries'] = res['cpp'] = res['handlers'] = 0
+
+        # Only write the metrics into the cache if there are hooks to remove them.
+        if idaapi.__version__ >= 7.0:
+            internal.metrics.function.set(ea, res)
+        return res
+
     @utils.multicase(string=six.string_types)
     @classmethod
     @utils.string.decorate_arguments('string')
@@ -998,11 +1043,60 @@ class names(object):
     @classmethod
     @utils.string.decorate_arguments('name', 'like', 'regex')
     def __iterate__(cls, **type):
-        iterable = (idx for idx in builtins.range(idaapi.get_nlist_size()))
+        iterable = cls.__candidates__(type)
         for key, value in (type or {'predicate': utils.fconstant(True)}).items():
             iterable = cls.__matcher__.match(key, value, iterable)
         for item in iterable: yield item
 
+    @classmethod
+    def __candidates__(cls, type):
+        '''Iterate through the indices of the names that could match the keywords in `type` by using the name index to narrow them.'''
+        addresses = cls.__lookup__(type)
+        if addresses is None:
+            return (idx for idx in builtins.range(idaapi.get_nlist_size()))
+        return (idaapi.get_nlist_idx(ea) for ea in addresses if idaapi.is_in_nlist(ea))
+
+    @classmethod
+    def __lookup__(cls, type):
+        '''Return a sorted list of the addresses from the name index that could match the keywords in `type` or ``None`` if they can't be narrowed.'''
+        if idaapi.__version__ < 7.0:
+            return None
+
+        # Collect the candidates for each keyword that can be narrowed by its
+        # prefix, and then intersect them to get the ones that can match all.
+        index, lookup = cls.__index__(), {'name': 'prefix', 'like': 'like', 'regex': 'regex', 'unmangled': 'regex', 'demangled': 'regex'}
+        results = [getattr(index, lookup[key])(value) for key, value in type.items() if key in lookup and isinstance(value, six.string_types)]
+        results = [set(items) for items in results if items is not None]
+        return sorted(functools.reduce(operator.and_, results)) if results else None
+
+    @classmethod
+    def __index__(cls):
+        '''Return the index of the names in the database building it if necessary.'''
+        index = internal.index.names
+        if not index.built():
+            named = {idaapi.get_nlist_ea(idx) for idx in builtins.range(idaapi.get_nlist_size())}
+            index.build((ea, cls.__forms__(ea)) for ea in sorted(named | {ea for ea in functions.__iterate__()}))
+        return index
+
+    @classmethod
+    def __forms__(cls, ea):
+        '''Return a list of each of the forms of the name at the address `ea` that are used by the matchers.'''
+        get_name = functools.partial(idaapi.get_name, idaapi.BADADDR) if idaapi.__version__ < 7.0 else idaapi.get_name
+        realname = utils.string.of(get_name(ea) or '')
+        res = [realname, internal.declaration.demangle(realname)] if realname else []
+
+        # If it's the entrypoint of a function, then we need its name too.
+        fn = idaapi.get_func(ea)
+        if fn and interface.range.start(fn) == ea:
+            res.append(function.name(fn))
+        return res
+
+    @classmethod
+    def __update__(cls, ea):
+        '''Update the name index for the address `ea` if it has been built.'''
+        index = internal.index.names
+        return index.built() and index.set(ea, cls.__forms__(ea))
+
     @utils.multicase(string=six.string_types)
     @classmethod
     @utils.string.decorate_arguments('string')
@@ -2093,9 +2187,168 @@ class entries(object):
     add = utils.alias(new, 'entries')
 exports = entries     # XXX: ns alias
 
-def tags():
-    '''Return all of the tag names used globally within the database.'''
-    return internal.comment.globals.name()
+class tags(object):
+    """
+    This namespace is used for returning the tag names that are used
+    within the database and for grouping the modification of tags
+    together. When this namespace is called, all of the tag names that
+    are used globally within the database will be returned.
+
+    When applying a large number of tags, the modifications can be done
+    within a batch. While the batch is active, each comment modified by
+    ``database.tag`` and any of the changes to its reference counts are
+    retained in memory. When the batch is exited, each comment is written
+    only once with the hooks disabled and the aggregated changes to the
+    reference counts are applied to the cache.
+
+    An example of applying tags within a batch::
+
+        > with database.tags.batch():
+              for ea in addresses:
+                  database.tag(ea, 'marked', True)
+
+    """
+    __batch__ = None
+    __hooks__ = {'changing_cmt', 'cmt_changed', 'changing_range_cmt', 'range_cmt_changed', 'changing_area_cmt', 'area_cmt_changed'}
+
+    def __new__(cls):
+        '''Return all of the tag names used globally within the database.'''
+        return internal.comment.globals.name()
+
+    @classmethod
+    @contextlib.contextmanager
+    def batch(cls):
+        '''Buffer all of the tags that are modified with ``database.tag`` until the returned context manager is exited.'''
+        if cls.__batch__ is not None:
+            yield cls.__batch__
+            return
+
+        # Start out with an empty batch for the comments and the reference
+        # counts which will get used by the functions that modify a tag.
+        cls.__batch__ = batch = {'comments': {}, 'references': {}}
+        try:
+            yield batch
+
+        # Regardless of what happens we need to flush the batch so that the
+        # tags we've modified are consistent with their reference counts.
+        finally:
+            cls.__batch__ = None
+            cls.__flush__(batch)
+        return
+
+    @classmethod
+    def __flush__(cls, batch):
+        '''Write the comments and apply the reference counts that were buffered in the specified `batch`.'''
+        comments, references = (batch[item] for item in ['comments', 'references'])
+
+        # Write every comment that was modified, but only after we've disabled
+        # the hooks so that they won't update the references that we're tracking.
+        hooks = cls.__hooks__ & {target for target in ui.hook.idb}
+        try:
+            [ ui.hook.idb.disable(item) for item in hooks ]
+
+        except Exception:
+            raise
+
+        else:
+            for (runtime, ea, repeatable), state in comments.items():
+                function.comment(ea, internal.comment.encode(state), repeatable=repeatable) if runtime else comment(ea, internal.comment.encode(state), repeatable=repeatable)
+            comments.clear()
+
+        finally:
+            [ ui.hook.idb.enable(item) for item in hooks ]
+
+        # Now we can group the changes to the reference counts by their context
+        # so that they're applied all at once for the contents and the globals.
+        items = [(context, ea, key, delta) for (context, ea, key), delta in references.items() if delta]
+        internal.comment.contents.adjust((ea, key, delta) for context, ea, key, delta in items if context is internal.comment.contents)
+        internal.comment.globals.adjust((ea, key, delta) for context, ea, key, delta in items if context is internal.comment.globals)
+        references.clear()
+
+    @classmethod
+    def __read__(cls, ea, repeatable, runtime=False):
+        '''Return the dictionary of tags decoded from the comment at `ea` preferring the one that is buffered if there is a batch.'''
+        batch, key = cls.__batch__, (runtime, ea, repeatable)
+        if batch is not None and key in batch['comments']:
+            return batch['comments'][key]
+        return internal.comment.decode(function.comment(ea, repeatable=repeatable) if runtime else comment(ea, repeatable=repeatable))
+
+    @classmethod
+    def __write__(cls, ea, state, repeatable, runtime=False):
+        '''Write the dictionary of tags in `state` to the comment at `ea` or buffer it if there is a batch.'''
+        batch = cls.__batch__
+        if batch is not None:
+            batch['comments'][runtime, ea, repeatable] = state
+            return
+
+        # Guard the modification so that the hooks don't interfere with the
+        # references that were updated by disabling the hooks.
+        hooks = cls.__hooks__ & {target for target in ui.hook.idb}
+        try:
+            [ ui.hook.idb.disable(item) for item in hooks ]
+
+        # If an exception was raised while disabling the hooks, then we need to bail.
+        except Exception:
+            raise
+
+        # Finally we can actually encode the dictionary and write it to the address
+        # the user specified using the correct comment type.
+        else:
+            function.comment(ea, internal.comment.encode(state), repeatable=repeatable) if runtime else comment(ea, internal.comment.encode(state), repeatable=repeatable)
+
+        # Lastly we release the hooks now that we've finished modifying the comment.
+        finally:
+            [ ui.hook.idb.enable(item) for item in hooks ]
+        return
+
+    @classmethod
+    def __reference__(cls, context, ea, key, delta):
+        '''Adjust the reference count of `key` at `ea` in the specified `context` by `delta` or buffer it if there is a batch.'''
+        batch = cls.__batch__
+        if batch is not None:
+            references = batch['references']
+            references[context, ea, key] = references.get((context, ea, key), 0) + delta
+            return
+        return context.inc(ea, key) if delta > 0 else context.dec(ea, key)
+
+    @utils.multicase()
+    @classmethod
+    def candidates(cls):
+        '''Yield each address within the database that might contain a tag.'''
+        return cls.candidates(*config.bounds())
+    @utils.multicase(start=six.integer_types, stop=six.integer_types)
+    @classmethod
+    def candidates(cls, start, stop):
+        """Yield each address from `start` to `stop` that might contain a tag.
+
+        Instead of visiting every address, this combines the addresses from
+        the name list, the addresses with a reference count for their global
+        tags, and the netnode for any address that has a comment, an extra
+        comment, a name, a color, or some type information applied to it.
+        """
+        left, right = sorted([start, stop])
+        Fea2node = idaapi.ea2node if hasattr(idaapi, 'ea2node') else utils.fidentity
+        Fnode2ea = idaapi.node2ea if hasattr(idaapi, 'node2ea') else utils.fidentity
+        Fflags = idaapi.getFlags if idaapi.__version__ < 7.0 else idaapi.get_full_flags
+
+        # These are the flags that we use to determine whether the netnode for
+        # an address has something that we would return as a tag.
+        FF_MASK = idaapi.FF_COMM | idaapi.FF_LINE | idaapi.FF_NAME
+        AFL_MASK = getattr(idaapi, 'AFL_TI', 0x800) | getattr(idaapi, 'AFL_COLORED', 0x40000)
+        Fcandidate = lambda ea: Fflags(ea) & FF_MASK or interface.node.aflags(ea, AFL_MASK)
+
+        # Each of these are already sorted, so we only need to clamp them to
+        # the boundaries. The netnodes are ordered by their index, so we can
+        # skip to the address that we start at and stop once we're past it.
+        names = (idaapi.get_nlist_ea(idx) for idx in builtins.range(idaapi.get_nlist_size()))
+        references = (ea for ea, _ in internal.comment.globals.iterate())
+        nodes = itertools.takewhile(utils.fpartial(operator.gt, Fea2node(right)), itertools.dropwhile(utils.fpartial(operator.gt, Fea2node(left)), internal.netnode.fiter()))
+        iterable = (ea for ea in heapq.merge(names, references, (Fnode2ea(nodeidx) for nodeidx in nodes if Fcandidate(Fnode2ea(nodeidx)))) if left <= ea < right)
+
+        # Merge them together so that each address is yielded only once.
+        for ea, _ in itertools.groupby(iterable):
+            yield ea
+        return
 
 @utils.multicase()
 def tag():
@@ -2128,11 +2381,17 @@ def tag(ea):
     # use. We also decode the (repeatable) function comment, because in
     # some cases a function is created for a runtime-linked address.
     res = comment(ea, repeatable=False)
-    d1 = internal.comment.decode(res)
+    d1 = internal.comment.decoded.address(ea, False, res)
     res = comment(ea, repeatable=True)
-    d2 = internal.comment.decode(res)
+    d2 = internal.comment.decoded.address(ea, True, res)
     res = function.comment(ea, repeatable=True) if rt else ''
-    d3 = internal.comment.decode(res)
+    d3 = internal.comment.decoded.function(interface.range.start(func), True, res) if rt else {}
+
+    # If we're in the middle of a batch, then any of the comments that have
+    # been modified are buffered and need to be used instead of the database.
+    batch = tags.__batch__['comments'] if tags.__batch__ is not None else {}
+    d1, d2 = batch.get((False, ea, False), d1), batch.get((False, ea, True), d2)
+    d3 = batch.get((True, interface.range.start(func), True), d3) if rt else d3
 
     # Check if the address had content in either decoding types of
     # comments so that we can warn the user about it.
@@ -2254,9 +2513,9 @@ def tag(ea, key, value):
     # Go ahead and decode the tags that are written to all 3 comment types. This
     # way we can search them for the correct one that the user is trying to modify.
     ea = interface.address.inside(ea)
-    state_correct = internal.comment.decode(comment(ea, repeatable=repeatable))
-    state_wrong = internal.comment.decode(comment(ea, repeatable=not repeatable))
-    state_runtime = internal.comment.decode(function.comment(ea, repeatable=True)) if func else {}
+    state_correct = tags.__read__(ea, repeatable)
+    state_wrong = tags.__read__(ea, not repeatable)
+    state_runtime = tags.__read__(interface.range.start(func), True, runtime=True) if func else {}
 
     # Now we just need to figure out which one of the dictionaries that we decoded
     # contains the key that the user is trying to modify. We need to specially
@@ -2272,33 +2531,18 @@ def tag(ea, key, value):
     # within a function, then it's a contents tag that we need to adjust.
     if key not in state:
         if func and function.within(ea) and not rt:
-            internal.comment.contents.inc(ea, key)
+            tags.__reference__(internal.comment.contents, ea, key, +1)
         else:
-            internal.comment.globals.inc(ea, key)
+            tags.__reference__(internal.comment.globals, ea, key, +1)
 
     # Grab the previous value from the correct dictionary that we discovered,
     # and update it with the new value that the user is modifying it with.
     res, state[key] = state.get(key, None), value
 
-    # Now we can finally update the comment in the database. However, we need
-    # to guard the modification so that the hooks don't interfere with the
-    # references that we updated. We guard this situation by disabling the hooks.
-    hooks = {'changing_cmt', 'cmt_changed', 'changing_range_cmt', 'range_cmt_changed', 'changing_area_cmt', 'area_cmt_changed'} & {target for target in ui.hook.idb}
-    try:
-        [ ui.hook.idb.disable(item) for item in hooks ]
-
-    # If an exception was raised while disabling the hooks, then we need to bail.
-    except Exception:
-        raise
-
-    # Finally we can actually encode the dictionary and write it to the address
-    # the user specified using the correct comment type.
-    else:
-        function.comment(ea, internal.comment.encode(state), repeatable=where) if rt else comment(ea, internal.comment.encode(state), repeatable=where)
-
-    # Lastly we release the hooks now that we've finished modifying the comment.
-    finally:
-        [ ui.hook.idb.enable(item) for item in hooks ]
+    # Now we can finally update the comment in the database. The hooks get
+    # disabled while writing so that they don't interfere with the references
+    # that we updated, and if we're within a batch then the write is buffered.
+    tags.__write__(interface.range.start(func) if rt else ea, state, where, runtime=rt)
 
     # Now we can return the result the user asked us for.
     return res
@@ -2348,9 +2592,9 @@ def tag(ea, key, none):
 
     # Now we decode the tags from are written to all 3 available comment types.
     # This way we can search for the correct one that the user is going to modify.
-    state_correct = internal.comment.decode(comment(ea, repeatable=repeatable))
-    state_wrong = internal.comment.decode(comment(ea, repeatable=not repeatable))
-    state_runtime = internal.comment.decode(function.comment(ea, repeatable=True)) if func else {}
+    state_correct = tags.__read__(ea, repeatable)
+    state_wrong = tags.__read__(ea, not repeatable)
+    state_runtime = tags.__read__(interface.range.start(func), True, runtime=True) if func else {}
 
     # Then we need to figure out which one of the decoded dictionaries contains
     # the key that the user is trying to remove. The case where a runtime-linked
@@ -2367,34 +2611,19 @@ def tag(ea, key, none):
         raise E.MissingTagError(u"{:s}.tag({:#x}, {!r}, {!s}) : Unable to remove non-existent tag \"{:s}\" from address.".format(__name__, ea, key, none, utils.string.escape(key, '"')))
     res = state.pop(key)
 
-    # Now we can do our update and encode our modified dictionary, but we need
-    # to guard the modification so that the hooks don't also interfere with the
-    # references that we're updating. We guard by disabling the relevant hooks.
-    hooks = {'changing_cmt', 'cmt_changed', 'changing_range_cmt', 'range_cmt_changed', 'changing_area_cmt', 'area_cmt_changed'} & {target for target in ui.hook.idb}
-    try:
-        [ ui.hook.idb.disable(item) for item in hooks ]
-
-    # If an exception was raised while disabling the hooks, then simply bail.
-    except Exception:
-        raise
-
-    # Finally we can encode the dictionary that we removed the key from and
-    # write it to the correct comment at the address that the user specified.
-    else:
-        function.comment(ea, internal.comment.encode(state), repeatable=where) if rt else comment(ea, internal.comment.encode(state), repeatable=where)
-
-    # Release our hooks once we've finished updating the comment.
-    finally:
-        [ ui.hook.idb.enable(item) for item in hooks ]
+    # Now we can do our update and encode our modified dictionary. The hooks
+    # are disabled while writing so that they don't interfere with the references
+    # that we're updating, and the write gets buffered if we're within a batch.
+    tags.__write__(interface.range.start(func) if rt else ea, state, where, runtime=rt)
 
     # Now that we've removed the key from the tag and updated the comment,
     # we need to remove its reference. If the address is a runtime address
     # or outside a function, then it's a global tag being removed. Otherwise
     # it's within a function and thus a contents tag being removed.
     if func and function.within(ea) and not rt:
-        internal.comment.contents.dec(ea, key)
+        tags.__reference__(internal.comment.contents, ea, key, -1)
     else:
-        internal.comment.globals.dec(ea, key)
+        tags.__reference__(internal.comment.globals, ea, key, -1)
 
     # Finally we can return the value of the tag that was removed.
     return res
@@ -2430,8 +2659,21 @@ def select(**boolean):
     # Collect the tagnames to query as specified by the user.
     Or, And = ({item for item in boolean.get(B, [])} for B in ['Or', 'And'])
 
-    # Walk through every tagged address so we can cross-check them with the query.
-    for ea in internal.comment.globals.address():
+    # If the inverted index has been built, then we can use the postings for
+    # each tagname to figure out our candidates without decoding anything. If
+    # And(&) was specified, then only the intersection can match. Otherwise
+    # we need the union of the addresses for every tagname from Or(|).
+    if internal.comment.globals.indexed():
+        postings = ({ea for ea in internal.comment.globals.postings(name)} for name in (And or Or))
+        candidates = functools.reduce(operator.and_ if And else operator.or_, postings, next(postings, {item for item in []}))
+        iterable = sorted(candidates)
+
+    # Otherwise, we have no choice but to walk through every tagged address.
+    else:
+        iterable = internal.comment.globals.address()
+
+    # Walk through every candidate address so we can cross-check them with the query.
+    for ea in iterable:
         collected, _ = {}, ui.navigation.set(ea)
         Ftag, owners = (function.tag, {f for f in function.chunk.owners(ea)}) if function.within(ea) else (tag, {ea})
         tags = Ftag(ea)
@@ -2505,8 +2747,9 @@ def selectcontents(**boolean):
             sup_formatted, blob_formatted = (', '.join(items) for items in [sup, blob])
             logging.warning(u"{:s}.selectcontents({:s}) : Detected cache inconsistency between contents of {:s} address ({:#x}) and address ({:#x}) due to a difference between the supval ({:s}) and its corresponding blob ({:s}).".format(__name__, q, f, 'function', ea, sup_formatted, blob_formatted))
 
-        # Now start aggregating the tagnames that the user is searching for.
-        collected, names, owners = {item for item in []}, internal.comment.contents.name(ea, target=ea), {item for item in function.chunk.owners(ea)}
+        # Now start aggregating the tagnames that the user is searching for. The
+        # names come from the contents we already read, so the blob isn't read again.
+        collected, names, owners = {item for item in []}, {item for item in contents.get(internal.comment.contents.__tags__, {})}, {item for item in function.chunk.owners(ea)}
 
         # Or(|) includes the address if any of the tagnames matched.
         collected.update(Or & names)
@@ -20,7 +20,7 @@ are ``type``, ``block``, ``chunk``, ``blocks``, ``chunks``, and ``frame``.
 
 import six, builtins
 
-import functools, operator, itertools, types
+import functools, operator, itertools, types, bisect
 import logging, string
 
 import database, instruction, structure
@@ -636,6 +636,15 @@ class chunk(object):
     @classmethod
     def owners(cls, ea):
         '''Yield each of the owners which have the function chunk containing the address `ea` associated with it.'''
+
+        # If the chunk index knows about the address, then use its owners.
+        res = internal.index.chunks.chunk(ea)
+        if res is not None:
+            owners = res[-1] if res else ()
+            for item in owners:
+                yield item
+            return
+
         res = idaapi.get_func(ea)
 
         # If we're not associated with a function, then we just leave. Otherwise,
@@ -977,7 +986,12 @@ def within(ea):
         ea = interface.address.within(ea)
     except E.OutOfBoundsError:
         return False
-    return idaapi.get_func(ea) is not None and idaapi.segtype(ea) != idaapi.SEG_XTRN
+
+    # Use the chunk index to check the address if it's able to, otherwise
+    # we need to ask the disassembler for the function that contains it.
+    res = internal.index.chunks.chunk(ea)
+    ok = idaapi.get_func(ea) is not None if res is None else operator.truth(res)
+    return ok and idaapi.segtype(ea) != idaapi.SEG_XTRN
 
 class blocks(object):
     """
@@ -1008,8 +1022,9 @@ class blocks(object):
     @utils.multicase()
     def __new__(cls, func, **external):
         '''Returns the bounds of each basic block for the function `func`.'''
-        iterable = cls.iterate(func, **external)
-        return [ interface.range.bounds(bb) for bb in iterable ]
+        fn, flags = by(func), cls.__flags__(external)
+        G = cls.__chart__(fn, flags, **external)
+        return [ interface.bounds_t(*G.bounds(index)) for index in range(len(G)) ]
     @utils.multicase(bounds=tuple)
     def __new__(cls, bounds, **external):
         '''Return each basic block contained within the specified `bounds`.'''
@@ -1024,17 +1039,9 @@ class blocks(object):
         """
         fn = by_address(left)
 
-        # Define a closure that filters the basic-blocks within the given range.
-        def filtered(left, right, iterable=cls.iterate(fn, **external)):
-            for bb in cls.iterate(fn, **external):
-                if interface.range.start(bb) >= left and interface.range.end(bb) < right:
-                    yield interface.range.bounds(bb)
-                continue
-            return
-
-        # Take the range we were given, and return it as a list.
+        # Take the range we were given, and filter the blocks that are within it.
         (left, _), (_, right) = map(interface.range.unpack, map(cls.at, [left, right]))
-        return [ bounds for bounds in filtered(left, right) ]
+        return [ bounds for bounds in cls(fn, **external) if bounds.left >= left and bounds.right < right ]
 
     @utils.multicase()
     @classmethod
@@ -1049,10 +1056,7 @@ class blocks(object):
         If `external` is true, then include all blocks that are a branch target despite being outside the function boundaries.
         If `split` is false, then do not allow a call instruction to split a block.
         """
-        FC_NOEXT, FC_CALL_ENDS = getattr(idaapi, 'FC_NOEXT', 2), getattr(idaapi, 'FC_CALL_ENDS', 0x20)
-        fc_flags = external.pop('flags', idaapi.FC_PREDS)
-        fc_flags |= 0 if any(external.get(item, False) for item in ['external', 'externals']) else FC_NOEXT
-        fc_flags |= 0 if any(not external[item] for item in ['call', 'calls', 'split'] if item in external) else FC_CALL_ENDS
+        fc_flags = cls.__flags__(external)
         return cls.iterate(func, fc_flags, **external)
     @utils.multicase(flags=six.integer_types)
     @classmethod
@@ -1104,6 +1108,54 @@ class blocks(object):
             continue
         return
 
+    @classmethod
+    def __flags__(cls, external):
+        '''Pop the flags (``idaapi.FC_*``) for building a flowchart out of the keywords in `external` and return them.'''
+        FC_NOEXT, FC_CALL_ENDS = getattr(idaapi, 'FC_NOEXT', 2), getattr(idaapi, 'FC_CALL_ENDS', 0x20)
+        fc_flags = external.pop('flags', idaapi.FC_PREDS)
+        fc_flags |= 0 if any(external.get(item, False) for item in ['external', 'externals']) else FC_NOEXT
+        fc_flags |= 0 if any(not external[item] for item in ['call', 'calls', 'split'] if item in external) else FC_CALL_ENDS
+        return fc_flags
+
+    @classmethod
+    def __chart__(cls, fn, flags, **silent):
+        """Return the flowchart built with the specified `flags` for the function `fn` as an ``internal.index.flowchart.graph``.
+
+        The flowchart is cached so that it is only built again when the function has been changed.
+        """
+        ea = interface.range.start(fn)
+        G = internal.index.flowchart.get(ea, flags)
+        if G is not None:
+            return G
+
+        # Collect the blocks from the flowchart and map each one to its index so that
+        # we can convert the successors and predecessors of each block to indices.
+        items = [bb for bb in cls.iterate(fn, flags, **silent)]
+        index = {interface.range.start(bb) : idx for idx, bb in enumerate(items)}
+        edges = lambda blocks: [index[start] for start in map(interface.range.start, blocks) if start in index]
+        G = internal.index.flowchart.graph([(bb.id,) + interface.range.unpack(bb) + (edges(bb.succs()), edges(bb.preds())) for bb in items])
+
+        # We can only cache it if there are hooks to remove it when the function changes.
+        return internal.index.flowchart.set(ea, flags, G) if idaapi.__version__ >= 7.0 else G
+
+    @classmethod
+    def __locate__(cls, fn, ea, flags):
+        '''Return the flowchart built with `flags` for the function `fn` and the index of the block containing the address `ea`.'''
+        G, (index,) = cls.__indices__(fn, ea, flags)
+        return G, index
+
+    @classmethod
+    def __calls__(cls, fn):
+        '''Return the sorted addresses of every call instruction within the function `fn`.'''
+        ea = interface.range.start(fn)
+        res = internal.index.calls.get(ea)
+        if res is not None:
+            return res
+
+        # We can only cache them if there are hooks to remove them when the function changes.
+        iterable = (item for item in chunks.iterate(fn) if instruction.type.is_call(item))
+        return internal.index.calls.set(ea, iterable) if idaapi.__version__ >= 7.0 else sorted(iterable)
+
     @utils.multicase()
     @classmethod
     def walk(cls, **flags):
@@ -1430,16 +1482,30 @@ class blocks(object):
     def digraph(cls, func, **flags):
         """Return a ``networkx.DiGraph`` of the function `func`.
 
+        If `attributes` is false, then only include the boundaries of each block and the edges between them.
         Requires the ``networkx`` module in order to build the graph.
         """
-        fn, fcflags = by(func), flags.get('flags', idaapi.FC_PREDS | idaapi.FC_NOEXT | getattr(idaapi, 'FC_CALL_ENDS', 0x20))
-        ea = interface.range.start(fn)
+        FC_NOEXT, FC_CALL_ENDS = getattr(idaapi, 'FC_NOEXT', 2), getattr(idaapi, 'FC_CALL_ENDS', 0x20)
+        fn, fcflags = by(func), flags.get('flags', idaapi.FC_PREDS | FC_NOEXT | FC_CALL_ENDS)
+        ea, chart = interface.range.start(fn), cls.__chart__(fn, fcflags)
 
         # assign some default values and create some tools to use when creating the graph
         availableChunks = [item for item in chunks(ea)]
 
         # create digraph
         import networkx
+
+        # if we were asked not to include any attributes, then we only need to
+        # include the structure of the flowchart and can skip everything else.
+        if not flags.get('attributes', True):
+            G = networkx.DiGraph(name=name(ea), __address__=ea, __chunks__=availableChunks)
+            for B in range(len(chart)):
+                bounds = interface.bounds_t(*chart.bounds(B))
+                G.add_node(bounds.left, __bounds__=bounds, __address__=bounds.left, __entry__=bounds.left == ea or not chart.preds(B), __sentinel__=not chart.succs(B), id="{:#x}".format(bounds.left))
+            G.add_edges_from((chart.starts[Bp], chart.starts[B]) for B in range(len(chart)) for Bp in chart.preds(B))
+            G.add_edges_from((chart.starts[B], chart.starts[Bs]) for B in range(len(chart)) for Bs in chart.succs(B))
+            return G
+
         attrs = tag(ea)
         attrs.setdefault('__address__', ea)
         attrs.setdefault('__chunks__', availableChunks)
@@ -1463,25 +1529,40 @@ class blocks(object):
         # assign some default values, and create some tools to use when adding nodes
         empty = {item for item in []}
         fVisibleTags = lambda items: {tag for tag in items if not tag.startswith('__')}
+        fWithin = lambda addresses, left, right: addresses[bisect.bisect_left(addresses, left) : bisect.bisect_left(addresses, right)]
+
+        # grab the addresses that are tagged and the calls for the function so that
+        # we only need to decode the addresses that actually have something. we also
+        # need the default flowchart since that's what's used for the block colors.
+        tagged, calls = internal.comment.contents.address(ea, target=ea), cls.__calls__(fn)
+        default = cls.__chart__(fn, idaapi.FC_PREDS | FC_NOEXT | FC_CALL_ENDS)
+        sources = {}
 
         # create a node for each block in the flowchart
-        nodes_iterable, edges_iterable = itertools.tee(cls.iterate(fn, fcflags), 2)
-        for B in nodes_iterable:
-            bounds = block(B)
+        for B in range(len(chart)):
+            bounds = interface.bounds_t(*chart.bounds(B))
 
             # check if the boundary is zero-sized and handle it differently if so.
             if bounds.size:
                 items = [item for item in database.address.iterate(bounds)]
-                last = database.address.prev(bounds.right)
+                last = sources[B] = database.address.prev(bounds.right)
 
             # as the boundaries are defining an empty basic-block, we only need
             # to find the one address that it's actually pointing to.
             else:
                 items = [item for item in {bound for bound in bounds}]
-                last, = items
-
-            # figure out all of the tags in the list of addresses (items).
-            tags = [database.tag(item) for item in items]
+                last, sources[B] = items[0], database.address.prev(bounds.right)
+
+            # if the block is within the function, then we can take its tags and calls
+            # from the ones that we collected. otherwise we need to check every address.
+            index = next((idx for idx, ch in enumerate(availableChunks) if ch.left <= bounds.left < ch.right), None)
+            if index is None:
+                tags = [database.tag(item) for item in items]
+                callsites = [item for item in items if instruction.type.is_call(item)]
+            else:
+                right = bounds.right if bounds.size else bounds.left + 1
+                tags = [database.tag(item) for item in fWithin(tagged, bounds.left, right)]
+                callsites = [item for item in fWithin(calls, bounds.left, right)]
 
             # now we can continue to collect attributes to add to our graph.
             attrs = database.tag(bounds.left)
@@ -1494,18 +1575,21 @@ class blocks(object):
             attrs.setdefault('__edge__', last)
             attrs.setdefault('__size__', getattr(bounds, 'size', bounds.right - bounds.left))
 
-            attrs.setdefault('__entry__', bounds.left == ea or not any(B.preds()))
-            attrs.setdefault('__sentinel__', instruction.type.is_sentinel(last) or not any(B.succs()))
+            attrs.setdefault('__entry__', bounds.left == ea or not chart.preds(B))
+            attrs.setdefault('__sentinel__', instruction.type.is_sentinel(last) or not chart.succs(B))
             attrs.setdefault('__conditional__', instruction.type.is_jxx(last))
             attrs.setdefault('__unconditional__', any(F(last) for F in [instruction.type.is_jmp, instruction.type.is_jmpi]))
-            attrs.setdefault('__calls__', [ea for ea in items if instruction.type.is_call(ea)])
+            attrs.setdefault('__calls__', callsites)
 
-            attrs.setdefault('__chunk_index__', next((idx for idx, ch in enumerate(availableChunks) if ch.left <= bounds.left < ch.right), None))
+            attrs.setdefault('__chunk_index__', index)
             attrs.setdefault('__chunk_start__', bounds.left in {item.left for item in availableChunks})
             attrs.setdefault('__chunk_stop__', bounds.right in {item.right for item in availableChunks})
 
-            if block.color(bounds) is not None:
-                operator.setitem(attrs, '__color__', block.color(bounds))
+            # the color of the block is stored using its identifier from the default flowchart.
+            Bdefault = default.find(bounds.left)
+            clr = None if Bdefault is None else block.__color__(fn, default.ids[Bdefault])
+            if clr is not None:
+                operator.setitem(attrs, '__color__', clr)
 
             visibletags = [fVisibleTags(t) for t in tags]
             attrs.setdefault('__tags__', [item for item in functools.reduce(operator.or_, visibletags, empty)])
@@ -1535,79 +1619,118 @@ class blocks(object):
             # add the actual node
             G.add_node(bounds.left, **attrs)
 
-        # for every single basic-block from the flowchart...
-        for B in edges_iterable:
+        # collect the edges for the predecessors and successors of every single
+        # basic-block from the flowchart so that each one is only processed once.
+        pairs = {(Bp, B) for B in range(len(chart)) for Bp in chart.preds(B)}
+        pairs |= {(B, Bs) for B in range(len(chart)) for Bs in chart.succs(B)}
 
-            # ...add an edge for its predecessors
-            for Bp in B.preds():
-                source, target = database.address.prev(interface.range.end(Bp)), interface.range.start(B)
+        # the branch at the end of a block is the same for all of its edges.
+        branches = {}
+        for Bsource, Btarget in sorted(pairs):
+            source, target = sources[Bsource], chart.starts[Btarget]
 
-                # FIXME: figure out some more default attributes to include
+            # FIXME: figure out some more default attributes to include
+            if chart.stops[Bsource] == target:
+                attrs = {'__contiguous__': True}
+
+            elif Bsource in branches:
+                attrs = {key : value for key, value in branches[Bsource].items()}
+
+            else:
                 attrs = {}
-                if interface.range.end(Bp) == target:
-                    operator.setitem(attrs, '__contiguous__', interface.range.end(Bp) == target)
-                elif instruction.type.is_jxx(source):
+                if instruction.type.is_jxx(source):
                     operator.setitem(attrs, '__conditional__', True)
                 elif instruction.type.is_jmp(source) or instruction.type.is_jmpi(source):
                     operator.setitem(attrs, '__unconditional__', True)
                 else:
                     operator.setitem(attrs, '__branch__', instruction.type.is_branch(source))
 
-                # add the dot attributes for the edge
-                operator.setitem(attrs, 'dir', 'forward')
-
                 if any(attrs.get(item, False) for item in ['__branch__', '__conditional__', '__unconditional__']):
                     attrs['label'] = instruction.mnem(source)
+                branches[Bsource] = {key : value for key, value in attrs.items()}
 
-                # add the edge to the predecessor
-                G.add_edge(interface.range.start(Bp), target, **attrs)
+            # add the dot attributes for the edge
+            operator.setitem(attrs, 'dir', 'forward')
 
-            # ...add an edge for its successors
-            for Bs in B.succs():
-                source, target = database.address.prev(interface.range.end(B)), interface.range.start(Bs)
+            # add the edge to the graph
+            G.add_edge(chart.starts[Bsource], target, **attrs)
+        return G
+    graph = utils.alias(digraph, 'blocks')
 
-                # FIXME: figure out some more default attributes to include
-                attrs = {}
-                if interface.range.end(B) == target:
-                    operator.setitem(attrs, '__contiguous__', interface.range.end(B) == target)
-                elif instruction.type.is_jxx(source):
-                    operator.setitem(attrs, '__conditional__', True)
-                elif instruction.type.is_jmp(source) or instruction.type.is_jmpi(source):
-                    operator.setitem(attrs, '__unconditional__', True)
-                else:
-                    operator.setitem(attrs, '__branch__', instruction.type.is_branch(source))
+    @utils.multicase(ea=(six.integer_types, builtins.list, builtins.tuple, builtins.set))
+    @classmethod
+    def reachable(cls, ea, **flags):
+        '''Return the boundaries of each block in the current function that is reachable from the block at the address `ea`.'''
+        return cls.reachable(ui.current.function(), ea, **flags)
+    @utils.multicase(ea=(six.integer_types, builtins.list, builtins.tuple, builtins.set))
+    @classmethod
+    def reachable(cls, func, ea, **flags):
+        """Return the boundaries of each block in the function `func` that is reachable from the block at the address `ea`.
 
-                # add the dot attributes for the edge
-                operator.setitem(attrs, 'dir', 'forward')
+        If `ea` is a list of addresses, then return the blocks that are reachable from any of them.
+        """
+        fn, fcflags = by(func), flags.get('flags', idaapi.FC_PREDS | getattr(idaapi, 'FC_NOEXT', 2) | getattr(idaapi, 'FC_CALL_ENDS', 0x20))
+        chart, indices = cls.__indices__(fn, ea, fcflags)
+        res = chart.reachable(indices)
+        return [ interface.bounds_t(*chart.bounds(index)) for index in sorted(res, key=chart.bounds) ]
 
-                if any(attrs.get(item, False) for item in ['__branch__', '__conditional__', '__unconditional__']):
-                    attrs['label'] = instruction.mnem(source)
+    @utils.multicase(ea=(six.integer_types, builtins.list, builtins.tuple, builtins.set))
+    @classmethod
+    def coreachable(cls, ea, **flags):
+        '''Return the boundaries of each block in the current function that can reach the block at the address `ea`.'''
+        return cls.coreachable(ui.current.function(), ea, **flags)
+    @utils.multicase(ea=(six.integer_types, builtins.list, builtins.tuple, builtins.set))
+    @classmethod
+    def coreachable(cls, func, ea, **flags):
+        """Return the boundaries of each block in the function `func` that can reach the block at the address `ea`.
 
-                # add the edge to the successor
-                G.add_edge(interface.range.start(B), target, **attrs)
-            continue
-        return G
-    graph = utils.alias(digraph, 'blocks')
+        If `ea` is a list of addresses, then return the blocks that can reach any of them.
+        """
+        fn, fcflags = by(func), flags.get('flags', idaapi.FC_PREDS | getattr(idaapi, 'FC_NOEXT', 2) | getattr(idaapi, 'FC_CALL_ENDS', 0x20))
+
+        # We need the predecessors of each block, so we always include them.
+        chart, indices = cls.__indices__(fn, ea, fcflags | idaapi.FC_PREDS)
+        res = chart.coreachable(indices)
+        return [ interface.bounds_t(*chart.bounds(index)) for index in sorted(res, key=chart.bounds) ]
+
+    @classmethod
+    def __indices__(cls, fn, ea, flags):
+        '''Return the flowchart built with `flags` for the function `fn` and the indices of the blocks containing each address in `ea`.'''
+        items = [item for item in ea] if isinstance(ea, (builtins.list, builtins.tuple, builtins.set)) else [ea]
+        chart, indices = cls.__chart__(fn, flags), []
+        for item in items:
+            index = chart.find(item)
+            if index is None:
+                raise E.AddressNotFoundError(u"{:s}.at({:#x}, {:#x}) : Unable to locate `idaapi.BasicBlock` for address {:#x} in the specified function ({:#x}).".format('.'.join([__name__, cls.__name__]), interface.range.start(fn), item, item, interface.range.start(fn)))
+            indices.append(index)
+        return chart, indices
 
     @utils.multicase(start=six.integer_types, exits=(six.integer_types, builtins.list, builtins.tuple, builtins.set))
     @classmethod
-    def subgraph(cls, start, exits):
+    def subgraph(cls, start, exits, **flags):
         '''Return a ``networkx.DiGraph`` subgraph of the current function from address `start` and terminating at any address in `exits`.'''
-        return cls.subgraph(ui.current.function(), start, exits)
+        return cls.subgraph(ui.current.function(), start, exits, **flags)
     @utils.multicase(start=six.integer_types, exits=(six.integer_types, builtins.list, builtins.tuple, builtins.set))
     @classmethod
-    def subgraph(cls, func, start, exits):
+    def subgraph(cls, func, start, exits, **flags):
         """Return a ``networkx.DiGraph`` subgraph of the function `func` from address `start` and terminating at any address in `exits`.
 
+        If `attributes` is false, then only include the boundaries of each block and the edges between them.
         Requires the ``networkx`` module in order to build the graph.
         """
-        g, exits = cls.digraph(func), {item for item in exits} if hasattr(exits, '__iter__') else {exits}
-        start_block = block(start).left
-        exit_blocks = { item.left for item in map(block, exits) }
-
-        # Generate the subgraph using nodes that are within the path the user specified.
-        import networkx
-        nodes = {ea for ea in g.nodes if networkx.has_path(g, start_block, ea) and any(networkx.has_path(g, ea, item) for item in exit_blocks)}
+        FC_NOEXT, FC_CALL_ENDS = getattr(idaapi, 'FC_NOEXT', 2), getattr(idaapi, 'FC_CALL_ENDS', 0x20)
+        fn, exits = by(func), {item for item in exits} if hasattr(exits, '__iter__') else {exits}
+        fcflags = flags.get('flags', idaapi.FC_PREDS | FC_NOEXT | FC_CALL_ENDS) | idaapi.FC_PREDS
+        g = cls.digraph(fn, **dict(flags, flags=fcflags))
+
+        # The nodes within the path the user specified are the ones that are reachable
+        # from the start and can also reach one of the exits.
+        chart, (start_index,) = cls.__indices__(fn, start, fcflags)
+        _, exit_indices = cls.__indices__(fn, exits, fcflags)
+        indices = chart.reachable([start_index]) & chart.coreachable(exit_indices)
+
+        # Generate the subgraph using the nodes that we selected.
+        start_block, nodes = chart.starts[start_index], {chart.starts[index] for index in indices}
         G = g.subgraph(nodes)
 
         # Update the node attributes so that the entry and exits can still be used.
@@ -1615,6 +1738,80 @@ class blocks(object):
         [ operator.setitem(G.nodes[item], '__sentinel__', not G.succ[item]) for item in G ]
         return G
 
+    @utils.multicase()
+    @classmethod
+    def dominators(cls, **flags):
+        '''Return a dictionary of the immediate dominator for each block in the current function.'''
+        return cls.dominators(ui.current.function(), **flags)
+    @utils.multicase()
+    @classmethod
+    def dominators(cls, func, **flags):
+        """Return a dictionary of the immediate dominator for each block in the function `func`.
+
+        The entry block of the function and any blocks that are not reachable from it will not have a dominator.
+        """
+        fn, fcflags = by(func), flags.get('flags', idaapi.FC_PREDS | getattr(idaapi, 'FC_NOEXT', 2) | getattr(idaapi, 'FC_CALL_ENDS', 0x20))
+        chart, (entry,) = cls.__indices__(fn, interface.range.start(fn), fcflags | idaapi.FC_PREDS)
+        res = chart.dominators(entry)
+        return {interface.bounds_t(*chart.bounds(index)) : None if res.get(index, None) is None else interface.bounds_t(*chart.bounds(res[index])) for index in range(len(chart))}
+    @utils.multicase(ea=six.integer_types)
+    @classmethod
+    def dominators(cls, func, ea, **flags):
+        '''Return the boundaries of each block that dominates the block at the address `ea` in the function `func` starting with its immediate dominator.'''
+        fn, fcflags = by(func), flags.get('flags', idaapi.FC_PREDS | getattr(idaapi, 'FC_NOEXT', 2) | getattr(idaapi, 'FC_CALL_ENDS', 0x20))
+        chart, (entry, index) = cls.__indices__(fn, [interface.range.start(fn), ea], fcflags | idaapi.FC_PREDS)
+        return cls.__chain__(chart, chart.dominators(entry), index)
+
+    @utils.multicase()
+    @classmethod
+    def postdominators(cls, **flags):
+        '''Return a dictionary of the immediate post-dominator for each block in the current function.'''
+        return cls.postdominators(ui.current.function(), **flags)
+    @utils.multicase()
+    @classmethod
+    def postdominators(cls, func, **flags):
+        """Return a dictionary of the immediate post-dominator for each block in the function `func`.
+
+        The blocks that exit the function and any blocks that are post-dominated by more than one exit will not have a post-dominator.
+        """
+        fn, fcflags = by(func), flags.get('flags', idaapi.FC_PREDS | getattr(idaapi, 'FC_NOEXT', 2) | getattr(idaapi, 'FC_CALL_ENDS', 0x20))
+        chart = cls.__chart__(fn, fcflags | idaapi.FC_PREDS)
+        res = chart.postdominators()
+        return {interface.bounds_t(*chart.bounds(index)) : None if res.get(index, None) is None else interface.bounds_t(*chart.bounds(res[index])) for index in range(len(chart))}
+    @utils.multicase(ea=six.integer_types)
+    @classmethod
+    def postdominators(cls, func, ea, **flags):
+        '''Return the boundaries of each block that post-dominates the block at the address `ea` in the function `func` starting with its immediate post-dominator.'''
+        fn, fcflags = by(func), flags.get('flags', idaapi.FC_PREDS | getattr(idaapi, 'FC_NOEXT', 2) | getattr(idaapi, 'FC_CALL_ENDS', 0x20))
+        chart, (index,) = cls.__indices__(fn, ea, fcflags | idaapi.FC_PREDS)
+        return cls.__chain__(chart, chart.postdominators(), index)
+
+    @classmethod
+    def __chain__(cls, chart, dominators, index):
+        '''Return the boundaries of each block from the dictionary of `dominators` that dominates the block at `index` in the flowchart `chart`.'''
+        items, dominator = [], dominators.get(index, None)
+        while dominator is not None:
+            items.append(interface.bounds_t(*chart.bounds(dominator)))
+            dominator = dominators[dominator]
+        return items
+
+    @utils.multicase()
+    @classmethod
+    def loops(cls, **flags):
+        '''Return a list of the header and the blocks for each natural loop in the current function.'''
+        return cls.loops(ui.current.function(), **flags)
+    @utils.multicase()
+    @classmethod
+    def loops(cls, func, **flags):
+        """Return a list of the header and the blocks for each natural loop in the function `func`.
+
+        Each loop is returned as a tuple containing the boundaries of its header and a sorted list of the boundaries for the blocks in its body.
+        """
+        fn, fcflags = by(func), flags.get('flags', idaapi.FC_PREDS | getattr(idaapi, 'FC_NOEXT', 2) | getattr(idaapi, 'FC_CALL_ENDS', 0x20))
+        chart, (entry,) = cls.__indices__(fn, interface.range.start(fn), fcflags | idaapi.FC_PREDS)
+        Fbounds = lambda index: interface.bounds_t(*chart.bounds(index))
+        return [(Fbounds(header), sorted(map(Fbounds, body))) for header, body in sorted(chart.loops(entry).items(), key=lambda item: chart.bounds(item[0]))]
+
     # XXX: Implement .register for filtering blocks
     # XXX: Implement .search for filtering blocks
 flowchart = utils.alias(blocks.flowchart, 'blocks')
@@ -1705,13 +1902,15 @@ class block(object):
     @utils.multicase(ea=six.integer_types)
     def __new__(cls, func, ea, **flags):
         '''Returns the boundaries of the basic block at address `ea` in function `func`.'''
-        res = blocks.at(func, ea, **flags)
-        return interface.range.bounds(res)
+        FC_NOEXT, FC_CALL_ENDS = getattr(idaapi, 'FC_NOEXT', 2), getattr(idaapi, 'FC_CALL_ENDS', 0x20)
+        fc_flags = flags.get('flags', idaapi.FC_PREDS | FC_NOEXT)
+        fc_flags |= 0 if any(not flags[item] for item in ['call', 'calls', 'split'] if item in flags) else FC_CALL_ENDS
+        return cls(func, ea, fc_flags)
     @utils.multicase(ea=six.integer_types, flags=six.integer_types)
     def __new__(cls, func, ea, flags):
         '''Returns the boundaries of the basic block with the specified `flags` (``idaapi.FC_*``) at address `ea` in function `func`.'''
-        res = blocks.at(func, ea, flags)
-        return interface.range.bounds(res)
+        G, index = blocks.__locate__(by(func), ea, flags)
+        return interface.bounds_t(*G.bounds(index))
     @utils.multicase(bb=idaapi.BasicBlock)
     def __new__(cls, bb):
         '''Returns the boundaries of the basic block `bb`.'''
@@ -1858,10 +2057,15 @@ class block(object):
     @classmethod
     def color(cls, bb):
         '''Returns the color of the basic block `bb`.'''
+        fn = by_address(interface.range.start(bb))
+        return cls.__color__(fn, bb.id)
+    @classmethod
+    def __color__(cls, fn, id):
+        '''Returns the color of the basic block with the identifier `id` in the function `fn`.'''
         get_node_info = idaapi.get_node_info2 if idaapi.__version__ < 7.0 else idaapi.get_node_info
 
-        fn, ni = by_address(interface.range.start(bb)), idaapi.node_info_t()
-        ok = get_node_info(ni, interface.range.start(fn), bb.id)
+        ni = idaapi.node_info_t()
+        ok = get_node_info(ni, interface.range.start(fn), id)
         if ok and ni.valid_bg_color():
             res = ni.bg_color
             b, r = (res&0xff0000)>>16, res&0x0000ff
@@ -1978,14 +2182,15 @@ class block(object):
     @classmethod
     def before(cls, ea):
         '''Return the addresses of all the instructions that branch to the basic block at address `ea`.'''
-        res = blocks.at(ea)
-        return cls.before(res)
+        flags = idaapi.FC_PREDS | getattr(idaapi, 'FC_NOEXT', 2) | getattr(idaapi, 'FC_CALL_ENDS', 0x20)
+        G, index = blocks.__locate__(by_address(ea), ea, flags)
+        return [ database.address.prev(G.stops[item]) for item in G.preds(index) ]
     @utils.multicase(bounds=builtins.tuple)
     @classmethod
     def before(cls, bounds):
         '''Return the addresses of all the instructions that branch to the basic block identified by `bounds`.'''
-        bb = cls.at(bounds)
-        return cls.before(bb)
+        left, _ = bounds
+        return cls.before(left)
     @utils.multicase(bb=idaapi.BasicBlock)
     @classmethod
     def before(cls, bb):
@@ -2002,14 +2207,15 @@ class block(object):
     @classmethod
     def after(cls, ea):
         '''Return the addresses of all the instructions that the basic block at address `ea` leaves to.'''
-        bb = cls.at(ea)
-        return cls.after(bb)
+        flags = idaapi.FC_PREDS | getattr(idaapi, 'FC_NOEXT', 2) | getattr(idaapi, 'FC_CALL_ENDS', 0x20)
+        G, index = blocks.__locate__(by_address(ea), ea, flags)
+        return [ G.starts[item] for item in G.succs(index) ]
     @utils.multicase(bounds=builtins.tuple)
     @classmethod
     def after(cls, bounds):
         '''Return the addresses of all the instructions that branch to the basic block identified by `bounds`.'''
-        bb = cls.at(bounds)
-        return cls.after(bb)
+        left, _ = bounds
+        return cls.after(left)
     @utils.multicase(bb=idaapi.BasicBlock)
     @classmethod
     def after(cls, bb):
@@ -2862,9 +3068,9 @@ def tag(func):
     # decode the tags that are stored within to a dictionary.
     fn, repeatable = by_address(ea), True
     res = comment(fn, repeatable=False)
-    d1 = internal.comment.decode(res)
+    d1 = internal.comment.decoded.function(interface.range.start(fn), False, res)
     res = comment(fn, repeatable=True)
-    d2 = internal.comment.decode(res)
+    d2 = internal.comment.decoded.function(interface.range.start(fn), True, res)
 
     # Detect if the address had content in both repeatable or non-repeatable
     # comments so we can warn the user about what we're going to do.
@@ -3133,8 +3339,21 @@ def select(func, **boolean):
     # Collect the tagnames being queried as specified by the user.
     Or, And = ({item for item in boolean.get(B, [])} for B in ['Or', 'And'])
 
-    # Walk through every tagged address and cross-check it against the query.
-    for ea in sorted(internal.comment.contents.address(interface.range.start(target), target=interface.range.start(target))):
+    # If the contents of the function have an inverted index, then we can use
+    # it to find the candidates without decoding anything. And(&) can only
+    # match the intersection of its addresses, whereas Or(|) is their union.
+    index = internal.comment.contents.index(interface.range.start(target), target=interface.range.start(target))
+    if index is not None:
+        postings = ({ea for ea in index.get(name, [])} for name in (And or Or))
+        candidates = functools.reduce(operator.and_ if And else operator.or_, postings, next(postings, {item for item in []}))
+        iterable = sorted(candidates)
+
+    # Otherwise we need to check every single address that has been tagged.
+    else:
+        iterable = sorted(internal.comment.contents.address(interface.range.start(target), target=interface.range.start(target)))
+
+    # Walk through every candidate address and cross-check it against the query.
+    for ea in iterable:
         ui.navigation.analyze(ea)
         collected, address = {}, database.tag(ea)
 
@@ -4306,6 +4525,66 @@ class xref(object):
 
     """
 
+    @classmethod
+    def __references__(cls, fn, **silent):
+        """Yield each instruction address and the address that it references for the references that leave the function `fn`.
+
+        If `silent` is true, then don't warn about any branch or call instructions that have unresolved references.
+        """
+        get_switch_info = idaapi.get_switch_info_ex if idaapi.__version__ < 7.0 else idaapi.get_switch_info
+        branches, Flogging = [instruction.is_call, instruction.is_branch], logging.debug if silent.get('silent', False) else logging.warning
+        for ea in iterate(fn):
+
+            # if it isn't code, then we skip it.
+            if not database.type.is_code(ea):
+                continue
+
+            # if it's a branching or call-type instruction that has no xrefs, then log a warning for the user.
+            elif not len(database.xref.down(ea)) and any(F(ea) for F in branches):
+                Flogging(u"{:s}.down({:#x}) : Discovered the \"{:s}\" instruction at {:#x} that might've contained a reference but was unresolved.".format('.'.join([__name__, cls.__name__]), interface.range.start(fn), utils.string.escape(database.instruction(ea), '"'), ea))
+                continue
+
+            # now we need to check which code xrefs are actually going to be something we care
+            # about by checking to see if there's an xref pointing outside our function.
+            for xref in filter(database.within, database.xref.code_down(ea)):
+                if not contains(fn, xref):
+                    yield ea, xref
+
+                # if it's a branching or call-type instruction, but referencing non-code, then we care about it.
+                elif not database.type.is_code(xref) and any(F(ea) for F in branches):
+                    yield ea, xref
+
+                # if we're recursive and there's a code xref that's referencing our entrypoint,
+                # then we're going to want that too.
+                elif interface.range.start(fn) == xref:
+                    yield ea, xref
+                continue
+
+            # if we're at a switch branch, then we don't need to follow any
+            # data references, and we can just skip the rest of our logic.
+            if get_switch_info(ea):
+                continue
+
+            # last thing we need to determine is which data xrefs are relevant
+            # which only includes things that reference code outside of us.
+            for xref in filter(database.within, database.xref.data_down(ea)):
+                if database.type.is_code(xref) and not contains(fn, xref):
+                    yield ea, xref
+
+                # if it's referencing an external, then yeah...this is definitely an xref we want.
+                elif idaapi.segtype(xref) in {idaapi.SEG_XTRN}:
+                    # FIXME: technically an external could also be a non-callable address, but we
+                    #        don't care because the user is gonna wanna know about it anyways.
+                    yield ea, xref
+
+                # otherwise if it's a branch, but not referencing any code
+                # then this is probably a global containing a code pointer.
+                elif not database.type.is_code(xref) and any(F(ea) for F in branches):
+                    yield ea, xref
+                continue
+            continue
+        return
+
     ## referencing
     @utils.multicase()
     @classmethod
@@ -4319,66 +4598,10 @@ class xref(object):
 
         If the boolean `references` is true, then include the reference address of each instruction along with its.
         """
-        get_switch_info = idaapi.get_switch_info_ex if idaapi.__version__ < 7.0 else idaapi.get_switch_info
-
-        # define a closure that will get us all of the related code references so we can process them.
-        def Freferences(fn):
-            branches = [instruction.is_call, instruction.is_branch]
-            for ea in iterate(fn):
-
-                # if it isn't code, then we skip it.
-                if not database.type.is_code(ea):
-                    continue
-
-                # if it's a branching or call-type instruction that has no xrefs, then log a warning for the user.
-                elif not len(database.xref.down(ea)) and any(F(ea) for F in branches):
-                    logging.warning(u"{:s}.down({:#x}) : Discovered the \"{:s}\" instruction at {:#x} that might've contained a reference but was unresolved.".format('.'.join([__name__, cls.__name__]), interface.range.start(fn), utils.string.escape(database.instruction(ea), '"'), ea))
-                    continue
-
-                # now we need to check which code xrefs are actually going to be something we care
-                # about by checking to see if there's an xref pointing outside our function.
-                for xref in filter(database.within, database.xref.code_down(ea)):
-                    if not contains(fn, xref):
-                        yield ea, xref
-
-                    # if it's a branching or call-type instruction, but referencing non-code, then we care about it.
-                    elif not database.type.is_code(xref) and any(F(ea) for F in branches):
-                        yield ea, xref
-
-                    # if we're recursive and there's a code xref that's referencing our entrypoint,
-                    # then we're going to want that too.
-                    elif interface.range.start(fn) == xref:
-                        yield ea, xref
-                    continue
-
-                # if we're at a switch branch, then we don't need to follow any
-                # data references, and we can just skip the rest of our logic.
-                if get_switch_info(ea):
-                    continue
-
-                # last thing we need to determine is which data xrefs are relevant
-                # which only includes things that reference code outside of us.
-                for xref in filter(database.within, database.xref.data_down(ea)):
-                    if database.type.is_code(xref) and not contains(fn, xref):
-                        yield ea, xref
-
-                    # if it's referencing an external, then yeah...this is definitely an xref we want.
-                    elif idaapi.segtype(xref) in {idaapi.SEG_XTRN}:
-                        # FIXME: technically an external could also be a non-callable address, but we
-                        #        don't care because the user is gonna wanna know about it anyways.
-                        yield ea, xref
-
-                    # otherwise if it's a branch, but not referencing any code
-                    # then this is probably a global containing a code pointer.
-                    elif not database.type.is_code(xref) and any(F(ea) for F in branches):
-                        yield ea, xref
-                    continue
-                continue
-            return
-
-        # grab our function and then grab all of the references from it.
         fn = by(func)
-        iterable = Freferences(fn)
+
+        # grab all of the references for our function from the call graph.
+        iterable = callgraph.__edges__(fn)
 
         # now we need to figure out if we're just going to return the referenced addresses.
         if not builtins.next((references[k] for k in ['reference', 'references', 'refs'] if k in references), False):
@@ -4449,3 +4672,147 @@ class xref(object):
 
 x = xref    # XXX: ns alias
 up, down = utils.alias(xref.up, 'xref'), utils.alias(xref.down, 'xref')
+
+class callgraph(object):
+    """
+    This namespace is for interacting with the call graph of the entire
+    database. The call graph is composed of the references that leave
+    each function as returned by ``function.down``, and is stored within
+    the database so that the references for a function only need to be
+    discovered again when something within that function has changed.
+
+    This allows one to find the callers of a function, or to traverse
+    the functions that are called by a function (or call it) without
+    having to check the instructions of each function every time.
+
+    Some ways to utilize this namespace can be::
+
+        > for ea in function.callgraph.callers(): ...
+        > for ea in function.callgraph.closure(ea): ...
+        > for ea, depth in function.callgraph.traverse(ea, 2, reverse=True): ...
+        > for component in function.callgraph.components(): ...
+
+    """
+    @classmethod
+    def __edges__(cls, fn):
+        '''Return the `(site, target)` tuples for the references that leave the function `fn` discovering them if necessary.'''
+        ea = interface.range.start(fn)
+
+        # We can only keep them if there are hooks to discard them when the function changes.
+        if idaapi.__version__ < 7.0:
+            return [(site, target) for site, target in xref.__references__(fn)]
+
+        res = internal.callgraph.graph.get(ea)
+        return internal.callgraph.graph.set(ea, xref.__references__(fn)) if res is None else res
+
+    @classmethod
+    def __update__(cls):
+        '''Discover the references for each function in the call graph that is missing or has been changed.'''
+        G = internal.callgraph.graph
+
+        # If there aren't any hooks, then we can't trust anything and need to discover everything.
+        if idaapi.__version__ < 7.0:
+            G.reset()
+
+        # Start out by discovering the references for each function that was changed.
+        for ea in G.dirtied():
+            fn = idaapi.get_func(ea)
+            if fn and interface.range.start(fn) == ea:
+                G.set(ea, xref.__references__(fn, silent=True))
+            else:
+                G.remove(ea)
+            continue
+
+        if G.complete():
+            return 0
+
+        # Now we can go through every function that is missing from the graph.
+        functions = [idaapi.getn_func(index) for index in range(idaapi.get_func_qty())]
+        missing = [fn for fn in functions if G.get(interface.range.start(fn)) is None]
+        logging.info(u"{:s}.update() : Discovering the references for {:d} function{:s} out of {:d} in order to complete the call graph.".format('.'.join([__name__, cls.__name__]), len(missing), '' if len(missing) == 1 else 's', len(functions)))
+        [ G.set(interface.range.start(fn), xref.__references__(fn, silent=True)) for fn in missing ]
+        G.complete(True)
+        return len(missing)
+
+    @classmethod
+    def build(cls):
+        '''Discard the call graph and discover the references for every function in the database again.'''
+        internal.callgraph.graph.clear()
+        return cls.__update__()
+
+    @classmethod
+    def flush(cls, *args):
+        '''Write the call graph into the database so that it can be used the next time that it is opened.'''
+        if idaapi.__version__ < 7.0:
+            return False
+        return internal.callgraph.graph.flush()
+
+    @utils.multicase()
+    @classmethod
+    def callers(cls):
+        '''Return the address of each function that references the current function.'''
+        return cls.callers(ui.current.function())
+    @utils.multicase()
+    @classmethod
+    def callers(cls, func):
+        '''Return the address of each function that references the function `func`.'''
+        _, ea = interface.addressOfRuntimeOrStatic(func)
+        cls.__update__()
+        return internal.callgraph.graph.predecessors(ea)
+
+    @utils.multicase()
+    @classmethod
+    def callees(cls):
+        '''Return each address that is referenced by the current function.'''
+        return cls.callees(ui.current.function())
+    @utils.multicase()
+    @classmethod
+    def callees(cls, func):
+        '''Return each address that is referenced by the function `func`.'''
+        fn = by(func)
+        return sorted({target for _, target in cls.__edges__(fn)})
+
+    @utils.multicase()
+    @classmethod
+    def closure(cls, **reverse):
+        '''Return every address that is reachable by following the references from the current function.'''
+        return cls.closure(ui.current.function(), **reverse)
+    @utils.multicase()
+    @classmethod
+    def closure(cls, func, **reverse):
+        """Return every address that is reachable by following the references from the function `func`.
+
+        If `reverse` is true, then return every function that can reach the function `func` instead.
+        """
+        _, ea = interface.addressOfRuntimeOrStatic(func)
+        cls.__update__()
+        return internal.callgraph.graph.closure([ea], reverse.get('reverse', False))
+
+    @utils.multicase()
+    @classmethod
+    def traverse(cls, func, **reverse):
+        '''Return a list of each address that is reachable from the function `func` along with the number of references needed to reach it.'''
+        return cls.traverse(func, None, **reverse)
+    @utils.multicase(depth=(six.integer_types, None.__class__))
+    @classmethod
+    def traverse(cls, func, depth, **reverse):
+        """Return a list of each address that is reachable from the function `func` in at most `depth` references along with the number of references needed to reach it.
+
+        If `reverse` is true, then follow the functions that reference the function `func` instead.
+        """
+        _, ea = interface.addressOfRuntimeOrStatic(func)
+        cls.__update__()
+        res = internal.callgraph.graph.traverse([ea], depth, reverse.get('reverse', False))
+        return [(item, res[item]) for item in sorted(res, key=lambda item: (res[item], item))]
+
+    @classmethod
+    def components(cls, **trivial):
+        """Return a list of the strongly connected components (recursive functions) in the call graph.
+
+        If `trivial` is true, then include the components that are composed of a single address without a reference to itself.
+        """
+        G, _ = internal.callgraph.graph, cls.__update__()
+        items = G.components()
+        if trivial.get('trivial', False):
+            return items
+        return [item for item in items if len(item) > 1 or item[0] in G.successors(item[0])]
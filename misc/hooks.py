@@ -9,7 +9,7 @@ to be used by the average user.
 
 import six
 import sys, logging
-import functools, operator, itertools, types
+import functools, operator, itertools, types, bisect
 
 import database, function, instruction, ui
 import internal
@@ -314,6 +314,7 @@ class address(changingchanged):
 
     @classmethod
     def changing(cls, ea, repeatable_cmt, newcmt):
+        internal.comment.decoded.discard('address', ea)
         if not cls.is_ready():
             return logging.debug(u"{:s}.changing({:#x}, {:d}, {!s}) : Ignoring comment.changing event (database not ready) for a {:s} comment at {:#x}.".format('.'.join([__name__, cls.__name__]), ea, repeatable_cmt, utils.string.repr(newcmt), 'repeatable' if repeatable_cmt else 'non-repeatable', ea))
         if interface.node.is_identifier(ea):
@@ -347,6 +348,7 @@ class address(changingchanged):
 
     @classmethod
     def changed(cls, ea, repeatable_cmt):
+        internal.comment.decoded.discard('address', ea)
         if not cls.is_ready():
             return logging.debug(u"{:s}.changed({:#x}, {:d}) : Ignoring comment.changed event (database not ready) for a {:s} comment at {:#x}.".format('.'.join([__name__, cls.__name__]), ea, repeatable_cmt, 'repeatable' if repeatable_cmt else 'non-repeatable', ea))
         if interface.node.is_identifier(ea):
@@ -381,6 +383,7 @@ class address(changingchanged):
 
     @classmethod
     def old_changed(cls, ea, repeatable_cmt):
+        internal.comment.decoded.discard('address', ea)
         if not cls.is_ready():
             return logging.debug(u"{:s}.old_changed({:#x}, {:d}) : Ignoring comment.changed event (database not ready) for a {:s} comment at {:#x}.".format('.'.join([__name__, cls.__name__]), ea, repeatable_cmt, 'repeatable' if repeatable_cmt else 'non-repeatable', ea))
         if interface.node.is_identifier(ea):
@@ -522,6 +525,7 @@ class globals(changingchanged):
 
     @classmethod
     def changing(cls, cb, a, cmt, repeatable):
+        internal.comment.decoded.discard('function', interface.range.start(a))
         if not cls.is_ready():
             return logging.debug(u"{:s}.changing({!s}, {:#x}, {!s}, {:d}) : Ignoring comment.changing event (database not ready) for a {:s} comment at {:#x}.".format('.'.join([__name__, cls.__name__]), utils.string.repr(cb), interface.range.start(a), utils.string.repr(cmt), repeatable, 'repeatable' if repeatable else 'non-repeatable', interface.range.start(a)))
         if interface.node.is_identifier(interface.range.start(a)):
@@ -562,6 +566,7 @@ class globals(changingchanged):
 
     @classmethod
     def changed(cls, cb, a, cmt, repeatable):
+        internal.comment.decoded.discard('function', interface.range.start(a))
         if not cls.is_ready():
             return logging.debug(u"{:s}.changed({!s}, {:#x}, {!s}, {:d}) : Ignoring comment.changed event (database not ready) for a {:s} comment at {:#x}.".format('.'.join([__name__, cls.__name__]), utils.string.repr(cb), interface.range.start(a), utils.string.repr(cmt), repeatable, 'repeatable' if repeatable else 'non-repeatable', interface.range.start(a)))
         if interface.node.is_identifier(interface.range.start(a)):
@@ -605,6 +610,7 @@ class globals(changingchanged):
 
     @classmethod
     def old_changed(cls, cb, a, cmt, repeatable):
+        internal.comment.decoded.discard('function', interface.range.start(a))
         if not cls.is_ready():
             return logging.debug(u"{:s}.old_changed({!s}, {:#x}, {!s}, {:d}) : Ignoring comment.changed event (database not ready) for a {:s} comment at {:#x}.".format('.'.join([__name__, cls.__name__]), utils.string.repr(cb), interface.range.start(a), utils.string.repr(cmt), repeatable, 'repeatable' if repeatable else 'non-repeatable', interface.range.start(a)))
         if interface.node.is_identifier(interface.range.start(a)):
@@ -803,8 +809,10 @@ State = None
 def on_close():
     '''IDB_Hooks.closebase'''
 
-    # Database was closed, so we need to reset our state.
+    # Database was closed, so we need to reset our state and discard any
+    # of the comments that we've decoded since they're no longer relevant.
     global State
+    internal.comment.decoded.clear()
     if state:
         logging.debug(u"{:s}.on_close() : Received unexpected state transition from state ({!s}).".format(__name__, utils.string.repr(State)))
     State = None
@@ -864,8 +872,16 @@ def nw_on_oldfile(nw_code, is_old_database):
     return on_oldfile(fname)
 
 def __check_functions():
+    '''Resume seeding the tag cache if it was interrupted the last time the database was open.'''
     # FIXME: check if tagcache needs to be created
-    return
+    checkpoint = internal.comment.tagging.checkpoint()
+    if checkpoint is None:
+        return
+
+    # We have a checkpoint, so we need to continue where we left off.
+    last, total = checkpoint
+    logging.warning(u"{:s}.check_functions() : Resuming the incomplete build of the tag cache {:s} with {:d} tag{:s} already indexed.".format(__name__, 'from the beginning' if last is None else "after function {:#x}".format(last), total, '' if total == 1 else 's'))
+    return __process_functions()
 
 def on_ready():
     '''IDP_Hooks.auto_empty'''
@@ -897,11 +913,24 @@ def auto_queue_empty(type):
 def __process_functions(percentage=0.10):
     """This prebuilds the tag cache and index for the entire database so that we can differentiate tags made by the user and the application.
 
-    It's intended to be called once the database is ready to be tampered with.
+    It's intended to be called once the database is ready to be tampered with. The
+    progress is checkpointed after each function so that if it gets cancelled or
+    interrupted, it will be resumed the next time the database is opened.
     """
     implicit = {'__typeinfo__', '__name__'}
     P, globals = ui.Progress(), {ea : count for ea, count in internal.comment.globals.iterate()}
 
+    # Only comments, extra comments, and colors can contain tags that aren't
+    # implicit. We use this to cheaply pre-scan the heads of each function so
+    # that we only decode the tags for the addresses that can actually have them.
+    getflags = idaapi.getFlags if idaapi.__version__ < 7.0 else idaapi.get_full_flags
+    mask = idaapi.FF_COMM | idaapi.FF_LINE
+    Fcandidate = lambda ea: getflags(ea) & mask or idaapi.get_item_color(ea) != idaapi.DEFCOLOR
+
+    # If there's a checkpoint, then we've been interrupted and need to resume.
+    checkpoint = internal.comment.tagging.checkpoint()
+    last, total = checkpoint or (None, 0)
+
     # Now we need to gather all of our imports so that we can clean up any functions
     # that are runtime-linked addresses. This is because IDA seems to create a
     # func_t for certain imports.
@@ -910,11 +939,18 @@ def __process_functions(percentage=0.10):
         idaapi.enum_import_names(idx, lambda address, name, ordinal: imports.add(address) or True)
 
     # Now that we have our imports, we can iterate through all of the functions.
-    total, funcs = 0, [ea for ea in database.functions()]
+    funcs = [ea for ea in database.functions()]
     P.update(current=0, max=len(funcs), title=u"Pre-building the tag cache and its index...")
     P.open()
-    six.print_(u"Indexing the tags for {:d} functions.".format(len(funcs)))
+    if checkpoint:
+        six.print_(u"Resuming the indexing of the tags for {:d} functions {:s}.".format(len(funcs), 'from the beginning' if last is None else "after function {:#x}".format(last)))
+    else:
+        six.print_(u"Indexing the tags for {:d} functions.".format(len(funcs)))
+    internal.comment.tagging.checkpoint(last, total)
+
     for i, fn in enumerate(funcs):
+        if last is not None and fn <= last:
+            continue
         chunks = [item for item in function.chunks(fn)]
 
         # Check to see if the progress bar was cancelled for "some reason". If
@@ -926,7 +962,7 @@ def __process_functions(percentage=0.10):
             message = []
             start, stop = database.config.bounds()
             message.append(u"We are {:.02f}% complete at function {:#x} ({:d} of {:d}) having indexed only {:d} tag{:s} for the range {:#x}<>{:#x}.".format(100. * i / float(len(funcs)), fn, 1 + i, len(funcs),  total, '' if total == 1 else 's', start, stop))
-            message.append(u"If you cancel now, some of the notations made by the application prior to this process will be non-queryable via select.")
+            message.append(u"If you cancel now, some of the notations made by the application prior to this process will be non-queryable via select until this process is resumed the next time the database is opened.")
             message.append(u'Are you sure?')
             if ui.ask.yn('\n'.join(message), no=True):
                 six.print_(u"User aborted the build of the tag cache at function {:#x} ({:d} of {:d}) and has indexed only {:d} tag{:s}.".format(fn, 1 + i, len(funcs), total, '' if total == 1 else 's'))
@@ -939,6 +975,7 @@ def __process_functions(percentage=0.10):
         # If the current function is in our imports, then we skip it because
         # it's a runtime-linked address and shouldn't have been cached anyways.
         if fn in imports:
+            internal.comment.tagging.checkpoint(fn, total)
             continue
 
         # Update the progress bar with the current function we're working on.
@@ -954,15 +991,24 @@ def __process_functions(percentage=0.10):
         if fn not in globals and function.tag(fn):
             [ internal.comment.globals.inc(fn, k) for k in implicit if k in function.tag(fn) ]
 
+        # Pre-scan the heads of each chunk for the addresses that might have
+        # tags. If there aren't any, then there's nothing to decode and we can
+        # skip straight to the next function after updating our checkpoint.
+        candidates = [[ea for ea in database.address.iterate(l, r) if Fcandidate(ea)] for l, r in chunks]
+        if not any(candidates):
+            internal.comment.tagging.checkpoint(fn, total)
+            continue
+
         # Grab the currently existing cache for the current function, and use
         # it to tally up all of the reference counts for the tags.
         contents = {item for item in internal.comment.contents.address(fn, target=fn)}
-        for ci, (l, r) in enumerate(chunks):
+        for ci, ((l, r), addresses) in enumerate(zip(chunks, candidates)):
             P.update(text=text(chunks=len(chunks), plural='' if len(chunks) == 1 else 's'), tooltip="Chunk #{:d} : {:#x} - {:#x}".format(ci, l, r))
+            ui.navigation.analyze(l)
 
-            # Iterate through each address in the function, only updating the
-            # references for tags that are not in our set of implicit ones.
-            for ea in database.address.iterate(ui.navigation.analyze(l), r):
+            # Iterate through each candidate address in the function, only updating
+            # the references for tags that are not in our set of implicit ones.
+            for ea in addresses:
                 available = {k for k in database.tag(ea)}
                 for k in available - implicit:
                     if ea in globals: internal.comment.globals.dec(ea, k)
@@ -970,8 +1016,11 @@ def __process_functions(percentage=0.10):
                     total += 1
                 continue
             continue
-        continue
+
+        # Now that we've finished the function, save our progress.
+        internal.comment.tagging.checkpoint(fn, total)
     else:
+        internal.comment.tagging.checkpoint(None)
         six.print_(u"Successfully seeded the tag cache with its index which was composed of {:d} tag{:s}.".format(total, '' if total == 1 else 's'))
     P.close()
 
@@ -1003,6 +1052,12 @@ def relocate(info):
     get_segment_name = idaapi.get_segm_name if hasattr(idaapi, 'get_segm_name') else idaapi.get_true_segm_name
     functions, globals = map(utils.fcompose(sorted, list), [database.functions(), internal.comment.globals.iterate()])
 
+    # Keep the addresses of the globals and the contents index in sorted lists
+    # so that we can slice out the items for each segment with a binary search.
+    gaddresses = [ea for ea, _ in globals]
+    index = sorted(internal.netnode.sup.fiter(internal.comment.tagging.node()))
+    Fslice = lambda items, start, stop: slice(bisect.bisect_left(items, start), bisect.bisect_left(items, stop))
+
     # First we need to sanity check what we've been asked to do and then we
     # disable the auto-analysis so that IDA doesn't change anything as we're
     # modifying the netnodes. We preserve this for restoration later.
@@ -1014,10 +1069,11 @@ def relocate(info):
     listable = sorted(segmap)
     logging.info(u"{:s}.relocate({:#x}, {:#x}) : Relocating the tag cache and index for {:d} segment{:s}.".format(__name__, segmap[listable[0]], listable[0], scount, '' if scount == 1 else 's'))
 
-    # Now we'll need to iterate through our functions and globals in order to filter
-    # them and calculate the number of items we'll be expecting to process.
-    count = sum(1 for ea in functions if any(info[si].to <= ea <= info[si].to + info[si].size for si in range(info.size())))
-    count+= sum(1 for ea, _ in globals if any(info[si]._from <= ea <= info[si]._from + info[si].size for si in range(info.size())))
+    # Now we'll need to slice our functions and globals for each segment in order
+    # to calculate the number of items we'll be expecting to process.
+    fslices = [Fslice(functions, info[si].to, info[si].to + info[si].size) for si in range(scount)]
+    gslices = [Fslice(gaddresses, info[si]._from, info[si]._from + info[si].size) for si in range(scount)]
+    count = sum(len(functions[item]) for item in fslices) + sum(len(globals[item]) for item in gslices)
 
     # Create our progress bar that we'll continuously update using the number of
     # items that we just calculated from filtering our functions and globals.
@@ -1051,8 +1107,8 @@ def relocate(info):
         # Iterate through each function that was moved and relocate its contents. If we're
         # using a version of IDA prior to 7.3, then when our event has been dispatched
         # the netnodes have already been moved.
-        listable = [ea for ea in functions if info[si].to <= ea < info[si].to + info[si].size]
-        for i, offset in __relocate_function(info[si]._from, info[si].to, info[si].size, (item for item in listable), moved=True if idaapi.__version__ < 7.3 else False):
+        listable, contents = functions[fslices[si]], index[Fslice(index, info[si]._from, info[si]._from + info[si].size)]
+        for i, offset in __relocate_function(info[si]._from, info[si].to, info[si].size, (item for item in listable), moved=True if idaapi.__version__ < 7.3 else False, index=contents):
             name = database.name(info[si].to + offset)
             text = u"Relocating function {:d} of {:d}{:s}: {:#x} -> {:#x}".format(1 + i, len(listable), " ({:s})".format(name) if name else '', info[si]._from + offset, info[si].to + offset)
             P.update(value=sum([fcount, gcount, i]), text=text)
@@ -1060,7 +1116,7 @@ def relocate(info):
         fcount += len(listable)
 
         # Iterate through all of the globals that were moved.
-        listable = [(ea, count) for ea, count in globals if info[si]._from <= ea < info[si]._from + info[si].size]
+        listable = globals[gslices[si]]
         for i, offset in __relocate_globals(info[si]._from, info[si].to, info[si].size, (item for item in listable)):
             name = database.name(info[si].to + offset)
             text = u"Relocating global {:d} of {:d}{:s}: {:#x} -> {:#x}".format(1 + i, len(listable), " ({:s})".format(name) if name else '', info[si]._from + offset, info[si].to + offset)
@@ -1069,15 +1125,19 @@ def relocate(info):
         gcount += len(listable)
     P.close()
 
-def __relocate_function(old, new, size, iterable, moved=False):
+def __relocate_function(old, new, size, iterable, moved=False, index=None):
     """Relocate the function addresses in `iterable` from address `old` to `new` adjusting them by the specified `size`.
 
     If `moved` is specified as true, then the netnodes are already at their target
     as per "Move Segment(s)". Otherwise they're still at their original address
     which happens when the database has been relocated via "Rebase Program".
+
+    If `index` is specified, then it contains the addresses from the contents
+    index that are being moved. Otherwise they will be gathered from the index.
     """
-    key = internal.comment.tagging.__address__
-    failure, total, index = [], [item for item in iterable], {ea : keys for ea, keys in internal.comment.contents.iterate() if old <= ea < old + size}
+    key, ikey = internal.comment.tagging.__address__, internal.comment.tagging.__index__
+    index = [ea for ea in internal.netnode.sup.fiter(internal.comment.tagging.node()) if old <= ea < old + size] if index is None else index
+    failure, total, index = [], [item for item in iterable], {ea : None for ea in index}
 
     for i, fn in enumerate(total):
         offset = fn - new
@@ -1119,6 +1179,10 @@ def __relocate_function(old, new, size, iterable, moved=False):
         # Update the state containing the old addresses with the newly transformed ones.
         res, state[key] = state[key], {ea - old + new : ref for ea, ref in state[key].items()}
 
+        # If there's an inverted index, then its addresses need to be transformed too.
+        if ikey in state:
+            state[ikey] = {name : {ea - old + new : ref for ea, ref in postings.items()} for name, postings in state[ikey].items()}
+
         # And then we can write the modified state back to the function's netnode.
         ok = internal.comment.contents._write(fn, fn, state)
         if not ok:
@@ -1174,24 +1238,26 @@ def __relocate_function(old, new, size, iterable, moved=False):
 def __relocate_globals(old, new, size, iterable):
     '''Relocate the global tuples (address, count) in `iterable` from address `old` to `new` adjusting them by the specified `size`.'''
     node = internal.comment.tagging.node()
-    failure, total = [], [item for item in iterable]
-    for i, (ea, count) in enumerate(total):
-        offset = ea - old
+    total = [item for item in iterable]
 
-        # Remove the old address from the netnode cache (altval) with our global.
-        ok = internal.netnode.alt.remove(node, ea)
-        if not ok:
-            logging.fatal(u"{:s}.relocate_globals({:#x}, {:#x}, {:+#x}, {!r}) : Failure trying to remove reference count ({!r}) for global {:#x}.".format(__name__, old, new, size, iterable, count, ea))
+    # Move all of the addresses within the netnode cache (altval) for the segment
+    # in bulk. If the number that were moved is different, then the globals that
+    # we were given are out of sync with the cache and we need to warn the user.
+    moved = internal.netnode.alt.move(node, old, new, size)
+    if moved != len(total):
+        logging.warning(u"{:s}.relocate_globals({:#x}, {:#x}, {:+#x}, {!r}) : The number of reference counts that were relocated ({:d}) is different from the number of globals that were expected ({:d}).".format(__name__, old, new, size, iterable, moved, len(total)))
 
-        # Now we can re-add the new address to the netnode cache (altval).
-        ok = internal.netnode.alt.set(node, new + offset, count)
-        if not ok:
-            logging.fatal(u"{:s}.relocate_globals({:#x}, {:#x}, {:+#x}, {!r}) : Failure trying to store reference count ({!r}) from {:#x} to {:#x}.".format(__name__, old, new, size, iterable, count, ea, new + offset))
-            failure.append((ea, new + offset, count))
+    for i, (ea, count) in enumerate(total):
+        offset = ea - old
 
         # Yield the offset to the global that we just processed.
         logging.debug(u"{:s}.relocate_globals({:#x}, {:#x}, {:+#x}, {!r}) : Relocated count ({:d}) for global {:#x} from {:#x} to {:#x}.".format(__name__, old, new, size, iterable, count, ea, old + offset, new + offset))
         yield i, offset
+
+    # Now that the refcounts have been moved, we need to relocate the addresses
+    # for each tag name that is in the inverted index.
+    count = internal.comment.globals.relocate(old, new, size)
+    logging.debug(u"{:s}.relocate_globals({:#x}, {:#x}, {:+#x}, {!r}) : Relocated {:d} address{:s} within the inverted index from {:#x} to {:#x}.".format(__name__, old, new, size, iterable, count, '' if count == 1 else 'es', old, new))
     return
 
 def segm_start_changed(s, *oldstart):
@@ -1336,6 +1402,10 @@ class naming(changingchanged):
 
     @classmethod
     def changed(cls, ea, new_name, local_name):
+        # The name has already been changed, so update its index regardless of the state.
+        if not interface.node.is_identifier(ea):
+            cls.reindex(ea)
+
         if not cls.is_ready():
             return logging.debug(u"{:s}.changed({:#x}, {!r}, {!s}) : Ignoring naming.changed event (database not ready) for {:#x}.".format('.'.join([__name__, cls.__name__]), ea, new_name, local_name, ea))
         if interface.node.is_identifier(ea):
@@ -1385,6 +1455,21 @@ class naming(changingchanged):
             logging.debug(u"{:s}.rename({:#x}, {!r}) : Increasing reference count for tag {!r} at address due to a new name.".format('.'.join([__name__, cls.__name__]), ea, newname, '__name__'))
         return
 
+    @classmethod
+    def reindex(cls, ea):
+        '''Update the names for the address `ea` within the name index if it has been built.'''
+        try:
+            database.names.__update__(ea)
+        except Exception:
+            logging.warning(u"{:s}.reindex({:#x}) : Discarding the name index due to an error while updating the names for the address {:#x}.".format('.'.join([__name__, cls.__name__]), ea, ea), exc_info=True)
+            internal.index.names.reset()
+        return
+
+    @classmethod
+    def function(cls, pfn, *new_start):
+        '''Update the name index for the entrypoint of the function `pfn` and its `new_start` if one was given.'''
+        [ cls.reindex(ea) for ea in itertools.chain([interface.range.start(pfn)], new_start) ]
+
 class extra_cmt(changingchanged):
     """
     This class is pretty much just a namespace for finding information about the
@@ -1899,6 +1984,170 @@ def set_func_end(pfn, new_end):
         return
     return
 
+class chunks(object):
+    """
+    This namespace contains the hooks that are responsible for invalidating
+    the chunks within the chunk index whenever a function is changed. The
+    hooks that are called prior to a change invalidate their range as pending,
+    and every hook will settle the ranges that were pending before it.
+    """
+    @classmethod
+    def __invalidate__(cls, bounds, pending=False):
+        '''Invalidate each of the chunks within the list of `bounds`.'''
+        internal.index.chunks.settle()
+        [ internal.index.chunks.invalidate(left, right, pending=pending) for left, right in bounds ]
+
+    @classmethod
+    def __bounds__(cls, pfn):
+        '''Return a list of the boundaries for each chunk belonging to the function `pfn`.'''
+        try:
+            return [bounds for bounds in function.chunks(pfn)]
+        except E.FunctionNotFoundError:
+            return [interface.range.bounds(pfn)]
+
+    @classmethod
+    def add_func(cls, pfn):
+        '''Invalidate each of the chunks for the function `pfn` that was created.'''
+        return cls.__invalidate__(cls.__bounds__(pfn))
+
+    @classmethod
+    def del_func(cls, pfn):
+        '''Invalidate each of the chunks for the function `pfn` that is being removed.'''
+        return cls.__invalidate__(cls.__bounds__(pfn), pending=True)
+
+    @classmethod
+    def set_func_start(cls, pfn, new_start):
+        '''Invalidate the chunk `pfn` which will be changed to start at `new_start`.'''
+        start, stop = interface.range.bounds(pfn)
+        return cls.__invalidate__([(min(start, new_start), stop)], pending=True)
+
+    @classmethod
+    def set_func_end(cls, pfn, new_end):
+        '''Invalidate the chunk `pfn` which will be changed to stop at `new_end`.'''
+        start, stop = interface.range.bounds(pfn)
+        return cls.__invalidate__([(start, max(stop, new_end))], pending=True)
+
+    @classmethod
+    def func_tail_appended(cls, pfn, tail):
+        '''Invalidate the chunk `tail` that was appended to the function `pfn`.'''
+        return cls.__invalidate__([interface.range.bounds(tail)])
+
+    @classmethod
+    def removing_func_tail(cls, pfn, tail):
+        '''Invalidate the chunk `tail` that is being removed from the function `pfn`.'''
+        return cls.__invalidate__([interface.range.bounds(tail)], pending=True)
+
+    @classmethod
+    def tail_owner_changed(cls, tail, owner_func, *old_owner):
+        '''Invalidate the chunk `tail` that has been given to the function `owner_func`.'''
+        return cls.__invalidate__([interface.range.bounds(tail)])
+
+    @classmethod
+    def updated(cls, *args):
+        '''Settle the chunks that were pending now that a function has been updated.'''
+        return cls.__invalidate__([])
+
+class invalidate(object):
+    """
+    This namespace contains the hooks that are responsible for discarding
+    whatever has been cached for a function (its metrics, its flowcharts,
+    or its references within the call graph) whenever it has been changed.
+    Each cache registers the callable that discards a function along with
+    the kinds of changes that it depends on, and each hook dispatches the
+    functions that own its change to the callables registered for its kind.
+    """
+    __handlers__ = {}
+
+    @classmethod
+    def register(cls, callable, *kinds):
+        '''Register the `callable` to discard a function whenever one of the specified `kinds` of changes has been made to it.'''
+        for kind in kinds:
+            handlers = cls.__handlers__.setdefault(kind, [])
+            if callable not in handlers:
+                handlers.append(callable)
+            continue
+        return callable
+
+    @classmethod
+    def __dispatch__(cls, kind, functions):
+        '''Dispatch the address of each function in `functions` to the callables that were registered for `kind`.'''
+        handlers = cls.__handlers__.get(kind, [])
+        for ea in functions:
+            [ F(ea) for F in handlers ]
+        return
+
+    @classmethod
+    def __owners__(cls, *addresses):
+        '''Return a sorted list of the functions that own any of the specified `addresses`.'''
+        res = set()
+        for ea in addresses:
+            try:
+                res.update(function.chunk.owners(ea))
+            except E.DisassemblerError:
+                logging.debug(u"{:s}.owners({:#x}) : Unable to determine the owners of the address {:#x} in order to discard what was cached for them.".format('.'.join([__name__, cls.__name__]), ea, ea), exc_info=True)
+            continue
+        return sorted(res)
+
+    @classmethod
+    def function(cls, pfn, *args):
+        '''Discard what was cached for the function `pfn` that has been changed.'''
+        return cls.__dispatch__('function', [interface.range.start(pfn)])
+
+    @classmethod
+    def start(cls, pfn, new_start):
+        '''Discard what was cached for the function `pfn` that will be moved to the address `new_start`.'''
+        return cls.__dispatch__('function', [interface.range.start(pfn), new_start])
+
+    @classmethod
+    def owner(cls, tail, owner, *old):
+        '''Discard what was cached for both the old and new `owner` of the function `tail`.'''
+        return cls.__dispatch__('function', [ea for ea in itertools.chain([owner], old) if ea != idaapi.BADADDR])
+
+    @classmethod
+    def instruction(cls, insn):
+        '''Discard what was cached for the functions that own the instruction `insn` that was created.'''
+        return cls.__dispatch__('code', cls.__owners__(insn.ea))
+
+    @classmethod
+    def items(cls, ea1, ea2, *args):
+        '''Discard what was cached for every function owning a chunk that overlaps the items from `ea1` to `ea2` that are being destroyed.'''
+        return cls.__dispatch__('code', internal.index.chunks.owners(ea1, max(ea2, ea1 + 1)))
+
+    @classmethod
+    def cref(cls, frm, to, *args):
+        '''Discard what was cached for the functions that own either side of the code reference from `frm` to `to`.'''
+        return cls.__dispatch__('cref', cls.__owners__(frm, to))
+
+    @classmethod
+    def dref(cls, frm, to, *args):
+        '''Discard what was cached for the functions that own either side of the data reference from `frm` to `to`.'''
+        return cls.__dispatch__('dref', cls.__owners__(frm, to))
+
+    @classmethod
+    def typeinfo(cls, ea, *args):
+        '''Discard what was cached for the function at `ea` whose type information has been changed.'''
+        fn = idaapi.get_func(ea)
+        return cls.__dispatch__('type', [ea] if fn and interface.range.start(fn) == ea else [])
+
+    @classmethod
+    def tryblks(cls, tbv):
+        '''Discard what was cached for every function owning a chunk that overlaps the try blocks in `tbv` that were updated.'''
+        iterable = (tbv[index] for index in range(tbv.size()))
+        bounds = [interface.range.bounds(tb[index]) for tb in iterable for index in range(tb.size())]
+        return cls.__dispatch__('tryblk', sorted({owner for left, right in bounds for owner in internal.index.chunks.owners(left, right)}))
+
+    @classmethod
+    def tryblks_deleted(cls, area):
+        '''Discard what was cached for every function owning a chunk that overlaps the range `area` whose try blocks are being deleted.'''
+        left, right = interface.range.bounds(area)
+        return cls.__dispatch__('tryblk', internal.index.chunks.owners(left, right))
+
+    @classmethod
+    def frame(cls, sptr, *args):
+        '''Discard what was cached for the function that owns the frame `sptr` that has been changed.'''
+        ea = idaapi.get_func_by_frame(sptr.id)
+        return cls.__dispatch__('frame', [] if ea == idaapi.BADADDR else [ea])
+
 class supermethods(object):
     """
     Define all of the functions that will be used as supermethods for
@@ -2169,6 +2418,67 @@ def make_ida_not_suck_cocks(nw_code):
     if idaapi.__version__ >= 6.9:
         ui.hook.idb.add('extra_cmt_changed', extra_cmt.changed, 0)
 
+    ## keep the name index up to date with any functions that are created or
+    ## moved, and discard it whenever the database or its segments are moved.
+    if idaapi.__version__ >= 7.0:
+        [ ui.hook.idb.add(item, naming.function, 0) for item in ['func_added', 'set_func_start'] ]
+        [ ui.hook.idb.add(item, internal.index.names.reset, 0) for item in ['closebase', 'segm_moved', 'allsegs_moved'] ]
+
+    ## invalidate the chunk index whenever a function or its chunks are changed. this
+    ## needs to happen before any of the other hooks so that they don't use stale chunks.
+    if idaapi.__version__ >= 7.0:
+        ui.hook.idb.add('func_added', chunks.add_func, -10)
+        ui.hook.idb.add('deleting_func', chunks.del_func, -10)
+        ui.hook.idb.add('set_func_start', chunks.set_func_start, -10)
+        ui.hook.idb.add('set_func_end', chunks.set_func_end, -10)
+        ui.hook.idb.add('func_tail_appended', chunks.func_tail_appended, -10)
+        ui.hook.idb.add('deleting_func_tail', chunks.removing_func_tail, -10)
+        ui.hook.idb.add('tail_owner_changed', chunks.tail_owner_changed, -10)
+        [ ui.hook.idb.add(item, chunks.updated, -10) for item in ['func_updated', 'func_tail_deleted'] ]
+        [ ui.hook.idb.add(item, internal.index.chunks.reset, -10) for item in ['closebase', 'segm_moved', 'allsegs_moved'] ]
+
+    ## discard whatever was cached for a function (metrics, flowcharts, and calls) or mark it
+    ## as dirty within the call graph whenever something it depends on has been changed.
+    if idaapi.__version__ >= 7.0:
+        invalidate.register(internal.metrics.function.remove, 'function', 'code', 'cref', 'dref', 'frame', 'type', 'tryblk')
+        invalidate.register(internal.index.flowchart.remove, 'function', 'code', 'cref')
+        invalidate.register(internal.index.calls.remove, 'function', 'code', 'cref')
+        invalidate.register(internal.callgraph.graph.dirty, 'function', 'code', 'cref', 'dref')
+
+        [ ui.hook.idb.add(item, invalidate.function, 0) for item in ['func_added', 'func_updated', 'deleting_func', 'set_func_end', 'thunk_func_created', 'func_tail_appended', 'func_tail_deleted'] ]
+        ui.hook.idb.add('set_func_start', invalidate.start, 0)
+        ui.hook.idb.add('tail_owner_changed', invalidate.owner, 0)
+        ui.hook.idb.add('make_code', invalidate.instruction, 0)
+        ui.hook.idb.add('destroyed_items', invalidate.items, 0)
+
+    # the references are only exposed as events by the processor module, and
+    # are dispatched to us before they've actually been added or deleted.
+    if idaapi.__version__ >= 7.0:
+        [ ui.hook.idp.add(item, invalidate.cref, 0) for item in ['ev_add_cref', 'ev_del_cref'] ]
+        [ ui.hook.idp.add(item, invalidate.dref, 0) for item in ['ev_add_dref', 'ev_del_dref'] ]
+
+    # frames are structures until v9.0, so we only need to monitor their members.
+    if 7.0 <= idaapi.__version__ < 9.0:
+        [ ui.hook.idb.add(item, invalidate.frame, 0) for item in ['struc_member_created', 'struc_member_deleted', 'struc_member_changed'] ]
+
+    # the metrics also include the arguments from the prototype of a function and the
+    # handlers from its try blocks, so we need to know when either of them have changed.
+    if idaapi.__version__ >= 7.0:
+        ui.hook.idb.add('ti_changed', invalidate.typeinfo, 0)
+        hasattr(idaapi.IDB_Hooks, 'tryblks_updated') and ui.hook.idb.add('tryblks_updated', invalidate.tryblks, 0)
+        hasattr(idaapi.IDB_Hooks, 'deleting_tryblks') and ui.hook.idb.add('deleting_tryblks', invalidate.tryblks_deleted, 0)
+
+    ## discard the cached flowcharts and calls whenever the database or its segments are moved.
+    if idaapi.__version__ >= 7.0:
+        [ ui.hook.idb.add(item, internal.index.flowchart.reset, 0) for item in ['closebase', 'segm_moved', 'allsegs_moved'] ]
+        [ ui.hook.idb.add(item, internal.index.calls.reset, 0) for item in ['closebase', 'segm_moved', 'allsegs_moved'] ]
+
+    ## write the call graph into the database whenever the database is saved.
+    if idaapi.__version__ >= 7.0:
+        ui.hook.idb.add('savebase', function.callgraph.flush, 0)
+        ui.hook.idb.add('closebase', internal.callgraph.graph.reset, 0)
+        [ ui.hook.idb.add(item, internal.callgraph.graph.clear, 0) for item in ['segm_moved', 'allsegs_moved'] ]
+
     ## just some debugging notification hooks
     #[ ui.hook.ui.add(item, notify(item), -100) for item in ['range','idcstop','idcstart','suspend','resume','term','ready_to_run'] ]
     #[ ui.hook.idp.add(item, notify(item), -100) for item in ['ev_newfile','ev_oldfile','ev_init','ev_term','ev_newprc','ev_newasm','ev_auto_queue_empty'] ]
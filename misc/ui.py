@@ -824,7 +824,32 @@ class timer(object):
 class navigation(object):
     """
     This namespace is for updating the state of the colored navigation band.
+
+    As updating the navigation band requires a round-trip through the user
+    interface, the updates are throttled so that the band is only updated
+    once the number of milliseconds or the number of items specified by
+    ``navigation.throttle`` has elapsed. When the database is being processed
+    in batch mode, or batch mode has been enabled with ``navigation.batch``,
+    the navigation band will not be updated at all.
+
+    Some examples of how to configure the updates are as follows::
+
+        > ui.navigation.throttle(100)
+        > ui.navigation.throttle(count=0x1000)
+        > ui.navigation.batch(True)
+
     """
+    __clock__ = staticmethod(getattr(time, 'perf_counter', time.time))
+
+    # The number of seconds and items between each update. If either is
+    # zero, then it is not used for determining when to update the band.
+    __interval__, __count__ = 0.05, 0
+    __last__, __pending__ = 0.0, 0
+
+    # Whether batch mode is enabled. If this is ``None``, then we use
+    # whatever the disassembler is using (``idaapi.cvar.batch``).
+    __batch__ = None
+
     if all(not hasattr(idaapi, name) for name in ['show_addr', 'showAddr']):
         __set__ = staticmethod(lambda ea: None)
     else:
@@ -835,10 +860,55 @@ class navigation(object):
     else:
         __auto__ = staticmethod(idaapi.showAuto if idaapi.__version__ < 7.0 else idaapi.show_auto)
 
+    @classmethod
+    def batch(cls, *enabled):
+        """Return whether batch mode is enabled which prevents the navigation band from being updated.
+
+        If `enabled` is specified as a boolean, then enable or disable batch mode. If
+        it is ``None``, then use the batch mode of the disassembler (``idaapi.cvar.batch``).
+        """
+        if enabled:
+            [cls.__batch__] = enabled
+        res = cls.__batch__
+        return bool(getattr(getattr(idaapi, 'cvar', None), 'batch', False) if res is None else res)
+
+    @classmethod
+    def throttle(cls, *milliseconds, **count):
+        """Return a tuple of the number of milliseconds and items between each update of the navigation band.
+
+        If `milliseconds` is specified, then update the band at most once for that number of milliseconds.
+        If `count` is specified, then update the band once that number of items have been skipped.
+        If either value is zero, then it is not used to limit the updates.
+        """
+        res = math.trunc(1e3 * cls.__interval__), cls.__count__
+        if milliseconds:
+            [interval] = milliseconds
+            cls.__interval__ = interval / 1e3
+        if 'count' in count:
+            cls.__count__ = count['count']
+        return res
+
+    @classmethod
+    def __ready__(cls):
+        '''Return whether the navigation band is allowed to be updated.'''
+        if cls.batch():
+            return False
+
+        # If there's nothing limiting the updates, then we can always update.
+        elif not (cls.__interval__ or cls.__count__):
+            return True
+
+        # Otherwise, check if we've skipped enough items or enough time has passed.
+        now, cls.__pending__ = cls.__clock__(), cls.__pending__ + 1
+        if (cls.__count__ and cls.__pending__ >= cls.__count__) or (cls.__interval__ and now - cls.__last__ >= cls.__interval__):
+            cls.__last__, cls.__pending__ = now, 0
+            return True
+        return False
+
     @classmethod
     def set(cls, ea):
         '''Set the auto-analysis address on the navigation bar to `ea`.'''
-        result, _ = ea, cls.__set__(ea)
+        result, _ = ea, cls.__ready__() and cls.__set__(ea)
         return result
 
     @classmethod
@@ -847,7 +917,7 @@ class navigation(object):
 
         If `type` is specified, then update using the specified auto-analysis type.
         """
-        result, _ = ea, cls.__auto__(ea, type.get('type', idaapi.AU_NONE))
+        result, _ = ea, cls.__ready__() and cls.__auto__(ea, type.get('type', idaapi.AU_NONE))
         return result
 
     @classmethod
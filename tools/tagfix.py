@@ -12,6 +12,11 @@ To manually rebuild the cache for the database, use the following::
 
     > tools.tagfix.everything()
 
+This makes a single pass through the database and reports the time
+that was spent in each phase of the rebuild. The previous approach
+that walks the database for the globals and each function separately
+is still available as ``tools.tagfix.all()``.
+
 Likewise to rebuild the cache for just the globals or the contents::
 
     > tools.tagfix.globals()
@@ -20,7 +25,7 @@ Likewise to rebuild the cache for just the globals or the contents::
 """
 
 import six, sys, logging, builtins
-import functools, operator, itertools, types
+import functools, operator, itertools, types, time, bisect
 
 import database as db, function as func, ui
 import internal
@@ -81,7 +86,7 @@ def fetch_globals_data():
     address, tags = {}, {}
     left, right = db.config.bounds()
     six.print_(u'globals: counting any tags that are assigned to global data', file=output)
-    for ea in map(ui.navigation.analyze, db.address.iterate(left, right)):
+    for ea in map(ui.navigation.analyze, db.tags.candidates(left, right)):
         if func.within(ea):
             continue
         items = db.tag(ea)
@@ -147,6 +152,15 @@ def contents(ea):
             continue
         internal.comment.contents.set_address(k, v, target=f)
 
+    # Rebuild the inverted index using the tag names from each address we counted.
+    logging.debug(u"{:s}.contents({:#x}): Updating the inverted index in the cache belonging to function {:#x}.".format('.'.join([__name__]), ea, ea))
+    index = {}
+    for k in filter(func.within, address):
+        for name in db.tag(k):
+            index.setdefault(name, {})[k] = 1
+        continue
+    internal.comment.contents.set_index(f, index, target=f)
+
     return address, tags
 
 def globals():
@@ -164,6 +178,12 @@ def globals():
     for k, v in address.items():
         internal.comment.globals.set_address(k, v)
 
+    # Rebuild the inverted index from the tag names at each address we counted.
+    six.print_(u'globals: rebuilding the inverted index of tag names for the database', file=output)
+    iterable = ((ea, func.tag(ea) if func.within(ea) else db.tag(ea)) for ea in sorted(address))
+    count = internal.comment.globals.reindex(iterable)
+    six.print_(u"globals: wrote {:d} tag names to the inverted index".format(count), file=output)
+
     return address, tags
 
 def all():
@@ -203,20 +223,113 @@ def extracomments():
         if count: [ ctx.inc(ea, '__extra_suffix__') for i in range(count) ]
     return
 
+def rebuild():
+    """Rebuild the index for all of the globals and the cache for each function by making a single pass through the database.
+
+    Returns a list of tuples `(phase, elapsed, count)` for each phase of the rebuild.
+    """
+    clock, phases = getattr(time, 'perf_counter', time.time), []
+    getflags = idaapi.getFlags if idaapi.__version__ < 7.0 else idaapi.get_full_flags
+
+    # Erase the index and the cache for every function so that we start fresh.
+    ts, iterables = clock(), [erase_contents(), erase_globals()]
+    count = sum(map(next, iterables))
+    [ item for item in itertools.chain(*iterables) ]
+    phases.append(('erase', clock() - ts, count))
+
+    # Build a map of each chunk so that we can figure out which functions own
+    # an address with a binary search. A tail owned by multiple functions will
+    # have an entry for each owner which are adjacent to each other when sorted.
+    ts, functions = clock(), [ea for ea in db.functions()]
+    chunks = sorted((left, right, ea) for ea in functions for left, right in func.chunks(ea))
+    starts = [left for left, _, _ in chunks]
+    phases.append(('chunks', clock() - ts, len(chunks)))
+
+    # Now we can collect the global tags for each function. This is the only
+    # place where we need to decode a function's comment.
+    ts, address, tags, pairs = clock(), {}, {}, {}
+    for ea in functions:
+        items = func.tag(ea)
+        for name in items:
+            address[ea], tags[name] = address.get(ea, 0) + 1, tags.get(name, 0) + 1
+        pairs[ea] = items
+    phases.append(('functions', clock() - ts, len(functions)))
+
+    # Next we make a single pass through the candidates within the database. These
+    # are only the heads that have a netnode with a comment, a name, a color, or
+    # some type information (using their flags and additional flags) instead of
+    # every single head. We then use the chunk map to route each of them to their
+    # function or the globals.
+    ts, heads, contents = clock(), 0, {}
+    left, right = db.config.bounds()
+    for ea in db.tags.candidates(left, right):
+        flags, heads = getflags(ea), heads + 1
+        if flags & idaapi.MS_CLS == idaapi.FF_TAIL:
+            continue
+
+        # Find all of the chunks that might contain our address to get its owners.
+        index = bisect.bisect_right(starts, ea) - 1
+        lower = bisect.bisect_left(starts, starts[index]) if index >= 0 else 0
+        owners = [fn for start, stop, fn in chunks[lower : index + 1] if start <= ea < stop]
+
+        # If there weren't any owners, then this is a global. If it's code
+        # within a function, then it's a contents tag for each of the owners.
+        if owners and flags & idaapi.MS_CLS != idaapi.FF_CODE:
+            continue
+
+        items = db.tag(ea)
+        if not owners and items:
+            for name in items:
+                address[ea], tags[name] = address.get(ea, 0) + 1, tags.get(name, 0) + 1
+            pairs[ea] = items
+
+        for fn in owners if items else []:
+            state = contents.setdefault(fn, {})
+            names, cache, postings = (state.setdefault(key, {}) for key in [internal.comment.contents.__tags__, internal.comment.contents.__address__, internal.comment.contents.__index__])
+            for name in items:
+                names[name], cache[ea] = names.get(name, 0) + 1, cache.get(ea, 0) + 1
+                postings.setdefault(name, {})[ea] = 1
+            continue
+        continue
+    phases.append(('scan', clock() - ts, heads))
+
+    # Last thing to do is to write everything that we collected in bulk. Each
+    # function's cache is written exactly once, followed by the globals.
+    ts = clock()
+    for fn, state in contents.items():
+        internal.comment.contents._write(fn, fn, state)
+
+    [ internal.comment.globals.set_name(name, count) for name, count in tags.items() ]
+    [ internal.comment.globals.set_address(ea, count) for ea, count in address.items() ]
+    internal.comment.globals.reindex((ea, pairs[ea]) for ea in sorted(pairs) if pairs[ea])
+    phases.append(('write', clock() - ts, len(contents) + len(address)))
+
+    # Now we can report how long each phase took and its throughput.
+    for phase, elapsed, count in phases:
+        six.print_(u"rebuild: {:s} phase processed {:d} item{:s} in {:.3f}s ({:.1f}/s)".format(phase, count, '' if count == 1 else 's', elapsed, count / elapsed if elapsed > 0 else float(count)), file=output)
+    six.print_(u"rebuild: cached {:d} function{:s} and {:d} global address{:s} in {:.3f}s".format(len(contents), '' if len(contents) == 1 else 's', len(address), '' if len(address) == 1 else 'es', sum(elapsed for _, elapsed, _ in phases)), file=output)
+    return phases
+
 def everything():
     '''Rebuild the index for all of the globals and the cache for each function from the database.'''
-    erase()
-    all()
+    return rebuild()
 
 def erase_globals():
     '''Remove the contents of the index from the database which is used for storing information about the global tags.'''
-    node = internal.comment.tagging.node()
+    node, itag = internal.comment.tagging.node(), internal.comment.tagging.itag
     hashes, alts, sups = map(list, (iterator(node) for iterator in [internal.netnode.hash.fiter, internal.netnode.alt.fiter, internal.netnode.sup.fiter]))
-    total = sum(map(len, [hashes, alts, sups]))
+    indices = [item for item in internal.comment.globals.indices()]
+    total = sum(map(len, [hashes, alts, sups, indices]))
 
     yield total
 
     current = 0
+    for idx, (k, nodeidx) in enumerate(indices):
+        internal.netnode.remove(nodeidx)
+        internal.netnode.hash.remove(node, internal.utils.string.to(k), tag=itag)
+        yield current + idx, k
+
+    current += len(indices)
     for idx, k in enumerate(hashes):
         internal.netnode.hash.remove(node, k)
         yield current + idx, k
@@ -277,7 +390,7 @@ def verify_index():
 
         # Verify the keys inside the cache are only ones that we know about.
         expected = {key for key in [cls.__tags__, cls.__address__]}
-        keys = {key for key in available}
+        keys = {key for key in available} - {cls.__index__}
         if keys - expected:
             ok, _ = False, six.print_(u"[{:#x}] the index item for this function contains unsupported keys ({:s})".format(ea, ', '.join(sorted(keys - expected))), file=output)
             continue
@@ -305,7 +418,7 @@ def verify_content(ea):
         return False
 
     # Grab the keys from the cache in order to cross-check them.
-    expected, available = {key for key in [cls.__tags__, cls.__address__]}, {key for key in cache}
+    expected, available = {key for key in [cls.__tags__, cls.__address__]}, {key for key in cache} - {cls.__index__}
 
     # Verify that the keys in our cache match what we expect.
     if available - expected:
@@ -553,4 +666,16 @@ def verify():
     six.print_(u"Verification of globals has {:s}. Successfully verified{:s} {:d} of {:d} indexed functions.".format('succeeded' if ok else 'failed', ' only' if verified < available else '', verified, available))
     return ok and verified == available
 
-__all__ = ['everything', 'globals', 'contents']
+def migrate():
+    '''Rewrite the cache for the contents of every function in the database using the current format.'''
+    cls = internal.comment.contents
+    functions = [ea for ea, _ in cls.iterate()]
+    for idx, ea in enumerate(map(ui.navigation.set, functions)):
+        six.print_(u"migrating the cache for function {:#x} : {:d} of {:d}".format(ea, 1 + idx, len(functions)), file=output)
+        state = cls._read(ea, ea)
+        if state:
+            cls._write(ea, ea, state)
+        continue
+    return len(functions)
+
+__all__ = ['everything', 'globals', 'contents', 'rebuild']
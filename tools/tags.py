@@ -23,10 +23,21 @@ To apply previously read tags with different names to the database::
 
     > tools.tags.apply(res, tag1='my_tag1', tag2='my_tag2', ...)
 
+To apply only the differences between two previously read exports::
+
+    > operations = tools.tags.diff(old, new)
+    > tools.tags.diff.apply(operations)
+
+To stream the tags from the database into a file and then apply them::
+
+    > tools.tags.stream.export('/path/to/file.tags', 'tag1', 'tag2', ...)
+    > tools.tags.stream.apply('/path/to/file.tags', tag1='my_tag1', ...)
+
 """
 
 import six, sys, logging, builtins
 import functools, operator, itertools, types, string
+import os, struct, pickle, zlib, heapq
 
 import database as db, function as func, structure as struc, ui
 import internal
@@ -174,28 +185,20 @@ class read(object):
     @staticmethod
     def globals():
         '''Iterate through all of the tags defined globally witin the database.'''
-        ea, sentinel = db.config.bounds()
+        functions = {ea for ea in db.functions()}
 
-        # loop till we hit the end of the database
-        while ea < sentinel:
+        # only visit the addresses that might be tagged, and merge them with
+        # each function so that we can use the function's tag instead.
+        candidates = (ea for ea in db.tags.candidates() if not func.within(ea))
+        for ea in heapq.merge(sorted(functions), candidates):
             ui.navigation.auto(ea)
-            funcQ = func.within(ea)
 
             # figure out which tag function to use
-            f = func.tag if funcQ else db.tag
+            f = func.tag if ea in functions else db.tag
 
             # grab the tag and yield it
             res = f(ea)
             if res: yield ea, res
-
-            # if we're in a function, then seek to the next chunk
-            if funcQ:
-                _, ea = func.chunk(ea)
-                continue
-
-            # otherwise, try the next address till we hit a sentinel value
-            try: ea = db.a.next(ea)
-            except internal.exceptions.OutOfBoundsError: ea = sentinel
         return
 
     ## reading the contents from the entire database
@@ -645,4 +648,329 @@ class export(object):
             if res: yield ea, res
         return
 
-__all__ = ['list', 'read', 'export', 'apply']
+### Comparing tags between two exports
+class diff(object):
+    """
+    This namespace contains tools that can be used to compare the tags
+    from two exports (or an export and the database) and then apply only
+    the differences between them back into the database.
+
+    Each difference is a tuple of the format `(operation, kind, key, name, value)`
+    where `operation` is either "add", "modify", or "remove" and `kind` is either
+    "globals", "contents", or "frames". For the globals and contents, the `key`
+    is the address or location and `name` is the name of the tag. For the frames,
+    the `key` is the address of the function and `name` is the offset of the
+    member with its `value` being the tuple `(name, type, tags)`.
+
+    Both exports need to have been read with the same `location` parameter.
+    """
+
+    def __new__(cls, *snapshots, **location):
+        '''Return a list of the differences between the exports `(old, new)` in `snapshots` or between the database and the export `new`.'''
+        global read
+        if len(snapshots) not in {1, 2}:
+            raise internal.exceptions.InvalidParameterError(u"{:s}({:s}) : Unable to compare {:d} export{:s} as only 1 or 2 are supported.".format('.'.join([__name__, cls.__name__]), ', '.join(itertools.chain(['...'] * len(snapshots), ("{:s}={!r}".format(k, v) for k, v in location.items()))), len(snapshots), '' if len(snapshots) == 1 else 's'))
+        old, new = snapshots if len(snapshots) > 1 else (read.everything(location=location.get('location', False)),) + snapshots
+        return [item for item in cls.iterate(old, new)]
+
+    @staticmethod
+    def __merge__(old, new):
+        '''Yield each key from the dictionaries `old` and `new` in sorted order with their values or `dummy` if the key is missing.'''
+        for key, _ in itertools.groupby(heapq.merge(sorted(old), sorted(new))):
+            yield key, old.get(key, dummy), new.get(key, dummy)
+        return
+
+    @classmethod
+    def iterate(cls, old, new):
+        '''Yield each operation that is needed to transform the export `old` into the export `new`.'''
+        for kind, Fold, Fnew in zip(['globals', 'contents', 'frames'], old, new):
+            for key, before, after in cls.__merge__(Fold, Fnew):
+                before, after = ({} if items is dummy else items for items in [before, after])
+
+                # now that we have the tags for each key, merge them so
+                # that we can figure out which ones need to be changed.
+                for name, value, res in cls.__merge__(before, after):
+                    if value is dummy:
+                        yield 'add', kind, key, name, res
+                    elif res is dummy:
+                        yield 'remove', kind, key, name, value
+                    elif value != res:
+                        yield 'modify', kind, key, name, res
+                    continue
+                continue
+            continue
+        return
+
+    @classmethod
+    def apply(cls, operations, **tagmap):
+        '''Apply each of the `operations` to the database using the specified `tagmap` and return the number that were applied.'''
+        global apply
+        tagmap_output = u", {:s}".format(u', '.join(u"{:s}={:s}".format(internal.utils.string.escape(oldtag), internal.utils.string.escape(newtag)) for oldtag, newtag in tagmap.items())) if tagmap else ''
+
+        count = 0
+        with db.tags.batch():
+            for operation, kind, key, name, value in operations:
+                ea = locationToAddress(key) if kind == 'contents' else key
+                ui.navigation.auto(ea)
+
+                try:
+                    # frame members are applied the same way as when applying
+                    # an export, except when removing where we clear its tags.
+                    if kind == 'frames' and operation == 'remove':
+                        member = func.frame(ea).members.by_offset(name)
+                        [ member.tag(item, None) for item in member.tag() ]
+
+                    # applying a frame member only merges its tags, so when
+                    # modifying we need to clear the ones that were dropped.
+                    elif kind == 'frames' and operation == 'modify':
+                        _, _, tags = value
+                        member, expected = func.frame(ea).members.by_offset(name), {tagmap.get(item, item) for item in tags}
+                        [ member.tag(item, None) for item in member.tag() if item not in expected ]
+                        apply.frame(ea, {name: value}, **tagmap)
+
+                    elif kind == 'frames':
+                        apply.frame(ea, {name: value}, **tagmap)
+
+                    # globals belonging to a function use the function's tag,
+                    # whereas everything else uses the tag for the address.
+                    elif kind in {'globals', 'contents'}:
+                        ns = func if kind == 'globals' and func.within(ea) else db
+                        ns.tag(ea, tagmap.get(name, name), None if operation == 'remove' else value)
+
+                    else:
+                        logging.warning(u"{:s}.apply(...{:s}) : Skipping operation \"{:s}\" for {:#x} due to it being an unknown kind ({!r}).".format('.'.join([__name__, cls.__name__]), tagmap_output, internal.utils.string.escape(operation, '"'), ea, kind))
+                        continue
+
+                except Exception:
+                    logging.warning(u"{:s}.apply(...{:s}) : Unable to {:s} the {:s} {!s} for {:#x} with the value {!s}.".format('.'.join([__name__, cls.__name__]), tagmap_output, operation, kind, internal.utils.string.repr(name), ea, internal.utils.string.repr(value)), exc_info=True)
+                    continue
+                count += 1
+            return count
+
+### Streaming tags to and from a file
+class stream(object):
+    """
+    This namespace contains tools that can be used to export the tags
+    within the database directly into a file and then apply them back
+    into a database without having to keep all of them in memory.
+
+    The file begins with a header containing a magic number, a version,
+    and whether the records are compressed. Each record follows as its
+    length and a pickled tuple of the format `(kind, key, value)` where
+    `kind` is either "globals", "contents", or "frames". Once all of the
+    records have been written, a footer containing the offset of each
+    record is appended followed by the offset of the footer itself.
+
+    If the file was truncated (such as due to a crash while exporting),
+    the footer will be missing and the records will be read sequentially
+    up to the last one that was completely written. When applying the
+    records, the number of the last applied record is checkpointed into
+    a file next to the one being applied. If the application gets
+    interrupted, it will be resumed from that record the next time.
+    """
+    magic, version = b'TAGS', 1
+    header, length, trailer = struct.Struct('<4sBB'), struct.Struct('<I'), struct.Struct('<Q4s')
+    protocol, interval = 2, 0x400
+
+    @classmethod
+    def __records__(cls, tags, location, cached):
+        '''Yield each record for the specified `tags` in the database using the cache if `cached` is true.'''
+        global read, export
+        if cached:
+            iterables = [('globals', export.globals(*tags)), ('contents', export.contents(*tags, location=location)), ('frames', export.frames(*tags))]
+        else:
+            iterables = [('globals', read.globals()), ('contents', read.contents(location=location)), ('frames', read.frames())]
+
+        for kind, iterable in iterables:
+            six.print_(u"--> Streaming {:s}{:s}...".format(kind, ' (cached)' if cached else ''), file=output)
+            for key, value in iterable:
+                yield kind, key, value
+            continue
+        return
+
+    @classmethod
+    def export(cls, path, *tags, **options):
+        """Export the specified `tags` within the database into the file at `path` one record at a time.
+
+        If the boolean `location` is specified, then key each contents tag by location instead of address.
+        If the boolean `cached` is false, then read every tag without using the cache (`tags` will be ignored).
+        If the boolean `compress` is false, then the records will not be compressed.
+        Returns the number of records that were written.
+        """
+        location, cached, compress = (options.get(item, default) for item, default in [('location', False), ('cached', True), ('compress', True)])
+
+        offsets = []
+        with open(path, 'wb') as outfile:
+            outfile.write(cls.header.pack(cls.magic, cls.version, 1 if compress else 0))
+
+            # Write each record as soon as we get it, keeping track of where
+            # it was written so that we can include it in the footer.
+            for index, record in enumerate(cls.__records__(tags, location, cached)):
+                data = pickle.dumps(record, cls.protocol)
+                data = zlib.compress(data) if compress else data
+                offsets.append(outfile.tell())
+                outfile.write(cls.length.pack(len(data)))
+                outfile.write(data)
+
+                if index % cls.interval == 0:
+                    outfile.flush()
+                    six.print_(u"--> Wrote {:d} record{:s} to \"{:s}\"...".format(1 + index, '' if index == 0 else 's', internal.utils.string.escape(path, '"')), file=output)
+                continue
+
+            # Now we can write our footer containing the offset for each record.
+            footer = outfile.tell()
+            data = pickle.dumps(offsets, cls.protocol)
+            outfile.write(cls.length.pack(len(data)))
+            outfile.write(data)
+            outfile.write(cls.trailer.pack(footer, cls.magic))
+
+        six.print_(u"--> Finished writing {:d} record{:s} to \"{:s}\".".format(len(offsets), '' if len(offsets) == 1 else 's', internal.utils.string.escape(path, '"')), file=output)
+        return len(offsets)
+
+    @classmethod
+    def __footer__(cls, infile):
+        '''Return the offset of the footer from the trailer of the file `infile` or ``None`` if it is missing.'''
+        infile.seek(0, os.SEEK_END)
+        total = infile.tell()
+        if total < cls.header.size + cls.length.size + cls.trailer.size:
+            return None
+
+        infile.seek(-cls.trailer.size, os.SEEK_END)
+        footer, magic = cls.trailer.unpack(infile.read(cls.trailer.size))
+        if magic != cls.magic or not (cls.header.size <= footer <= total - cls.length.size - cls.trailer.size):
+            return None
+        return footer
+
+    @classmethod
+    def offsets(cls, path):
+        '''Return the offset of each record within the file at `path` from its footer or ``None`` if it does not have one.'''
+        with open(path, 'rb') as infile:
+            footer = cls.__footer__(infile)
+            if footer is None:
+                return None
+
+            infile.seek(footer)
+            size, = cls.length.unpack(infile.read(cls.length.size))
+            return pickle.loads(infile.read(size))
+
+    @classmethod
+    def __decode__(cls, data, compressed):
+        '''Return the `(kind, key, value)` tuple for the record in `data` or ``None`` if it is not a valid record.'''
+        try:
+            res = pickle.loads(zlib.decompress(data) if compressed else data)
+        except Exception:
+            return None
+
+        if not isinstance(res, tuple) or len(res) != 3 or res[0] not in {'globals', 'contents', 'frames'}:
+            return None
+        return res
+
+    @classmethod
+    def iterate(cls, path, start=0):
+        """Yield each record from the file at `path` beginning with the record at the index `start`.
+
+        Each record is yielded as a tuple of the format `(index, kind, key, value)`.
+        """
+        offsets = cls.offsets(path)
+        with open(path, 'rb') as infile:
+            stop = cls.__footer__(infile)
+            infile.seek(0)
+
+            magic, version, compressed = cls.header.unpack(infile.read(cls.header.size))
+            if (magic, version) != (cls.magic, cls.version):
+                raise internal.exceptions.InvalidFormatError(u"{:s}.iterate({!r}, {:d}) : The file \"{:s}\" is not a supported format ({!r}, {:d}).".format('.'.join([__name__, cls.__name__]), path, start, internal.utils.string.escape(path, '"'), magic, version))
+
+            # If we have a footer, then we can seek directly to the record that
+            # we're starting at. Otherwise we have to skip over each record.
+            index = 0
+            if offsets and start < len(offsets):
+                index, _ = start, infile.seek(offsets[start])
+            elif offsets is not None and start >= len(offsets):
+                return
+
+            # Now we can read each record until we reach the footer, run out of
+            # them, or the data for the record is truncated due to the export
+            # being interrupted. Without the footer, we don't know where the
+            # records end and so we need to validate each one that we read.
+            while stop is None or infile.tell() < stop:
+                data = infile.read(cls.length.size)
+                if len(data) < cls.length.size:
+                    break
+                size, = cls.length.unpack(data)
+                data = infile.read(size)
+                if len(data) < size:
+                    logging.warning(u"{:s}.iterate({!r}, {:d}) : Stopping at record {:d} due to it being truncated ({:d} < {:d}).".format('.'.join([__name__, cls.__name__]), path, start, index, len(data), size))
+                    break
+
+                # Decode the record if we're yielding it or need to validate it.
+                if stop is None or index >= start:
+                    res = cls.__decode__(data, compressed)
+                    if res is None:
+                        logging.warning(u"{:s}.iterate({!r}, {:d}) : Stopping at record {:d} due to it being invalid.".format('.'.join([__name__, cls.__name__]), path, start, index))
+                        break
+
+                # Skip the record if we haven't reached the start yet.
+                if index >= start:
+                    kind, key, value = res
+                    yield index, kind, key, value
+                index += 1
+            return
+
+    @classmethod
+    def apply(cls, path, **tagmap):
+        """Apply the records from the file at `path` back into the database using the specified `tagmap`.
+
+        Progress is checkpointed to a file with the same name ending in ".applied"
+        so that an interrupted application can be resumed from its last record.
+        """
+        global apply
+        checkpoint = path + '.applied'
+
+        # If there's a checkpoint, then read where we need to resume from.
+        try:
+            with open(checkpoint, 'r') as infile:
+                start = int(infile.read().strip() or 0)
+            six.print_(u"--> Resuming from record {:d} of \"{:s}\"...".format(start, internal.utils.string.escape(path, '"')), file=output)
+        except (IOError, OSError, ValueError):
+            start = 0
+
+        ## convert a list keyed by an address or location into something that updates ida's navigation pointer
+        def update_navigation(xs, Faddress):
+            '''Update the navigation pointer with the address returned by `Faddress` for each iteration of list `xs`.'''
+            for x in xs:
+                key, _ = x
+                ui.navigation.auto(Faddress(key))
+                yield x
+            return
+
+        # Apply each group of records within a batch so that the comments for
+        # each group are written only once. After a group has been applied,
+        # we update the checkpoint so that we can resume from the next group.
+        count, iterable = 0, cls.iterate(path, start)
+        for group in iter(lambda: builtins.list(itertools.islice(iterable, cls.interval)), []):
+            records = {kind : [] for kind in ['globals', 'contents', 'frames']}
+            for index, kind, key, value in group:
+                if kind in records:
+                    records[kind].append((key, value))
+                else:
+                    logging.warning(u"{:s}.apply({!r}) : Skipping record {:d} due to it being an unknown kind ({!r}).".format('.'.join([__name__, cls.__name__]), path, index, kind))
+                continue
+
+            # Now we can apply each kind of record in the group all at once.
+            Globals, Contents, Frames = (records[kind] for kind in ['globals', 'contents', 'frames'])
+            with db.tags.batch():
+                Globals and apply.globals(update_navigation(Globals, internal.utils.fidentity), **tagmap)
+                Contents and apply.contents(update_navigation(Contents, locationToAddress), **tagmap)
+                Frames and apply.frames(update_navigation(Frames, internal.utils.fidentity), **tagmap)
+
+            # Write the index of the next record to our checkpoint.
+            count, start = count + len(group), 1 + group[-1][0]
+            with open(checkpoint, 'w') as outfile:
+                outfile.write("{:d}".format(start))
+            six.print_(u"--> Applied {:d} record{:s} from \"{:s}\"...".format(start, '' if start == 1 else 's', internal.utils.string.escape(path, '"')), file=output)
+
+        # We've applied everything, so we can remove our checkpoint.
+        os.path.exists(checkpoint) and os.unlink(checkpoint)
+        return count
+
+__all__ = ['list', 'read', 'export', 'apply', 'diff', 'stream']